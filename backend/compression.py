@@ -0,0 +1,238 @@
+"""
+Response compression for the API.
+
+CompressionMiddleware negotiates gzip, and brotli or zstd when those
+packages are installed, from Accept-Encoding. Complete responses under
+`minimum_size` go out untouched. Streaming responses (exports) are compressed
+chunk by chunk and flushed after each one, so clients still receive rows as
+they are produced. Settings can be overridden per path prefix.
+"""
+
+import zlib
+from typing import Dict, Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+# ==================== ENCODERS ====================
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        # Sync flush: everything written so far can be decoded by the client
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+ENCODERS = {"gzip": GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+
+# Levels tuned for JSON on the request path: most of the ratio of the
+# maximum settings at a fraction of the CPU (see benchmarks/bench_compression.py)
+DEFAULT_LEVELS = {"gzip": 4, "br": 2, "zstd": 1}
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def negotiate(accept_encoding: str, preference: Sequence[str]) -> Optional[str]:
+    """Pick the encoding the client weights highest, ties going to `preference` order."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if token.strip():
+            weights[token.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for name in preference:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+# ==================== MIDDLEWARE ====================
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON, NDJSON and text responses.
+
+    `routes` maps path prefixes to overrides of `minimum_size`, `encodings`
+    and `levels` (longest prefix wins); mapping a prefix to None disables
+    compression under it.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        encodings: Sequence[str] = ("zstd", "br", "gzip"),
+        levels: Optional[Dict[str, int]] = None,
+        routes: Optional[Dict[str, Optional[dict]]] = None,
+    ):
+        self.app = app
+        self.defaults = {
+            "minimum_size": minimum_size,
+            "encodings": [e for e in encodings if e in ENCODERS],
+            "levels": {**DEFAULT_LEVELS, **(levels or {})},
+        }
+        self.routes = sorted((routes or {}).items(), key=lambda route: -len(route[0]))
+
+    def settings_for(self, path: str) -> Optional[dict]:
+        for prefix, override in self.routes:
+            if path.startswith(prefix):
+                if override is None:
+                    return None
+                settings = {**self.defaults, **override}
+                settings["encodings"] = [e for e in settings["encodings"] if e in ENCODERS]
+                settings["levels"] = {**self.defaults["levels"], **override.get("levels", {})}
+                return settings
+        return self.defaults
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        settings = self.settings_for(scope["path"])
+        if settings is None:
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate(accept_encoding, settings["encodings"]) if accept_encoding else None
+        # Without an acceptable encoding the response still goes through
+        # CompressingSend, uncompressed, for its Vary header
+        level = settings["levels"][encoding] if encoding else None
+        responder = CompressingSend(send, encoding, level, settings["minimum_size"])
+        await self.app(scope, receive, responder)
+
+
+class CompressingSend:
+    """Wraps `send` for one response, deciding on its first body message.
+
+    Compressible responses get `Vary: Accept-Encoding` whether or not they
+    end up compressed (`encoding` None, or a small body), so shared caches
+    never hand one client's representation to another.
+    """
+
+    def __init__(self, send, encoding: Optional[str], level: Optional[int], minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start = None
+        self.encoder = None
+        self.passthrough = False
+
+    def should_compress(self, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        if self.encoding is None:
+            return False
+        if self.start["status"] < 200 or self.start["status"] in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+        return more_body or len(body) >= self.minimum_size
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows what we are sending
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            headers = MutableHeaders(raw=list(self.start["headers"]))
+            if headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                headers.add_vary_header("Accept-Encoding")
+            if not self.should_compress(headers, body, more_body):
+                self.passthrough = True
+                await self.send({**self.start, "headers": headers.raw})
+                await self.send(message)
+                return
+
+            self.encoder = ENCODERS[self.encoding](self.level)
+            headers["content-encoding"] = self.encoding
+            # The compressed bytes differ from the identity representation
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["etag"] = "W/" + etag
+            if more_body:
+                del headers["content-length"]
+                await self.send({**self.start, "headers": headers.raw})
+            else:
+                compressed = self.encoder.compress(body) + self.encoder.finish()
+                headers["content-length"] = str(len(compressed))
+                await self.send({**self.start, "headers": headers.raw})
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+        chunk = self.encoder.compress(body) + (self.encoder.flush() if more_body else self.encoder.finish())
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
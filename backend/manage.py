@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Operational commands for the Agro Track backend.
+
+    python manage.py rollups verify [--user-id ID] [--fix]
+    python manage.py rollups rebuild [--user-id ID]
+    python manage.py ensure-indexes
+    python manage.py sync backfill
+    python manage.py projections precompute [--months 6] [--workers N]
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import typer
+
+import server
+
+app = typer.Typer(help="Agro Track backend maintenance commands")
+rollups = typer.Typer(help="Maintain the user_stats rollup collection")
+app.add_typer(rollups, name="rollups")
+sync = typer.Typer(help="Maintain delta sync metadata")
+app.add_typer(sync, name="sync")
+projections = typer.Typer(help="Precompute cash flow projections")
+app.add_typer(projections, name="projections")
+
+
+async def _user_ids(user_id: Optional[str]) -> List[str]:
+    if user_id:
+        return [user_id]
+    return [str(u["_id"]) async for u in server.db.users.find({}, {"_id": 1})]
+
+
+async def _verify(user_id: Optional[str], fix: bool) -> int:
+    drifted = 0
+    for uid in await _user_ids(user_id):
+        drift = await server.verify_user_stats(uid, fix=fix)
+        if drift is None:
+            typer.echo(f"{uid}: not built (will be built on first read)")
+            continue
+        if not drift:
+            continue
+
+        drifted += 1
+        for d in drift:
+            typer.echo(f"{uid}: {d['scope']}[{d['key']}].{d['metric']} stored={d['stored']} expected={d['expected']}")
+        if fix:
+            typer.echo(f"{uid}: rebuilt")
+    return drifted
+
+
+async def _rebuild(user_id: Optional[str]) -> int:
+    user_ids = await _user_ids(user_id)
+    for uid in user_ids:
+        await server.rebuild_user_stats(uid)
+        await server.bump_versions(uid, *server.VERSIONED_COLLECTIONS)
+    return len(user_ids)
+
+
+@rollups.command()
+def verify(
+    user_id: Optional[str] = typer.Option(None, help="Only check this user"),
+    fix: bool = typer.Option(False, help="Rebuild users whose rollups drifted"),
+):
+    """Recompute rollups from raw data and report any drift."""
+    drifted = asyncio.run(_verify(user_id, fix))
+    typer.echo(f"{drifted} user(s) with drift")
+    if drifted and not fix:
+        raise typer.Exit(code=1)
+
+
+@rollups.command()
+def rebuild(user_id: Optional[str] = typer.Option(None, help="Only rebuild this user")):
+    """Recompute rollups from raw data, replacing the stored documents."""
+    count = asyncio.run(_rebuild(user_id))
+    typer.echo(f"Rebuilt rollups for {count} user(s)")
+
+
+async def _backfill() -> dict:
+    counts = {}
+    for name in server.SYNC_COLLECTIONS:
+        result = await server.db[name].update_many(
+            {"updated_at": {"$exists": False}},
+            [{"$set": {"updated_at": "$created_at"}}]
+        )
+        counts[name] = result.modified_count
+    return counts
+
+
+@sync.command()
+def backfill():
+    """Stamp updated_at (from created_at) on documents written before delta sync."""
+    for name, count in asyncio.run(_backfill()).items():
+        typer.echo(f"{name}: {count} document(s) stamped")
+
+
+async def _precompute_projections(months: int, workers: int) -> int:
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Two slots per worker: one projecting, one loading the next user
+        return await server.precompute_projections(pool, months, concurrency=2 * workers)
+
+
+@projections.command()
+def precompute(
+    months: int = typer.Option(server.PROJECTION_DEFAULT_MONTHS, min=1, max=server.PROJECTION_MAX_MONTHS, help="Months ahead"),
+    workers: int = typer.Option(os.cpu_count() or 1, min=1, help="Projection processes"),
+):
+    """Project every user's balance and store it for /api/analytics/projection."""
+    started = time.perf_counter()
+    count = asyncio.run(_precompute_projections(months, workers))
+    typer.echo(f"Projected {count} user(s) in {time.perf_counter() - started:.1f}s")
+
+
+@app.command("ensure-indexes")
+def ensure_indexes():
+    """Create the declared indexes (also done on API startup)."""
+    asyncio.run(server.ensure_indexes())
+    typer.echo(f"Indexes ensured on {len(server.INDEXES)} collection(s)")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,212 @@
+"""
+Prometheus metrics for the API.
+
+MetricsMiddleware counts requests by method, route template and status,
+observes their latency per route template and tracks requests in flight.
+Routes are labelled with their template (`/api/expenses/{expense_id}`), never
+the raw path, so ids don't explode the number of series; requests that match
+no route are labelled "unmatched".
+
+MongoCommandMetrics and MongoPoolMetrics are pymongo event listeners (pass
+them to the client's `event_listeners`) recording per collection/command
+counts, durations and documents returned, and connection pool checkout waits.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory before the workers start: each process then writes its samples
+there and `render` aggregates all of them, so any worker can answer a scrape.
+Without it, metrics are those of the process that answers.
+"""
+
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from pymongo import monitoring
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests", ["method", "route", "status"])
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency, until the response is complete", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being served", ["method"], multiprocess_mode="livesum")
+
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MONGO_COMMANDS = Counter("mongodb_commands_total", "MongoDB commands", ["collection", "command", "outcome"])
+MONGO_DURATION = Histogram("mongodb_command_duration_seconds", "MongoDB command latency", ["collection", "command"], buckets=MONGO_BUCKETS)
+MONGO_DOCUMENTS = Counter("mongodb_documents_returned_total", "Documents returned by MongoDB cursors", ["collection", "command"])
+MONGO_CHECKOUT_WAIT = Histogram("mongodb_pool_checkout_wait_seconds", "Time waiting for a pooled connection", buckets=MONGO_BUCKETS)
+MONGO_CHECKOUT_FAILURES = Counter("mongodb_pool_checkout_failures_total", "Failed connection checkouts", ["reason"])
+MONGO_CONNECTIONS = Gauge("mongodb_pool_connections", "Open pooled connections", multiprocess_mode="livesum")
+MONGO_CONNECTIONS_IN_USE = Gauge("mongodb_pool_connections_in_use", "Connections checked out of the pool", multiprocess_mode="livesum")
+
+
+def render() -> Tuple[bytes, str]:
+    """The exposition text and its content type."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: Optional[int] = None):
+    # Drops this worker's live gauges from the aggregate; call on shutdown
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+# ==================== HTTP ====================
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and requests in flight."""
+
+    def __init__(self, app):
+        self.app = app
+        self._templates = None
+
+    def route_template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._templates is None:
+            # Routes are all registered by the time requests come in
+            templates = {}
+            for route in scope["app"].routes:
+                if hasattr(route, "endpoint"):
+                    templates.setdefault(route.endpoint, []).append(route)
+            self._templates = templates
+        routes = self._templates.get(endpoint, ())
+        if len(routes) == 1:
+            return routes[0].path
+        # The same handler behind several paths
+        for route in routes:
+            if route.path_regex.match(scope["path"]):
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = HTTP_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            duration = time.perf_counter() - started
+            in_progress.dec()
+            route = self.route_template(scope)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_DURATION.labels(method, route).observe(duration)
+
+
+# ==================== MONGO ====================
+
+def _collection(command_name: str, command: dict) -> str:
+    # find/insert/aggregate/... name their collection in the command's first
+    # field; getMore names it in "collection"; database commands have none
+    target = command.get("collection") if command_name == "getMore" else command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+def _documents(command_name: str, reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if command_name == "findAndModify":
+        return int(reply.get("value") is not None)
+    return 0
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Per collection/command counts, latency and documents returned."""
+
+    def __init__(self):
+        # Started events carry the command, completed ones only its name;
+        # request ids are unique within the process
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[event.request_id] = _collection(event.command_name, event.command)
+
+    def _finish(self, event, outcome: str) -> Tuple[str, str]:
+        collection = self._collections.pop(event.request_id, "")
+        MONGO_COMMANDS.labels(collection, event.command_name, outcome).inc()
+        MONGO_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        return collection, event.command_name
+
+    def succeeded(self, event):
+        collection, command = self._finish(event, "succeeded")
+        documents = _documents(command, event.reply)
+        if documents:
+            MONGO_DOCUMENTS.labels(collection, command).inc(documents)
+
+    def failed(self, event):
+        self._finish(event, "failed")
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Checkout waits and pool occupancy.
+
+    pymongo checks connections out on the thread running the operation, so
+    the wait is measured from a per-thread start time.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _waited(self):
+        started = getattr(self._local, "checkout_started", None)
+        if started is not None:
+            MONGO_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+            self._local.checkout_started = None
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._waited()
+        MONGO_CONNECTIONS_IN_USE.inc()
+
+    def connection_check_out_failed(self, event):
+        self._waited()
+        MONGO_CHECKOUT_FAILURES.labels(str(event.reason)).inc()
+
+    def connection_checked_in(self, event):
+        MONGO_CONNECTIONS_IN_USE.dec()
+
+    def connection_created(self, event):
+        MONGO_CONNECTIONS.inc()
+
+    def connection_closed(self, event):
+        MONGO_CONNECTIONS.dec()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
@@ -0,0 +1,250 @@
+"""
+Forward cash-flow projection.
+
+A user's next months are laid out on a day-indexed NumPy timeline: pending
+debts land on their due dates (overdue ones today) and recurring revenues and
+expenses inferred from history are spread over the months ahead. A cumulative
+sum over the daily flows gives the projected balance, its minimum and the
+windows where it goes negative. Everything is array arithmetic, so years of
+history project in about a millisecond.
+
+Payloads (see `build_payload`) hold plain NumPy columns, so they pickle
+cheaply to the process pool used by `manage.py projections precompute`.
+"""
+
+import math
+from datetime import date
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# A flow is monthly when it shows up in MONTHLY_MIN_SHARE of the last
+# MONTHLY_WINDOW whole months, and annual when it shows up in the same
+# calendar month in at least ANNUAL_MIN_YEARS different years
+MONTHLY_WINDOW = 12
+MONTHLY_MIN_SHARE = 0.75
+ANNUAL_MIN_YEARS = 2
+MIN_HISTORY_MONTHS = 3
+
+RECEITA, DESPESA = 0, 1
+KINDS = ("receita", "despesa")
+
+
+def _local_days(values: list, tz: Optional[str]) -> np.ndarray:
+    # Stored datetimes are naive UTC; days are counted in the user's calendar
+    if not values:
+        return np.array([], dtype="datetime64[D]")
+    index = pd.DatetimeIndex(values)
+    if tz:
+        index = index.tz_localize("UTC").tz_convert(tz).tz_localize(None)
+    return index.values.astype("datetime64[D]")
+
+
+def build_payload(
+    user_id: str,
+    receitas: List[dict],
+    despesas: List[dict],
+    dividas: List[dict],
+    saldo_inicial: float,
+    today: date,
+    months: int,
+    tz: Optional[str] = None,
+) -> dict:
+    """Columns for `project` from Mongo documents.
+
+    Revenues are keyed by cultura and expenses by categoria; debts need
+    vencimento and valor.
+    """
+    flows = receitas + despesas
+    return {
+        "user_id": user_id,
+        "today": np.datetime64(today, "D"),
+        "months": months,
+        "saldo_inicial": float(saldo_inicial),
+        "kind": np.repeat(np.array([RECEITA, DESPESA], dtype="int8"), [len(receitas), len(despesas)]),
+        "chave": np.array(
+            [d.get("cultura") or "Outro" for d in receitas] + [d.get("categoria") or "Outro" for d in despesas],
+            dtype=object,
+        ),
+        "data": _local_days([d["data"] for d in flows], tz),
+        "valor": np.array([d["valor"] for d in flows], dtype="float64"),
+        "divida_vencimento": _local_days([d["vencimento"] for d in dividas], tz),
+        "divida_valor": np.array([d["valor"] for d in dividas], dtype="float64"),
+    }
+
+
+def _group_median(groups: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    # Median of `values` per group id in [0, size); NaN for empty groups
+    order = np.lexsort((values, groups))
+    ordered = values[order].astype("float64")
+    counts = np.bincount(groups, minlength=size)
+    starts = np.cumsum(counts) - counts
+    present = counts > 0
+    median = np.full(size, np.nan)
+    low = starts[present] + (counts[present] - 1) // 2
+    high = starts[present] + counts[present] // 2
+    median[present] = (ordered[low] + ordered[high]) / 2
+    return median
+
+
+def _count_distinct(groups: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    # Number of distinct non-negative `values` per group id
+    if not len(groups):
+        return np.zeros(size, dtype="int64")
+    base = int(values.max()) + 1
+    return np.bincount(np.unique(groups * base + values) // base, minlength=size)
+
+
+def empty_patterns() -> dict:
+    return {
+        "kind": np.array([], dtype="int64"),
+        "chave": np.array([], dtype=object),
+        "frequencia": np.array([], dtype=object),
+        "mes": np.array([], dtype="int64"),
+        "dia": np.array([], dtype="int64"),
+        "valor": np.array([], dtype="float64"),
+    }
+
+
+def infer_recurring(kind: np.ndarray, chave: np.ndarray, data: np.ndarray, valor: np.ndarray, today: np.datetime64) -> dict:
+    """Monthly and annual patterns in past flows, as columns.
+
+    One pattern per (kind, chave) for monthly flows and per (kind, chave,
+    calendar month) for annual ones (`mes` 0-11, -1 for monthly). `valor` is
+    the expected amount per occurrence: the monthly average over the window
+    for monthly flows (months without the flow count as zero), the average
+    per year seen for annual ones. `dia` is the median day of month.
+    """
+    this_month = today.astype("datetime64[M]").astype("int64")
+    months = data.astype("datetime64[M]")
+    month_abs = months.astype("int64")
+    # Whole months only: the current one is still being written
+    past = month_abs < this_month
+    if not past.any() or this_month - month_abs[past].min() < MIN_HISTORY_MONTHS:
+        return empty_patterns()
+
+    # Grouping on integer ids: kind * len(names) + chave code
+    codes, names = pd.factorize(chave[past])
+    keys = kind[past].astype("int64") * len(names) + codes
+    size = 2 * len(names)
+    month_abs = month_abs[past]
+    dia = (data[past] - months[past].astype("datetime64[D]")).astype("int64") + 1
+    valor = valor[past]
+
+    window = int(min(MONTHLY_WINDOW, this_month - month_abs.min()))
+    recent = month_abs >= this_month - window
+    seen_months = _count_distinct(keys[recent], this_month - month_abs[recent], size)
+    monthly = np.flatnonzero(seen_months >= math.ceil(MONTHLY_MIN_SHARE * window))
+    monthly_total = np.bincount(keys[recent], weights=valor[recent], minlength=size)
+    monthly_dia = _group_median(keys[recent], dia[recent], size)
+
+    # Everything not already monthly may still come back every year (harvest sales)
+    rest = ~np.isin(keys, monthly)
+    annual_keys = keys[rest] * 12 + month_abs[rest] % 12
+    years = _count_distinct(annual_keys, month_abs[rest] // 12, size * 12)
+    annual = np.flatnonzero(years >= ANNUAL_MIN_YEARS)
+    annual_total = np.bincount(annual_keys, weights=valor[rest], minlength=size * 12)
+    annual_dia = _group_median(annual_keys, dia[rest], size * 12)
+
+    pattern_keys = np.concatenate((monthly, annual // 12))
+    return {
+        "kind": pattern_keys // len(names),
+        "chave": np.asarray(names, dtype=object)[pattern_keys % len(names)],
+        "frequencia": np.array(["mensal"] * len(monthly) + ["anual"] * len(annual), dtype=object),
+        "mes": np.concatenate((np.full(len(monthly), -1), annual % 12)).astype("int64"),
+        "dia": np.rint(np.concatenate((monthly_dia[monthly], annual_dia[annual]))).astype("int64"),
+        "valor": np.concatenate((monthly_total[monthly] / window, annual_total[annual] / years[annual])),
+    }
+
+
+def _shortfalls(saldo: np.ndarray, today: np.datetime64) -> List[dict]:
+    negative = np.concatenate(([0], (saldo < 0).astype("int8"), [0]))
+    edges = np.diff(negative)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    windows = []
+    for start, end in zip(starts, ends):
+        lowest = start + int(np.argmin(saldo[start:end]))
+        windows.append({
+            "inicio": str(today + start),
+            "fim": str(today + end - 1),
+            "dias": int(end - start),
+            "menor_saldo": round(float(saldo[lowest]), 2),
+            "data_menor_saldo": str(today + lowest),
+        })
+    return windows
+
+
+def project(payload: dict, patterns: Optional[dict] = None) -> dict:
+    """Project the payload's user `months` months ahead from `today`."""
+    today = payload["today"]
+    if patterns is None:
+        patterns = infer_recurring(payload["kind"], payload["chave"], payload["data"], payload["valor"], today)
+    end = np.datetime64((pd.Timestamp(today) + pd.DateOffset(months=payload["months"])).date(), "D")
+    n = int((end - today).astype("int64"))
+    entradas, saidas = np.zeros(n), np.zeros(n)
+
+    # Pending debts on their due dates; overdue ones are due now
+    offsets = np.maximum((payload["divida_vencimento"] - today).astype("int64"), 0)
+    in_range = offsets < n
+    saidas += np.bincount(offsets[in_range], weights=payload["divida_valor"][in_range], minlength=n)
+
+    if len(patterns["kind"]):
+        # Occurrences of every pattern in every month touching the range:
+        # a patterns x months grid of dates, masked to the active cells
+        first_month = today.astype("datetime64[M]")
+        month_starts = np.arange(first_month, first_month + payload["months"] + 1)
+        month_days = month_starts.astype("datetime64[D]")
+        month_lengths = ((month_starts + 1).astype("datetime64[D]") - month_days).astype("int64")
+
+        dia = patterns["dia"][:, None]
+        mes = patterns["mes"][:, None]
+        dates = month_days[None, :] + (np.minimum(dia, month_lengths[None, :]) - 1)
+        cells = (dates - today).astype("int64")
+        active = (mes < 0) | (month_starts.astype("int64")[None, :] % 12 == mes)
+        active &= (cells >= 0) & (cells < n)
+
+        amounts = np.broadcast_to(patterns["valor"][:, None], cells.shape)
+        receita = np.broadcast_to((patterns["kind"] == RECEITA)[:, None], cells.shape)
+        entradas += np.bincount(cells[active & receita], weights=amounts[active & receita], minlength=n)
+        saidas += np.bincount(cells[active & ~receita], weights=amounts[active & ~receita], minlength=n)
+
+    saldo = payload["saldo_inicial"] + np.cumsum(entradas - saidas)
+
+    # Per calendar month of the range
+    day_months = (today + np.arange(n)).astype("datetime64[M]")
+    codes = (day_months - day_months[0]).astype("int64")
+    last_days = np.flatnonzero(np.diff(codes, append=codes[-1] + 1))
+
+    lowest = int(np.argmin(saldo))
+    return {
+        "inicio": str(today),
+        "fim": str(end - 1),
+        "saldo_inicial": round(payload["saldo_inicial"], 2),
+        "saldo": np.round(saldo, 2).tolist(),
+        "mensal": {
+            "buckets": [str(m) for m in day_months[last_days]],
+            "entradas": np.round(np.bincount(codes, weights=entradas), 2).tolist(),
+            "saidas": np.round(np.bincount(codes, weights=saidas), 2).tolist(),
+            "saldo_final": np.round(saldo[last_days], 2).tolist(),
+        },
+        "saldo_minimo": {"valor": round(float(saldo[lowest]), 2), "data": str(today + lowest)},
+        "janelas_deficit": _shortfalls(saldo, today),
+        "recorrencias": [
+            {
+                "tipo": KINDS[kind],
+                "chave": chave,
+                "frequencia": frequencia,
+                "mes": mes + 1 if mes >= 0 else None,
+                "dia": dia,
+                "valor": round(valor, 2),
+            }
+            for kind, chave, frequencia, mes, dia, valor in zip(*(
+                patterns[column].tolist() for column in ("kind", "chave", "frequencia", "mes", "dia", "valor")
+            ))
+        ],
+        "dividas": {
+            "count": int(in_range.sum()),
+            "total": round(float(payload["divida_valor"][in_range].sum()), 2),
+        },
+    }
@@ -0,0 +1,296 @@
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== PROVIDERS ====================
+
+class QuotationProvider(abc.ABC):
+    """Source of B3 quotations. `fetch` returns the list served by /api/quotations/b3."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def fetch(self) -> List[dict]:
+        raise NotImplementedError
+
+
+class MockProvider(QuotationProvider):
+    """Random walk around fixed base prices - In production, integrate with real B3 API."""
+
+    name = "mock"
+
+    # Commodities agrícolas
+    base_prices = {
+        "Soja": 130.50,
+        "Milho": 65.20,
+        "Trigo": 95.80,
+        "Algodão": 180.30,
+        "Aveia": 45.60
+    }
+    dolar_base = 5.85
+
+    async def fetch(self) -> List[dict]:
+        now = datetime.utcnow().isoformat()
+        quotations = []
+
+        for produto, base_price in self.base_prices.items():
+            variation = random.uniform(-5, 5)
+            current_price = base_price * (1 + variation / 100)
+            quotations.append({
+                "produto": produto,
+                "preco": round(current_price, 2),
+                "variacao": round(variation, 2),
+                "unidade": "R$/sc",
+                "data": now
+            })
+
+        # Dólar (USDBRL) vem primeiro na lista
+        dolar_variation = random.uniform(-2, 2)
+        dolar_price = self.dolar_base * (1 + dolar_variation / 100)
+        quotations.insert(0, {
+            "produto": "Dólar (USDBRL)",
+            "preco": round(dolar_price, 4),
+            "variacao": round(dolar_variation, 2),
+            "unidade": "R$",
+            "data": now
+        })
+
+        return quotations
+
+
+class FixtureProvider(QuotationProvider):
+    """Serves a JSON list of quotations from disk, re-read on every fetch."""
+
+    name = "fixture"
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    async def fetch(self) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read)
+
+    def _read(self) -> List[dict]:
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def provider_from_env(name: str, fixture_path: Optional[str] = None) -> QuotationProvider:
+    if name == "mock":
+        return MockProvider()
+    if name == "fixture":
+        if not fixture_path:
+            raise ValueError("QUOTATIONS_FIXTURE must point to a JSON file for the fixture provider")
+        return FixtureProvider(Path(fixture_path))
+    raise ValueError(f"Unknown quotations provider: {name}")
+
+
+# ==================== FEED ====================
+
+class QuotationSnapshot:
+    """One provider fetch, pre-encoded once and shared by every client."""
+
+    def __init__(self, quotations: List[dict], fetched_at: datetime):
+        self.quotations = quotations
+        self.fetched_at = fetched_at
+        self.body = json.dumps(quotations, ensure_ascii=False).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        self.monotonic = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.monotonic
+
+
+class QuotationFeed:
+    """Shared in-memory quotation snapshot refreshed from a provider.
+
+    The server's scheduler calls `refresh` every `interval` seconds in each
+    worker. Readers always get the current snapshot; when it is older than
+    `interval` (the refresh job is late or failing) one revalidation is
+    started in the background and the stale snapshot is served meanwhile.
+    Only past `max_stale` seconds, or before the first fetch, do readers wait
+    for the provider. Concurrent refreshes are coalesced into a single
+    provider call.
+    """
+
+    def __init__(self, provider: QuotationProvider, interval: float = 60.0, max_stale: float = 3600.0):
+        self.provider = provider
+        self.interval = interval
+        self.max_stale = max_stale
+        self.snapshot: Optional[QuotationSnapshot] = None
+        self.listeners: List[Callable] = []
+        self.fetches = 0
+        self._inflight: Optional[asyncio.Task] = None
+
+    def add_listener(self, callback: Callable):
+        """Register an async callback called with each new snapshot."""
+        self.listeners.append(callback)
+
+    async def _fetch(self) -> QuotationSnapshot:
+        quotations = await self.provider.fetch()
+        self.fetches += 1
+        snapshot = QuotationSnapshot(quotations, datetime.utcnow())
+        self.snapshot = snapshot
+        for callback in self.listeners:
+            try:
+                await callback(snapshot)
+            except Exception:
+                logger.exception("Quotation snapshot listener failed")
+        return snapshot
+
+    def refresh(self) -> "asyncio.Task":
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch())
+            self._inflight.add_done_callback(self._log_failure)
+        return self._inflight
+
+    async def get(self) -> QuotationSnapshot:
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.age() > self.max_stale:
+            try:
+                return await asyncio.shield(self.refresh())
+            except Exception:
+                # Already logged; a very stale price beats no price at all
+                if snapshot is None:
+                    raise
+                return snapshot
+        if snapshot.age() > self.interval:
+            self.refresh()
+        return snapshot
+
+    @staticmethod
+    def _log_failure(task: "asyncio.Task"):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Quotation refresh failed: {task.exception()}")
+
+
+# ==================== HISTORY ====================
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def truncate_expression(field: str, unit: str) -> dict:
+    # Start of the UTC minute/hour of `field`. $dateTrunc would need MongoDB
+    # 5.0, the same servers that have time-series collections; this works on
+    # the plain-collection fallback too
+    parts = {"year": {"$year": field}, "month": {"$month": field}, "day": {"$dayOfMonth": field}, "hour": {"$hour": field}}
+    if unit == "minute":
+        parts["minute"] = {"$minute": field}
+    return {"$dateFromParts": parts}
+
+
+class QuotationHistory:
+    """Persists every snapshot and serves OHLC series over arbitrary ranges.
+
+    Raw ticks go to a Mongo time-series collection (`quotation_ticks`, kept
+    for `tick_retention_days`) and are folded on write into daily and weekly
+    OHLC documents in `quotation_ohlc`, so day/week charts read one small
+    document per bucket instead of scanning ticks. Minute/hour series are
+    downsampled from the ticks. Servers without time-series collections
+    (MongoDB < 5.0) get a plain collection with a TTL index instead.
+    """
+
+    ROLLUP_GRANULARITIES = ("day", "week")
+    TICK_GRANULARITIES = ("minute", "hour")
+
+    def __init__(self, db, tick_retention_days: int = 90):
+        self.ticks = db.quotation_ticks
+        self.ohlc = db.quotation_ohlc
+        self.db = db
+        self.tick_retention_days = tick_retention_days
+
+    async def setup(self):
+        try:
+            await self.db.create_collection(
+                "quotation_ticks",
+                timeseries={"timeField": "ts", "metaField": "produto", "granularity": "minutes"},
+                expireAfterSeconds=self.tick_retention_days * 86400
+            )
+        except CollectionInvalid:
+            pass  # already exists
+        except OperationFailure as e:
+            # Servers without time-series support get a plain collection
+            logger.warning(f"Time-series collections unavailable, using a regular collection: {e}")
+            await self.ticks.create_index("ts", expireAfterSeconds=self.tick_retention_days * 86400, name="ts_ttl")
+        await self.ticks.create_index([("produto", ASCENDING), ("ts", ASCENDING)], name="produto_ts")
+        await self.ohlc.create_index(
+            [("produto", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)],
+            unique=True, name="produto_granularity_bucket"
+        )
+
+    async def record(self, snapshot: "QuotationSnapshot"):
+        ts = snapshot.fetched_at
+        await self.ticks.insert_many([
+            {"ts": ts, "produto": q["produto"], "preco": q["preco"], "variacao": q.get("variacao")}
+            for q in snapshot.quotations
+        ])
+        await self.ohlc.bulk_write([
+            UpdateOne(
+                {"produto": q["produto"], "granularity": granularity, "bucket": bucket_start(ts, granularity)},
+                {
+                    "$setOnInsert": {"open": q["preco"], "first_ts": ts},
+                    "$max": {"high": q["preco"]},
+                    "$min": {"low": q["preco"]},
+                    "$set": {"close": q["preco"], "last_ts": ts},
+                    "$inc": {"count": 1}
+                },
+                upsert=True
+            )
+            for q in snapshot.quotations
+            for granularity in self.ROLLUP_GRANULARITIES
+        ], ordered=False)
+
+    async def series(self, produto: str, interval: str, start: datetime, end: datetime, limit: int = 5000) -> dict:
+        if interval in self.ROLLUP_GRANULARITIES:
+            docs = await self.ohlc.find(
+                {"produto": produto, "granularity": interval,
+                 "bucket": {"$gte": bucket_start(start, interval), "$lte": end}},
+                {"_id": 0, "bucket": 1, "open": 1, "high": 1, "low": 1, "close": 1}
+            ).sort("bucket", ASCENDING).to_list(limit)
+        elif interval in self.TICK_GRANULARITIES:
+            docs = await self.ticks.aggregate([
+                {"$match": {"produto": produto, "ts": {"$gte": start, "$lte": end}}},
+                {"$sort": {"ts": 1}},
+                {"$group": {
+                    "_id": truncate_expression("$ts", interval),
+                    "open": {"$first": "$preco"},
+                    "high": {"$max": "$preco"},
+                    "low": {"$min": "$preco"},
+                    "close": {"$last": "$preco"},
+                }},
+                {"$sort": {"_id": 1}},
+                {"$limit": limit},
+                {"$project": {"_id": 0, "bucket": "$_id", "open": 1, "high": 1, "low": 1, "close": 1}},
+            ], allowDiskUse=True).to_list(limit)
+        else:
+            raise ValueError(f"Unknown interval: {interval}")
+
+        # Parallel arrays keep long series compact on the wire
+        return {
+            "produto": produto,
+            "interval": interval,
+            "t": [d["bucket"].isoformat() for d in docs],
+            "open": [d["open"] for d in docs],
+            "high": [d["high"] for d in docs],
+            "low": [d["low"] for d in docs],
+            "close": [d["close"] for d in docs],
+        }
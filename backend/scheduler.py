@@ -0,0 +1,368 @@
+"""
+In-process scheduler for periodic jobs.
+
+Every API worker runs the scheduler, one asyncio task per job. Exclusive jobs
+(the default) coordinate through a lease store: the job's next run time lives
+in the store, and a worker only runs the job if it manages to advance that
+time while nobody holds the lease. Each run therefore happens once across
+all workers and replicas, and a run that outlasts its interval is never
+overlapped. Local jobs (exclusive=False) run in every process, for
+per-process work such as refreshing an in-memory cache.
+
+Time comes from a clock object so tests can drive the scheduler with
+FakeClock and MemoryLeaseStore (or MongoLeaseStore on a Mongo stand-in).
+"""
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+# ==================== CLOCKS ====================
+
+class SystemClock:
+    def now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(max(seconds, 0.0))
+
+
+class FakeClock:
+    """Clock that only moves when told to. Sleepers wake as advance() passes their deadline."""
+
+    def __init__(self, start: datetime):
+        self._now = start
+        self._elapsed = 0.0
+        self._sleepers: List[tuple] = []
+
+    def now(self) -> datetime:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    async def sleep(self, seconds: float):
+        future = asyncio.get_running_loop().create_future()
+        self._sleepers.append((self._elapsed + max(seconds, 0.0), future))
+        await future
+
+    def _move_to(self, elapsed: float):
+        self._now += timedelta(seconds=elapsed - self._elapsed)
+        self._elapsed = elapsed
+
+    async def advance(self, seconds: float):
+        """Move time forward, waking sleepers in deadline order and letting each settle."""
+        target = self._elapsed + seconds
+        while True:
+            await settle()
+            self._sleepers = [s for s in self._sleepers if not s[1].done()]
+            due = [s for s in self._sleepers if s[0] <= target]
+            if not due:
+                break
+            deadline = min(d for d, _ in due)
+            self._move_to(max(deadline, self._elapsed))
+            for entry in [s for s in due if s[0] <= deadline]:
+                self._sleepers.remove(entry)
+                entry[1].set_result(None)
+        self._move_to(target)
+        await settle()
+
+
+async def settle(rounds: int = 50):
+    # Let ready tasks run through their pending awaits
+    for _ in range(rounds):
+        await asyncio.sleep(0)
+
+
+# ==================== SCHEDULES ====================
+
+class Interval:
+    """Every `seconds`, plus up to `jitter` random seconds per run."""
+
+    def __init__(self, seconds: float, jitter: float = 0.0):
+        if seconds <= 0:
+            raise ValueError("Interval must be positive")
+        self.seconds = seconds
+        self.jitter = jitter
+
+    def next_after(self, moment: datetime) -> datetime:
+        return moment + timedelta(seconds=self.seconds)
+
+    def __str__(self):
+        return f"every {self.seconds:g}s" + (f" +{self.jitter:g}s jitter" if self.jitter else "")
+
+
+class Cron:
+    """Five-field cron expression (minute hour day-of-month month day-of-week) in `tz`.
+
+    Fields take `*`, numbers, ranges (`1-5`), lists (`1,15`) and steps (`*/10`,
+    `8-18/2`). Day of week counts from Sunday = 0 (7 is also Sunday). As in
+    cron, when both day fields are restricted a day matching either runs.
+    """
+
+    BOUNDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str, tz: tzinfo = timezone.utc, jitter: float = 0.0):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.tz = tz
+        self.jitter = jitter
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.BOUNDS)
+        )
+        self.weekdays = {d % 7 for d in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> set:
+        values = set()
+        for part in field.split(","):
+            spec, _, step = part.partition("/")
+            if spec == "*":
+                start, end = low, high
+            elif "-" in spec:
+                start, end = (int(v) for v in spec.split("-", 1))
+            else:
+                start = end = int(spec)
+            if start < low or end > high or start > end:
+                raise ValueError(f"Cron field out of range: {part!r}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        local = moment.astimezone(self.tz).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = local + timedelta(days=5 * 366)
+        while local < limit:
+            if local.month not in self.months:
+                year, month = (local.year + 1, 1) if local.month == 12 else (local.year, local.month + 1)
+                local = local.replace(year=year, month=month, day=1, hour=0, minute=0)
+            elif not self._day_matches(local):
+                local = (local + timedelta(days=1)).replace(hour=0, minute=0)
+            elif local.hour not in self.hours:
+                local = (local + timedelta(hours=1)).replace(minute=0)
+            elif local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+            else:
+                return local.astimezone(timezone.utc)
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+    def __str__(self):
+        return f"cron '{self.expression}' {self.tz}" + (f" +{self.jitter:g}s jitter" if self.jitter else "")
+
+
+# ==================== LEASES ====================
+
+class MemoryLeaseStore:
+    """Leases for a single process (local jobs, tests)."""
+
+    def __init__(self):
+        self.leases: Dict[str, dict] = {}
+
+    async def ensure(self, name: str, next_run_at: datetime):
+        self.leases.setdefault(name, {"next_run_at": next_run_at, "locked_until": EPOCH, "owner": None})
+
+    async def next_run_at(self, name: str) -> datetime:
+        return self.leases[name]["next_run_at"]
+
+    async def claim(self, name: str, owner: str, now: datetime, following: datetime, locked_until: datetime) -> bool:
+        lease = self.leases[name]
+        if lease["next_run_at"] > now or lease["locked_until"] > now:
+            return False
+        lease.update(next_run_at=following, locked_until=locked_until, owner=owner)
+        return True
+
+    async def release(self, name: str, owner: str, now: datetime):
+        lease = self.leases[name]
+        if lease["owner"] == owner:
+            lease["locked_until"] = now
+
+
+def _utc(value: datetime) -> datetime:
+    # Mongo hands back naive UTC datetimes
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class MongoLeaseStore:
+    """Leases shared by every worker and replica, one document per job."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure(self, name: str, next_run_at: datetime):
+        try:
+            await self.collection.update_one(
+                {"_id": name},
+                {"$setOnInsert": {"next_run_at": next_run_at, "locked_until": EPOCH, "owner": None}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass  # another worker created it first
+
+    async def next_run_at(self, name: str) -> datetime:
+        doc = await self.collection.find_one({"_id": name}, {"next_run_at": 1})
+        return _utc(doc["next_run_at"])
+
+    async def claim(self, name: str, owner: str, now: datetime, following: datetime, locked_until: datetime) -> bool:
+        doc = await self.collection.find_one_and_update(
+            {"_id": name, "next_run_at": {"$lte": now}, "locked_until": {"$lte": now}},
+            {"$set": {"next_run_at": following, "locked_until": locked_until, "owner": owner}}
+        )
+        return doc is not None
+
+    async def release(self, name: str, owner: str, now: datetime):
+        await self.collection.update_one({"_id": name, "owner": owner}, {"$set": {"locked_until": now}})
+
+
+# ==================== SCHEDULER ====================
+
+class Job:
+    def __init__(self, name: str, func: Callable[[], Awaitable], schedule, exclusive: bool, timeout: float, run_at_start: bool):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.exclusive = exclusive
+        self.timeout = timeout
+        self.run_at_start = run_at_start
+        self.next_run_at: Optional[datetime] = None
+        self.metrics = {
+            "runs": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "skipped": 0,  # due, but another worker ran it or still holds the lease
+            "last_started_at": None,
+            "last_duration": None,
+            "max_duration": 0.0,
+            "total_duration": 0.0,
+            "last_error": None,
+        }
+
+
+class Scheduler:
+    # Lease held past the job timeout, so a slow-to-cancel run keeps it
+    LEASE_MARGIN = 30.0
+
+    def __init__(self, leases, owner: str, clock=None, poll_interval: float = 5.0, rng: Optional[random.Random] = None):
+        self.leases = leases
+        self.local_leases = MemoryLeaseStore()
+        self.owner = owner
+        self.clock = clock or SystemClock()
+        self.poll_interval = poll_interval
+        self.rng = rng or random.Random()
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable],
+        schedule,
+        exclusive: bool = True,
+        timeout: float = 300.0,
+        run_at_start: bool = False,
+    ) -> Job:
+        if name in self.jobs:
+            raise ValueError(f"Job already registered: {name}")
+        job = Job(name, func, schedule, exclusive, timeout, run_at_start)
+        self.jobs[name] = job
+        return job
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._loop(job), name=f"job:{job.name}") for job in self.jobs.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            job.name: {
+                "schedule": str(job.schedule),
+                "exclusive": job.exclusive,
+                "next_run_at": job.next_run_at,
+                **job.metrics,
+                "avg_duration": job.metrics["total_duration"] / job.metrics["runs"] if job.metrics["runs"] else None,
+            }
+            for job in self.jobs.values()
+        }
+
+    def _next_time(self, job: Job, after: datetime) -> datetime:
+        jitter = self.rng.uniform(0, job.schedule.jitter) if job.schedule.jitter else 0.0
+        return job.schedule.next_after(after) + timedelta(seconds=jitter)
+
+    async def _loop(self, job: Job):
+        store = self.leases if job.exclusive else self.local_leases
+        ensured = False
+        while True:
+            try:
+                now = self.clock.now()
+                if not ensured:
+                    await store.ensure(job.name, now if job.run_at_start else self._next_time(job, now))
+                    ensured = True
+                job.next_run_at = await store.next_run_at(job.name)
+                if job.next_run_at > now:
+                    await self.clock.sleep((job.next_run_at - now).total_seconds())
+                    continue
+
+                locked_until = now + timedelta(seconds=job.timeout + self.LEASE_MARGIN)
+                if not await store.claim(job.name, self.owner, now, self._next_time(job, now), locked_until):
+                    job.metrics["skipped"] += 1
+                    await self.clock.sleep(self.poll_interval)
+                    continue
+
+                await self._execute(job)
+                await store.release(job.name, self.owner, self.clock.now())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Lease store unreachable and the like: try again shortly
+                logger.exception(f"Scheduler loop for {job.name} failed")
+                await self.clock.sleep(self.poll_interval)
+
+    async def _execute(self, job: Job):
+        metrics = job.metrics
+        metrics["last_started_at"] = self.clock.now()
+        started = self.clock.monotonic()
+        try:
+            await asyncio.wait_for(job.func(), timeout=job.timeout)
+            metrics["last_error"] = None
+        except asyncio.TimeoutError:
+            metrics["failures"] += 1
+            metrics["timeouts"] += 1
+            metrics["last_error"] = f"timed out after {job.timeout:g}s"
+            logger.error(f"Job {job.name} timed out after {job.timeout:g}s")
+        except Exception as e:
+            metrics["failures"] += 1
+            metrics["last_error"] = repr(e)
+            logger.exception(f"Job {job.name} failed")
+        finally:
+            duration = self.clock.monotonic() - started
+            metrics["runs"] += 1
+            metrics["last_duration"] = duration
+            metrics["total_duration"] += duration
+            metrics["max_duration"] = max(metrics["max_duration"], duration)
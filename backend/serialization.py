@@ -0,0 +1,74 @@
+"""
+JSON encoding for API responses.
+
+Handlers return plain dicts straight from Mongo (ObjectId, datetime). Rather
+than walking them with jsonable_encoder and the stdlib encoder, responses are
+encoded in one pass by orjson when it is installed, falling back to the
+stdlib with a `default` hook otherwise. Both produce the same JSON: naive
+datetimes as isoformat() without offset, ObjectIds as hex strings, NaN and
+Infinity as null, and a TypeError for dict keys that aren't strings.
+"""
+
+import json
+import math
+from datetime import date, datetime
+
+from bson import ObjectId
+from starlette.responses import JSONResponse
+
+from timing import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _orjson_compatible(value):
+    # The stdlib writes NaN/Infinity literals and stringifies int, float, bool
+    # and None keys; orjson writes null and rejects such keys
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        for key in value:
+            if not isinstance(key, str):
+                raise TypeError("Dict key must be str")
+        return {k: _orjson_compatible(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_orjson_compatible(v) for v in value]
+    return value
+
+
+def _dumps_stdlib(content) -> bytes:
+    return json.dumps(
+        _orjson_compatible(content), default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _dumps_orjson(content) -> bytes:
+    # orjson handles datetime natively; `default` only sees ObjectId
+    return orjson.dumps(content, default=_default)
+
+
+dumps = _dumps_orjson if orjson is not None else _dumps_stdlib
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`.
+
+    Set as the app's default response class, so every route renders through
+    it. Handlers on hot paths return it directly, which also skips FastAPI's
+    jsonable_encoder pass over the content.
+    """
+
+    def render(self, content) -> bytes:
+        with span("encode"):
+            return dumps(content)
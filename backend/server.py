@@ -1,26 +1,61 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from fastapi.responses import Response, StreamingResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import io
+import csv
+import json
+import base64
+import socket
+import hmac
+import hashlib
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
-from datetime import datetime, timedelta
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import List, Optional, Tuple
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+from urllib.parse import unquote
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from email.utils import format_datetime, parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
 import bcrypt
 import jwt
 from bson import ObjectId
+from pymongo import UpdateOne, IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError, OperationFailure, BulkWriteError, DuplicateKeyError
+from cache import TTLCache
+from quotations import QuotationFeed, QuotationHistory, provider_from_env
+from weather import WeatherService, provider_from_env as weather_provider_from_env
+from projection import build_payload, project
+from valuation import HARVEST_COLUMNS, closes_frame, harvests_frame, value_harvests
+from serialization import FastJSONResponse, dumps
+from compression import CompressionMiddleware
+from scheduler import Cron, Interval, MongoLeaseStore, Scheduler
+from timing import TimingMiddleware, span
+from metrics import MetricsMiddleware, MongoCommandMetrics, MongoPoolMetrics, mark_process_dead, render as render_metrics
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection; the listeners feed /metrics (see metrics.py)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics(), MongoPoolMetrics()])
 db = client[os.environ['DB_NAME']]
 
+# Password hashing: bcrypt runs in a bounded thread pool (it releases the GIL)
+# so a burst of logins doesn't stall the event loop for everyone else
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+BCRYPT_MAX_WORKERS = int(os.environ.get('BCRYPT_MAX_WORKERS', os.cpu_count() or 2))
+bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_MAX_WORKERS, thread_name_prefix="bcrypt")
+
 # JWT Configuration
 SECRET_KEY = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
@@ -29,8 +64,35 @@ ACCESS_TOKEN_EXPIRE_DAYS = 30
 # Security
 security = HTTPBearer()
 
-# Create the main app without a prefix
-app = FastAPI()
+# Authenticated user documents are cached per process; call invalidate_user()
+# after changing a user's profile or plan. With AUTH_TRUST_TOKEN_CLAIMS the
+# signed claims in the token are used as-is and the lookup is skipped entirely,
+# at the cost of plan changes only showing up on the next login: a trial expired
+# by the users.expire_trials job still reads "trial" until its token is
+# replaced (up to ACCESS_TOKEN_EXPIRE_DAYS). Anything gated on the plan must
+# read it from db.users rather than from current_user in that mode. Tokens only
+# carry sub, name and plan: endpoints needing contact details (email, phone)
+# or the trial end get the full document from user_profile().
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get('AUTH_TRUST_TOKEN_CLAIMS', '').lower() in ('1', 'true', 'yes')
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Set by /api/batch while it dispatches its operations, which were all
+# authenticated once with the batch request itself
+batch_user: ContextVar[Optional[dict]] = ContextVar("batch_user", default=None)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # startup() and shutdown() are at the bottom of this module
+    await startup()
+    yield
+    await shutdown()
+
+# Create the main app without a prefix. Responses are encoded with orjson
+# (see serialization.py); list-style handlers return FastJSONResponse directly
+# so their Mongo documents skip jsonable_encoder as well.
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -75,6 +137,7 @@ class Expense(BaseModel):
     data: datetime
     descricao: Optional[str] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
 class RevenueCreate(BaseModel):
     valor: float
@@ -92,6 +155,7 @@ class Revenue(BaseModel):
     data: datetime
     descricao: Optional[str] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
 class DebtCreate(BaseModel):
     valor: float
@@ -111,6 +175,7 @@ class Debt(BaseModel):
     status: str
     descricao: Optional[str] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
 class FieldCreate(BaseModel):
     nome: str
@@ -126,6 +191,7 @@ class Field(BaseModel):
     cultura: str
     localizacao: Optional[str] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
 class HarvestCreate(BaseModel):
     field_id: str
@@ -146,6 +212,14 @@ class Harvest(BaseModel):
     data_colheita: datetime
     observacoes: Optional[str] = None
     created_at: datetime
+    updated_at: Optional[datetime] = None
+
+class BatchOperation(BaseModel):
+    path: str  # e.g. "/api/fields?fields=nome,area_ha"
+    if_none_match: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
 
 
 # ==================== AUTH HELPERS ====================
@@ -157,16 +231,47 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def token_claims(user_id: str, user: dict) -> dict:
+    # Tokens are readable by anyone holding them: no contact details
+    return {
+        "sub": user_id,
+        "name": user["name"],
+        "plan": user.get("plan", "trial"),
+    }
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def user_from_claims(payload: dict) -> dict:
+    return {
+        "_id": ObjectId(payload["sub"]),
+        "name": payload["name"],
+        "plan": payload["plan"],
+    }
+
+def invalidate_user(user_id: str):
+    user_cache.invalidate(user_id)
+
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(bcrypt_executor, _hash_password, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(bcrypt_executor, _verify_password, plain_password, hashed_password)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    preauthenticated = batch_user.get()
+    if preauthenticated is not None:
+        return preauthenticated
+    
     token = credentials.credentials
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with span("auth"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -175,12 +280,371 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
+    if AUTH_TRUST_TOKEN_CLAIMS and "plan" in payload:
+        return user_from_claims(payload)
     
+    return await load_user(user_id)
+
+async def load_user(user_id: str) -> dict:
+    user = user_cache.get(user_id)
+    if user is None:
+        with span("auth_db"):
+            user = await db.users.find_one({"_id": ObjectId(user_id)})
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache.set(user_id, user)
     return user
 
+async def user_profile(current_user: dict) -> dict:
+    # current_user built from trusted token claims lacks the contact fields
+    if "email" in current_user:
+        return current_user
+    return await load_user(str(current_user["_id"]))
+
+
+# ==================== ROLLUPS ====================
+
+# Per-user totals are kept in `user_stats` and updated with $inc by every write
+# handler, so the dashboard and field list read a handful of small documents
+# instead of scanning raw data. One document per (user_id, scope, key):
+#   scope "cultura": receitas/despesas/dividas_pendentes totals and counts per cultura
+#   scope "field":   total_sacas/total_safras per field_id
+#   scope "meta":    `built_at` once the user's rollups have been built;
+#                    `rebuilding_until` while a rebuild holds its lease
+# The pipelines below recompute everything from scratch; they back the lazy
+# build for users created before rollups existed and `manage.py rollups`.
+
+ROLLUP_TOLERANCE = 1e-6
+ROLLUP_REBUILD_LEASE = timedelta(minutes=5)
+ROLLUP_REBUILD_ATTEMPTS = 3
+ROLLUP_METRICS = (
+    "receitas", "receitas_count", "despesas", "despesas_count",
+    "dividas_pendentes", "dividas_pendentes_count", "total_sacas", "total_safras",
+)
+
+def cultura_stats_pipeline(user_id: str) -> list:
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$project": {"_id": 0, "kind": {"$literal": "receitas"}, "cultura": 1, "valor": 1}},
+        {"$unionWith": {"coll": "expenses", "pipeline": [
+            {"$match": {"user_id": user_id}},
+            {"$project": {"_id": 0, "kind": {"$literal": "despesas"}, "cultura": 1, "valor": 1}},
+        ]}},
+        {"$unionWith": {"coll": "debts", "pipeline": [
+            {"$match": {"user_id": user_id, "status": "pendente"}},
+            {"$project": {"_id": 0, "kind": {"$literal": "dividas_pendentes"}, "cultura": 1, "valor": 1}},
+        ]}},
+        {"$group": {
+            "_id": {"kind": "$kind", "cultura": {"$ifNull": ["$cultura", "Outro"]}},
+            "total": {"$sum": "$valor"},
+            "count": {"$sum": 1},
+        }},
+    ]
+
+def field_stats_pipeline(user_id: str) -> list:
+    # Harvest totals for every field of the user in a single $group
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": "$field_id",
+            "total_sacas": {"$sum": "$quantidade_sacas"},
+            "total_safras": {"$sum": 1},
+        }},
+    ]
+
+async def compute_user_stats(user_id: str) -> List[dict]:
+    groups, field_groups, field_ids = await asyncio.gather(
+        db.revenues.aggregate(cultura_stats_pipeline(user_id), allowDiskUse=True).to_list(None),
+        db.harvests.aggregate(field_stats_pipeline(user_id)).to_list(None),
+        db.fields.distinct("_id", {"user_id": user_id}),
+    )
+
+    culturas = {}
+    for group in groups:
+        cultura = group["_id"]["cultura"]
+        kind = group["_id"]["kind"]
+        doc = culturas.setdefault(cultura, {"user_id": user_id, "scope": "cultura", "key": cultura})
+        doc[kind] = group["total"]
+        doc[f"{kind}_count"] = group["count"]
+
+    existing_fields = {str(field_id) for field_id in field_ids}
+    fields = [
+        {"user_id": user_id, "scope": "field", "key": g["_id"],
+         "total_sacas": g["total_sacas"], "total_safras": g["total_safras"]}
+        for g in field_groups if g["_id"] in existing_fields
+    ]
+    return list(culturas.values()) + fields
+
+def stats_built(docs: List[dict]) -> bool:
+    return any(d["scope"] == "meta" and "built_at" in d for d in docs)
+
+def rebuild_deltas(stored: List[dict], expected: List[dict]) -> dict:
+    # (scope, key) -> $inc taking the stored rollups to the expected ones.
+    # Keys no longer in the raw data are zeroed rather than deleted.
+    stored_by_key = {(d["scope"], d["key"]): d for d in stored if d["scope"] != "meta"}
+    expected_by_key = {(d["scope"], d["key"]): d for d in expected}
+    deltas = {}
+    for scope_key in set(stored_by_key) | set(expected_by_key):
+        have, want = stored_by_key.get(scope_key, {}), expected_by_key.get(scope_key, {})
+        inc = {m: want.get(m, 0) - have.get(m, 0) for m in ROLLUP_METRICS if want.get(m, 0) != have.get(m, 0)}
+        if inc:
+            deltas[scope_key] = inc
+    return deltas
+
+async def claim_stats_rebuild(user_id: str) -> bool:
+    now = datetime.utcnow()
+    try:
+        await db.user_stats.update_one(
+            {"user_id": user_id, "scope": "meta", "key": "",
+             "$or": [{"rebuilding_until": {"$exists": False}}, {"rebuilding_until": {"$lt": now}}]},
+            {"$set": {"rebuilding_until": now + ROLLUP_REBUILD_LEASE}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False  # another rebuild holds the lease
+    return True
+
+async def read_user_stats(user_id: str) -> List[dict]:
+    return await db.user_stats.find({"user_id": user_id, "scope": {"$ne": "meta"}}, {"_id": 0}).to_list(None)
+
+async def rebuild_user_stats(user_id: str) -> List[dict]:
+    # Write handlers keep $inc-ing while the pipelines run, and whether the
+    # pipelines saw such a write's document is unknown. So the rollups are
+    # read before and after computing and the computation is retried while
+    # they moved. The stored rollups are then moved to the computed totals
+    # with $inc rather than replaced, so an increment landing after that last
+    # read is kept; only a write caught between its insert and its $inc at
+    # that moment can be off, which `manage.py rollups verify` reports. The
+    # lease keeps concurrent rebuilds (two first reads, a lazy build and
+    # `manage.py`) from applying the same deltas twice.
+    if not await claim_stats_rebuild(user_id):
+        # The lease holder stores the same totals
+        return await compute_user_stats(user_id)
+    built = False
+    try:
+        stored = await read_user_stats(user_id)
+        for _ in range(ROLLUP_REBUILD_ATTEMPTS):
+            docs = await compute_user_stats(user_id)
+            before, stored = stored, await read_user_stats(user_id)
+            if not rebuild_deltas(before, stored):
+                break
+        else:
+            logger.warning(f"Rollups of {user_id} kept changing during the rebuild; run `manage.py rollups verify`")
+        ops = [
+            UpdateOne({"user_id": user_id, "scope": scope, "key": key}, {"$inc": inc}, upsert=True)
+            for (scope, key), inc in rebuild_deltas(stored, docs).items()
+        ]
+        if ops:
+            try:
+                await db.user_stats.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                # Upserts racing a write handler's upsert of the same new key:
+                # the document exists now, so those are applied again
+                if any(err["code"] != 11000 for err in e.details["writeErrors"]):
+                    raise
+                await db.user_stats.bulk_write([ops[err["index"]] for err in e.details["writeErrors"]], ordered=False)
+        built = True
+    finally:
+        update = {"$unset": {"rebuilding_until": ""}}
+        if built:
+            update["$set"] = {"built_at": datetime.utcnow()}
+        await db.user_stats.update_one({"user_id": user_id, "scope": "meta", "key": ""}, update)
+    return docs
+
+async def load_user_stats(user_id: str) -> List[dict]:
+    with span("rollups"):
+        docs = await db.user_stats.find({"user_id": user_id}, {"_id": 0}).to_list(None)
+    if not stats_built(docs):
+        with span("rollups_rebuild"):
+            docs = await rebuild_user_stats(user_id)
+    return [d for d in docs if d["scope"] != "meta"]
+
+async def inc_user_stats(user_id: str, scope: str, key: str, deltas: dict, upsert: bool = True):
+    # Removals pass upsert=False: decrementing data whose rollup was never built
+    # (or was dropped together with its field) must not create a negative document.
+    await db.user_stats.update_one(
+        {"user_id": user_id, "scope": scope, "key": key},
+        {"$inc": deltas},
+        upsert=upsert
+    )
+
+def stats_delta(collection: str, doc: dict):
+    # (scope, key, $inc deltas) that inserting `doc` into `collection` applies
+    if collection == "expenses":
+        return "cultura", doc["cultura"], {"despesas": doc["valor"], "despesas_count": 1}
+    if collection == "revenues":
+        return "cultura", doc["cultura"], {"receitas": doc["valor"], "receitas_count": 1}
+    if collection == "harvests":
+        return "field", doc["field_id"], {"total_sacas": doc["quantidade_sacas"], "total_safras": 1}
+    raise ValueError(f"No rollup for {collection}")
+
+async def apply_stats_deltas(user_id: str, collection: str, docs: List[dict]):
+    # Folds the deltas of many inserted documents into one $inc per rollup key
+    merged = {}
+    for doc in docs:
+        scope, key, deltas = stats_delta(collection, doc)
+        target = merged.setdefault((scope, key), {})
+        for metric, value in deltas.items():
+            target[metric] = target.get(metric, 0) + value
+    if merged:
+        await db.user_stats.bulk_write([
+            UpdateOne({"user_id": user_id, "scope": scope, "key": key}, {"$inc": deltas}, upsert=True)
+            for (scope, key), deltas in merged.items()
+        ], ordered=False)
+
+def diff_user_stats(stored: List[dict], expected: List[dict]) -> List[dict]:
+    def index(docs):
+        return {(d["scope"], d["key"]): d for d in docs}
+
+    stored_by_key, expected_by_key = index(stored), index(expected)
+    drift = []
+    for scope_key in sorted(set(stored_by_key) | set(expected_by_key)):
+        have, want = stored_by_key.get(scope_key, {}), expected_by_key.get(scope_key, {})
+        metrics = {k for k in set(have) | set(want) if k not in ("_id", "user_id", "scope", "key")}
+        for metric in sorted(metrics):
+            a, b = have.get(metric, 0), want.get(metric, 0)
+            if abs(a - b) > ROLLUP_TOLERANCE * max(1.0, abs(b)):
+                drift.append({"scope": scope_key[0], "key": scope_key[1], "metric": metric, "stored": a, "expected": b})
+    return drift
+
+async def verify_user_stats(user_id: str, fix: bool = False) -> Optional[List[dict]]:
+    # Drift between the stored rollups and the raw data; None if never built
+    stored = await db.user_stats.find({"user_id": user_id}, {"_id": 0}).to_list(None)
+    if not stats_built(stored):
+        return None
+    drift = diff_user_stats([d for d in stored if d["scope"] != "meta"], await compute_user_stats(user_id))
+    if drift and fix:
+        await rebuild_user_stats(user_id)
+        # Corrected totals must not be hidden behind cached ETags
+        await bump_versions(user_id, *VERSIONED_COLLECTIONS)
+    return drift
+
+
+# ==================== PAGINATION ====================
+
+# List endpoints return a plain array (capped at LIST_LIMIT) unless `limit` or
+# `after` is passed, in which case they return {"items", "next_cursor"} pages.
+# Pages are keyset-paginated on (date field, _id), so every page is an index
+# range scan no matter how deep the client has scrolled.
+LIST_LIMIT = 1000
+MAX_PAGE_SIZE = 500
+
+def list_params(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    fields: Optional[str] = None
+) -> dict:
+    return {"limit": limit, "after": after, "from": from_, "to": to, "fields": fields}
+
+def parse_fields(fields: Optional[str], allowed: set) -> Optional[set]:
+    # `fields=valor,data,cultura` -> {"valor", "data", "cultura"}; "id" is always returned
+    if not fields:
+        return None
+    selected = {f.strip() for f in fields.split(",") if f.strip()} - {"id"}
+    unknown = selected - allowed
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected
+
+def model_fields(model) -> set:
+    return set(model.model_fields) - {"id"}
+
+def encode_cursor(doc: dict, date_field: str) -> str:
+    raw = f"{doc[date_field].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str):
+    try:
+        date_str, oid = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split("|")
+        return datetime.fromisoformat(date_str), ObjectId(oid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def list_documents(collection, user_id: str, date_field: str, params: dict, allowed: set, direction: int = DESCENDING):
+    selected = parse_fields(params["fields"], allowed)
+    # The date field is always fetched because the next cursor is built from it
+    projection = {name: 1 for name in selected | {date_field}} if selected is not None else None
+    
+    def to_item(d):
+        return {"id": str(d["_id"]), **{k: v for k, v in d.items() if k != "_id" and (selected is None or k in selected)}}
+    
+    query = {"user_id": user_id}
+    date_range = {}
+    if params["from"] is not None:
+        date_range["$gte"] = params["from"]
+    if params["to"] is not None:
+        date_range["$lte"] = params["to"]
+    if date_range:
+        query[date_field] = date_range
+    
+    if params["after"]:
+        last_date, last_id = decode_cursor(params["after"])
+        op = "$lt" if direction == DESCENDING else "$gt"
+        query["$or"] = [
+            {date_field: {op: last_date}},
+            {date_field: last_date, "_id": {op: last_id}}
+        ]
+    
+    cursor = collection.find(query, projection).sort([(date_field, direction), ("_id", direction)])
+    paginated = params["limit"] is not None or params["after"] is not None
+    if not paginated:
+        with span("db"):
+            docs = await cursor.to_list(LIST_LIMIT)
+        return [to_item(d) for d in docs]
+    
+    limit = params["limit"] or MAX_PAGE_SIZE
+    with span("db"):
+        docs = await cursor.limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1], date_field) if len(docs) > limit else None
+    return {
+        "items": [to_item(d) for d in docs[:limit]],
+        "next_cursor": next_cursor
+    }
+
+
+# ==================== VERSIONS ====================
+
+# Conditional GET for the app's pull-to-refresh. Each user has one document in
+# user_versions with a counter per collection, bumped by every write after it
+# lands. Read endpoints derive a weak ETag from the counters they depend on
+# (plus path and query), so an unchanged refresh costs one _id lookup and a
+# 304 instead of reading the data collections.
+VERSIONED_COLLECTIONS = ("expenses", "revenues", "debts", "fields", "harvests")
+
+async def bump_versions(user_id: str, *collections: str):
+    await db.user_versions.update_one({"_id": user_id}, {"$inc": {c: 1 for c in collections}}, upsert=True)
+
+async def collection_etag(request: Request, user_id: str, collections: tuple) -> str:
+    with span("versions"):
+        doc = await db.user_versions.find_one({"_id": user_id}) or {}
+    versions = ".".join(str(doc.get(c, 0)) for c in collections)
+    raw = f"{user_id}|{request.url.path}?{request.url.query}|{versions}"
+    return 'W/"' + hashlib.sha1(raw.encode("utf-8")).hexdigest() + '"'
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: compression turns strong ETags into weak ones
+        candidates = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return if_none_match.strip() == "*" or etag.removeprefix("W/") in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+async def conditional(request: Request, user_id: str, collections: tuple, build):
+    # `build` is only awaited when the client's copy is out of date
+    etag = await collection_etag(request, user_id, collections)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(await build(), headers=headers)
+
 
 # ==================== AUTH ROUTES ====================
 
@@ -193,7 +657,7 @@ async def register(user_data: UserRegister):
     
     # Create user
     trial_end = datetime.utcnow() + timedelta(days=14)
-    hashed_pw = hash_password(user_data.password)
+    hashed_pw = await hash_password(user_data.password)
     
     user_doc = {
         "name": user_data.name,
@@ -205,11 +669,16 @@ async def register(user_data: UserRegister):
         "created_at": datetime.utcnow()
     }
     
-    result = await db.users.insert_one(user_doc)
+    try:
+        result = await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # A concurrent registration got past the check above first
+        raise HTTPException(status_code=400, detail="Email already registered")
     user_id = str(result.inserted_id)
+    await db.user_stats.insert_one({"user_id": user_id, "scope": "meta", "key": "", "built_at": datetime.utcnow()})
     
     # Create token
-    token = create_access_token({"sub": user_id})
+    token = create_access_token(token_claims(user_id, user_doc))
     
     return {
         "token": token,
@@ -226,11 +695,11 @@ async def register(user_data: UserRegister):
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user["password"]):
+    if not user or not await verify_password(credentials.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     user_id = str(user["_id"])
-    token = create_access_token({"sub": user_id})
+    token = create_access_token(token_claims(user_id, user))
     
     return {
         "token": token,
@@ -246,6 +715,7 @@ async def login(credentials: UserLogin):
 
 @api_router.get("/auth/me")
 async def get_me(current_user = Depends(get_current_user)):
+    current_user = await user_profile(current_user)
     return {
         "id": str(current_user["_id"]),
         "name": current_user["name"],
@@ -258,64 +728,86 @@ async def get_me(current_user = Depends(get_current_user)):
 
 # ==================== EXPENSES ====================
 
-@api_router.post("/expenses")
-async def create_expense(expense: ExpenseCreate, current_user = Depends(get_current_user)):
-    expense_doc = {
-        "user_id": str(current_user["_id"]),
+def expense_document(expense: ExpenseCreate, user_id: str) -> dict:
+    now = datetime.utcnow()
+    return {
+        "user_id": user_id,
         "valor": expense.valor,
         "categoria": expense.categoria,
         "cultura": expense.cultura,
         "tipo": expense.tipo,
         "data": expense.data,
         "descricao": expense.descricao,
-        "created_at": datetime.utcnow()
+        "created_at": now,
+        "updated_at": now
     }
+
+@api_router.post("/expenses")
+async def create_expense(expense: ExpenseCreate, current_user = Depends(get_current_user)):
+    expense_doc = expense_document(expense, str(current_user["_id"]))
     result = await db.expenses.insert_one(expense_doc)
+    await inc_user_stats(expense_doc["user_id"], *stats_delta("expenses", expense_doc))
+    await bump_versions(expense_doc["user_id"], "expenses")
     expense_doc["id"] = str(result.inserted_id)
     expense_doc["_id"] = str(result.inserted_id)
     return expense_doc
 
 @api_router.get("/expenses")
-async def get_expenses(current_user = Depends(get_current_user)):
-    expenses = await db.expenses.find({"user_id": str(current_user["_id"])}).to_list(1000)
-    return [{"id": str(e["_id"]), **{k: v for k, v in e.items() if k != "_id"}} for e in expenses]
+async def get_expenses(request: Request, params: dict = Depends(list_params), current_user = Depends(get_current_user)):
+    user_id = str(current_user["_id"])
+    return await conditional(request, user_id, ("expenses",), lambda: list_documents(db.expenses, user_id, "data", params, model_fields(Expense)))
 
 @api_router.delete("/expenses/{expense_id}")
 async def delete_expense(expense_id: str, current_user = Depends(get_current_user)):
-    result = await db.expenses.delete_one({"_id": ObjectId(expense_id), "user_id": str(current_user["_id"])})
-    if result.deleted_count == 0:
+    user_id = str(current_user["_id"])
+    expense = await db.expenses.find_one_and_delete({"_id": ObjectId(expense_id), "user_id": user_id})
+    if expense is None:
         raise HTTPException(status_code=404, detail="Expense not found")
+    await inc_user_stats(user_id, "cultura", expense.get("cultura", "Outro"), {"despesas": -expense["valor"], "despesas_count": -1}, upsert=False)
+    await record_deletion(user_id, "expenses", expense_id)
+    await bump_versions(user_id, "expenses")
     return {"message": "Expense deleted"}
 
 
 # ==================== REVENUES ====================
 
-@api_router.post("/revenues")
-async def create_revenue(revenue: RevenueCreate, current_user = Depends(get_current_user)):
-    revenue_doc = {
-        "user_id": str(current_user["_id"]),
+def revenue_document(revenue: RevenueCreate, user_id: str) -> dict:
+    now = datetime.utcnow()
+    return {
+        "user_id": user_id,
         "valor": revenue.valor,
         "cultura": revenue.cultura,
         "tipo": revenue.tipo,
         "data": revenue.data,
         "descricao": revenue.descricao,
-        "created_at": datetime.utcnow()
+        "created_at": now,
+        "updated_at": now
     }
+
+@api_router.post("/revenues")
+async def create_revenue(revenue: RevenueCreate, current_user = Depends(get_current_user)):
+    revenue_doc = revenue_document(revenue, str(current_user["_id"]))
     result = await db.revenues.insert_one(revenue_doc)
+    await inc_user_stats(revenue_doc["user_id"], *stats_delta("revenues", revenue_doc))
+    await bump_versions(revenue_doc["user_id"], "revenues")
     revenue_doc["id"] = str(result.inserted_id)
     revenue_doc["_id"] = str(result.inserted_id)
     return revenue_doc
 
 @api_router.get("/revenues")
-async def get_revenues(current_user = Depends(get_current_user)):
-    revenues = await db.revenues.find({"user_id": str(current_user["_id"])}).to_list(1000)
-    return [{"id": str(r["_id"]), **{k: v for k, v in r.items() if k != "_id"}} for r in revenues]
+async def get_revenues(request: Request, params: dict = Depends(list_params), current_user = Depends(get_current_user)):
+    user_id = str(current_user["_id"])
+    return await conditional(request, user_id, ("revenues",), lambda: list_documents(db.revenues, user_id, "data", params, model_fields(Revenue)))
 
 @api_router.delete("/revenues/{revenue_id}")
 async def delete_revenue(revenue_id: str, current_user = Depends(get_current_user)):
-    result = await db.revenues.delete_one({"_id": ObjectId(revenue_id), "user_id": str(current_user["_id"])})
-    if result.deleted_count == 0:
+    user_id = str(current_user["_id"])
+    revenue = await db.revenues.find_one_and_delete({"_id": ObjectId(revenue_id), "user_id": user_id})
+    if revenue is None:
         raise HTTPException(status_code=404, detail="Revenue not found")
+    await inc_user_stats(user_id, "cultura", revenue.get("cultura", "Outro"), {"receitas": -revenue["valor"], "receitas_count": -1}, upsert=False)
+    await record_deletion(user_id, "revenues", revenue_id)
+    await bump_versions(user_id, "revenues")
     return {"message": "Revenue deleted"}
 
 
@@ -323,6 +815,7 @@ async def delete_revenue(revenue_id: str, current_user = Depends(get_current_use
 
 @api_router.post("/debts")
 async def create_debt(debt: DebtCreate, current_user = Depends(get_current_user)):
+    now = datetime.utcnow()
     debt_doc = {
         "user_id": str(current_user["_id"]),
         "valor": debt.valor,
@@ -331,33 +824,52 @@ async def create_debt(debt: DebtCreate, current_user = Depends(get_current_user)
         "cultura": debt.cultura,
         "status": debt.status,
         "descricao": debt.descricao,
-        "created_at": datetime.utcnow()
+        "created_at": now,
+        "updated_at": now
     }
     result = await db.debts.insert_one(debt_doc)
+    if debt.status == "pendente":
+        await inc_user_stats(debt_doc["user_id"], "cultura", debt.cultura, {"dividas_pendentes": debt.valor, "dividas_pendentes_count": 1})
+    await bump_versions(debt_doc["user_id"], "debts")
     debt_doc["id"] = str(result.inserted_id)
     debt_doc["_id"] = str(result.inserted_id)
     return debt_doc
 
 @api_router.get("/debts")
-async def get_debts(current_user = Depends(get_current_user)):
-    debts = await db.debts.find({"user_id": str(current_user["_id"])}).to_list(1000)
-    return [{"id": str(d["_id"]), **{k: v for k, v in d.items() if k != "_id"}} for d in debts]
+async def get_debts(request: Request, params: dict = Depends(list_params), current_user = Depends(get_current_user)):
+    user_id = str(current_user["_id"])
+    return await conditional(request, user_id, ("debts",), lambda: list_documents(db.debts, user_id, "vencimento", params, model_fields(Debt), direction=ASCENDING))
 
 @api_router.delete("/debts/{debt_id}")
 async def delete_debt(debt_id: str, current_user = Depends(get_current_user)):
-    result = await db.debts.delete_one({"_id": ObjectId(debt_id), "user_id": str(current_user["_id"])})
-    if result.deleted_count == 0:
+    user_id = str(current_user["_id"])
+    debt = await db.debts.find_one_and_delete({"_id": ObjectId(debt_id), "user_id": user_id})
+    if debt is None:
         raise HTTPException(status_code=404, detail="Debt not found")
+    if debt.get("status") == "pendente":
+        await inc_user_stats(user_id, "cultura", debt.get("cultura", "Outro"), {"dividas_pendentes": -debt["valor"], "dividas_pendentes_count": -1}, upsert=False)
+    await record_deletion(user_id, "debts", debt_id)
+    await bump_versions(user_id, "debts")
     return {"message": "Debt deleted"}
 
 @api_router.patch("/debts/{debt_id}/status")
 async def update_debt_status(debt_id: str, status: str, current_user = Depends(get_current_user)):
-    result = await db.debts.update_one(
-        {"_id": ObjectId(debt_id), "user_id": str(current_user["_id"])},
-        {"$set": {"status": status}}
+    user_id = str(current_user["_id"])
+    # A debt already in `status` doesn't match, so a no-op writes nothing
+    previous = await db.debts.find_one_and_update(
+        {"_id": ObjectId(debt_id), "user_id": user_id, "status": {"$ne": status}},
+        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
     )
-    if result.modified_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Debt not found")
+    
+    # Only transitions into or out of "pendente" move the pending totals
+    cultura = previous.get("cultura", "Outro")
+    if previous.get("status") == "pendente":
+        await inc_user_stats(user_id, "cultura", cultura, {"dividas_pendentes": -previous["valor"], "dividas_pendentes_count": -1}, upsert=False)
+    elif status == "pendente":
+        await inc_user_stats(user_id, "cultura", cultura, {"dividas_pendentes": previous["valor"], "dividas_pendentes_count": 1})
+    await bump_versions(user_id, "debts")
     return {"message": "Status updated"}
 
 
@@ -365,69 +877,87 @@ async def update_debt_status(debt_id: str, status: str, current_user = Depends(g
 
 @api_router.post("/fields")
 async def create_field(field: FieldCreate, current_user = Depends(get_current_user)):
+    now = datetime.utcnow()
     field_doc = {
         "user_id": str(current_user["_id"]),
         "nome": field.nome,
         "area_ha": field.area_ha,
         "cultura": field.cultura,
         "localizacao": field.localizacao,
-        "created_at": datetime.utcnow()
+        "created_at": now,
+        "updated_at": now
     }
     result = await db.fields.insert_one(field_doc)
+    await bump_versions(field_doc["user_id"], "fields")
     field_doc["id"] = str(result.inserted_id)
     field_doc["_id"] = str(result.inserted_id)
     return field_doc
 
+FIELD_STATS_KEYS = {"produtividade_media", "total_safras", "total_sacas"}
+
+def enrich_field(field: dict, stats: Optional[dict]) -> dict:
+    total_sacas = stats.get("total_sacas", 0) if stats else 0
+    num_harvests = stats.get("total_safras", 0) if stats else 0
+    produtividade_media = (total_sacas / (field["area_ha"] * num_harvests)) if num_harvests > 0 else 0
+    return {
+        "id": str(field["_id"]),
+        **{k: v for k, v in field.items() if k != "_id"},
+        "produtividade_media": round(produtividade_media, 2),
+        "total_safras": num_harvests,
+        "total_sacas": total_sacas
+    }
+
 @api_router.get("/fields")
-async def get_fields(current_user = Depends(get_current_user)):
+async def get_fields(request: Request, fields: Optional[str] = None, current_user = Depends(get_current_user)):
     user_id = str(current_user["_id"])
-    fields = await db.fields.find({"user_id": user_id}).to_list(1000)
+    selected = parse_fields(fields, model_fields(Field) | FIELD_STATS_KEYS)
     
-    # Enriquecer com produtividade média de cada talhão
-    enriched_fields = []
-    for field in fields:
-        field_id = str(field["_id"])
-        
-        # Buscar todas as safras deste talhão
-        harvests = await db.harvests.find({"user_id": user_id, "field_id": field_id}).to_list(1000)
+    async def build():
+        if selected is not None and not selected & FIELD_STATS_KEYS:
+            with span("db"):
+                docs = await db.fields.find({"user_id": user_id}, {name: 1 for name in selected}).to_list(1000)
+            return [{"id": str(f["_id"]), **{k: v for k, v in f.items() if k != "_id"}} for f in docs]
         
-        # Calcular produtividade média
-        total_sacas = sum(h["quantidade_sacas"] for h in harvests)
-        num_harvests = len(harvests)
-        produtividade_media = (total_sacas / (field["area_ha"] * num_harvests)) if num_harvests > 0 else 0
+        # produtividade_media needs area_ha even when the caller didn't ask for it
+        projection = {name: 1 for name in (selected - FIELD_STATS_KEYS) | {"area_ha"}} if selected is not None else None
+        with span("db"):
+            docs, stats = await asyncio.gather(
+                db.fields.find({"user_id": user_id}, projection).to_list(1000),
+                load_user_stats(user_id),
+            )
         
-        enriched_fields.append({
-            "id": field_id,
-            **{k: v for k, v in field.items() if k != "_id"},
-            "produtividade_media": round(produtividade_media, 2),
-            "total_safras": num_harvests,
-            "total_sacas": total_sacas
-        })
+        # Enriquecer com produtividade média de cada talhão
+        with span("compute"):
+            stats_by_field = {s["key"]: s for s in stats if s["scope"] == "field"}
+            enriched = [enrich_field(field, stats_by_field.get(str(field["_id"]))) for field in docs]
+        if selected is None:
+            return enriched
+        return [{k: v for k, v in f.items() if k == "id" or k in selected} for f in enriched]
     
-    return enriched_fields
+    # Productivity comes from harvests, so harvest writes change this response too
+    return await conditional(request, user_id, ("fields", "harvests"), build)
 
 @api_router.delete("/fields/{field_id}")
 async def delete_field(field_id: str, current_user = Depends(get_current_user)):
-    result = await db.fields.delete_one({"_id": ObjectId(field_id), "user_id": str(current_user["_id"])})
+    user_id = str(current_user["_id"])
+    result = await db.fields.delete_one({"_id": ObjectId(field_id), "user_id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Field not found")
+    await db.user_stats.delete_one({"user_id": user_id, "scope": "field", "key": field_id})
+    await record_deletion(user_id, "fields", field_id)
+    await bump_versions(user_id, "fields")
     return {"message": "Field deleted"}
 
 
 # ==================== HARVESTS ====================
 
-@api_router.post("/harvests")
-async def create_harvest(harvest: HarvestCreate, current_user = Depends(get_current_user)):
-    # Get field info
-    field = await db.fields.find_one({"_id": ObjectId(harvest.field_id), "user_id": str(current_user["_id"])})
-    if not field:
-        raise HTTPException(status_code=404, detail="Field not found")
-    
+def harvest_document(harvest: HarvestCreate, user_id: str, field: dict) -> dict:
     # Calculate productivity
     produtividade = harvest.quantidade_sacas / field["area_ha"]
+    now = datetime.utcnow()
     
-    harvest_doc = {
-        "user_id": str(current_user["_id"]),
+    return {
+        "user_id": user_id,
         "field_id": harvest.field_id,
         "field_name": field["nome"],
         "area_ha": field["area_ha"],
@@ -436,114 +966,1164 @@ async def create_harvest(harvest: HarvestCreate, current_user = Depends(get_curr
         "produtividade": round(produtividade, 2),
         "data_colheita": harvest.data_colheita,
         "observacoes": harvest.observacoes,
-        "created_at": datetime.utcnow()
+        "created_at": now,
+        "updated_at": now
     }
+
+@api_router.post("/harvests")
+async def create_harvest(harvest: HarvestCreate, current_user = Depends(get_current_user)):
+    # Get field info
+    field = await db.fields.find_one({"_id": ObjectId(harvest.field_id), "user_id": str(current_user["_id"])})
+    if not field:
+        raise HTTPException(status_code=404, detail="Field not found")
+    if not field.get("area_ha"):
+        raise HTTPException(status_code=400, detail="Field has no area")
+    
+    harvest_doc = harvest_document(harvest, str(current_user["_id"]), field)
     result = await db.harvests.insert_one(harvest_doc)
+    await inc_user_stats(harvest_doc["user_id"], *stats_delta("harvests", harvest_doc))
+    await touch_fields(harvest_doc["user_id"], {harvest.field_id})
+    await bump_versions(harvest_doc["user_id"], "harvests")
     harvest_doc["id"] = str(result.inserted_id)
     harvest_doc["_id"] = str(result.inserted_id)
     return harvest_doc
 
 @api_router.get("/harvests")
-async def get_harvests(current_user = Depends(get_current_user)):
-    harvests = await db.harvests.find({"user_id": str(current_user["_id"])}).to_list(1000)
-    return [{"id": str(h["_id"]), **{k: v for k, v in h.items() if k != "_id"}} for h in harvests]
+async def get_harvests(request: Request, params: dict = Depends(list_params), current_user = Depends(get_current_user)):
+    user_id = str(current_user["_id"])
+    return await conditional(request, user_id, ("harvests",), lambda: list_documents(db.harvests, user_id, "data_colheita", params, model_fields(Harvest)))
 
 @api_router.delete("/harvests/{harvest_id}")
 async def delete_harvest(harvest_id: str, current_user = Depends(get_current_user)):
-    result = await db.harvests.delete_one({"_id": ObjectId(harvest_id), "user_id": str(current_user["_id"])})
-    if result.deleted_count == 0:
+    user_id = str(current_user["_id"])
+    harvest = await db.harvests.find_one_and_delete({"_id": ObjectId(harvest_id), "user_id": user_id})
+    if harvest is None:
         raise HTTPException(status_code=404, detail="Harvest not found")
+    await inc_user_stats(user_id, "field", harvest["field_id"], {"total_sacas": -harvest["quantidade_sacas"], "total_safras": -1}, upsert=False)
+    await record_deletion(user_id, "harvests", harvest_id)
+    await touch_fields(user_id, {harvest["field_id"]})
+    await bump_versions(user_id, "harvests")
     return {"message": "Harvest deleted"}
 
 
 # ==================== DASHBOARD ====================
 
+# Cap on the pending debt list returned with the summary (totals are never capped)
+DASHBOARD_DEBTS_LIMIT = 1000
+
+def build_dashboard_summary(stats: List[dict], debts: List[dict]) -> dict:
+    totals = {"receitas": 0, "despesas": 0, "dividas_pendentes": 0}
+    por_cultura = {"receitas": {}, "despesas": {}}
+    for doc in stats:
+        if doc["scope"] != "cultura":
+            continue
+        for kind in totals:
+            totals[kind] += doc.get(kind, 0)
+        for kind in por_cultura:
+            if doc.get(f"{kind}_count", 0) > 0:
+                por_cultura[kind][doc["key"]] = doc.get(kind, 0)
+
+    return {
+        "total_receitas": totals["receitas"],
+        "total_despesas": totals["despesas"],
+        "lucro": totals["receitas"] - totals["despesas"],
+        "total_dividas_pendentes": totals["dividas_pendentes"],
+        "receitas_por_cultura": por_cultura["receitas"],
+        "despesas_por_cultura": por_cultura["despesas"],
+        "dividas_pendentes": [{"id": str(d["_id"]), **{k: v for k, v in d.items() if k != "_id"}} for d in debts]
+    }
+
+DASHBOARD_KEYS = {
+    "total_receitas", "total_despesas", "lucro", "total_dividas_pendentes",
+    "receitas_por_cultura", "despesas_por_cultura", "dividas_pendentes"
+}
+
 @api_router.get("/dashboard/summary")
-async def get_dashboard_summary(current_user = Depends(get_current_user)):
+async def get_dashboard_summary(request: Request, fields: Optional[str] = None, current_user = Depends(get_current_user)):
     user_id = str(current_user["_id"])
+    selected = parse_fields(fields, DASHBOARD_KEYS)
     
-    # Get all revenues
-    revenues = await db.revenues.find({"user_id": user_id}).to_list(1000)
-    total_receitas = sum(r["valor"] for r in revenues)
+    # Skip whichever query the requested keys don't need
+    async def no_docs():
+        return []
     
-    # Get all expenses
-    expenses = await db.expenses.find({"user_id": user_id}).to_list(1000)
-    total_despesas = sum(e["valor"] for e in expenses)
+    async def build():
+        need_stats = selected is None or bool(selected - {"dividas_pendentes"})
+        need_debts = selected is None or "dividas_pendentes" in selected
+        with span("db"):
+            stats, debts = await asyncio.gather(
+                load_user_stats(user_id) if need_stats else no_docs(),
+                db.debts.find({"user_id": user_id, "status": "pendente"}).sort("vencimento", 1).to_list(DASHBOARD_DEBTS_LIMIT) if need_debts else no_docs(),
+            )
+        with span("compute"):
+            summary = build_dashboard_summary(stats, debts)
+        if selected is None:
+            return summary
+        return {k: v for k, v in summary.items() if k in selected}
     
-    # Get pending debts
-    debts = await db.debts.find({"user_id": user_id, "status": "pendente"}).to_list(1000)
-    total_dividas = sum(d["valor"] for d in debts)
+    return await conditional(request, user_id, ("expenses", "revenues", "debts"), build)
+
+
+# ==================== ALERTS ====================
+
+# Pending debts due within ALERTS_WINDOW_DAYS, bucketed the way the alerts tab
+# shows them. Each user's buckets are precomputed into debt_alerts (one
+# document per user) by the alerts.precompute job right after local midnight,
+# stamped with the day and the debts version they were built from, so the tab
+# is a pair of _id lookups. A stale document (new day, or debts changed since) is rebuilt
+# on read from the user_status_vencimento index.
+ALERTS_TIMEZONE = ZoneInfo(os.environ.get('ALERTS_TIMEZONE', 'America/Sao_Paulo'))
+ALERT_BUCKETS = [("urgentes", 5), ("atencao", 15), ("proximas", 30)]  # (name, last day)
+ALERTS_WINDOW_DAYS = ALERT_BUCKETS[-1][1]
+ALERTS_PRECOMPUTE_CONCURRENCY = 8
+
+def alerts_today() -> date:
+    return datetime.now(ALERTS_TIMEZONE).date()
+
+def local_midnight_utc(day: date) -> datetime:
+    # Naive UTC, like every datetime stored in Mongo
+    return datetime.combine(day, datetime.min.time(), tzinfo=ALERTS_TIMEZONE).astimezone(timezone.utc).replace(tzinfo=None)
+
+def bucket_debt_alerts(debts: List[dict], today: date) -> dict:
+    # `debts` are pending and due before the end of the window, by vencimento
+    buckets = {name: {"total": 0, "count": 0, "dividas": []} for name in ["vencidas", *(n for n, _ in ALERT_BUCKETS)]}
+    for debt in debts:
+        # Due dates are stored as UTC instants of a local midnight
+        dias = (debt["vencimento"].replace(tzinfo=timezone.utc).astimezone(ALERTS_TIMEZONE).date() - today).days
+        name = "vencidas" if dias < 0 else next(n for n, last_day in ALERT_BUCKETS if dias <= last_day)
+        bucket = buckets[name]
+        bucket["total"] += debt["valor"]
+        bucket["count"] += 1
+        bucket["dividas"].append({"id": str(debt["_id"]), **{k: v for k, v in debt.items() if k != "_id"}, "dias": dias})
+    return buckets
+
+async def compute_debt_alerts(user_id: str, today: date) -> dict:
+    horizon = local_midnight_utc(today + timedelta(days=ALERTS_WINDOW_DAYS + 1))
+    debts = await db.debts.find(
+        {"user_id": user_id, "status": "pendente", "vencimento": {"$lt": horizon}},
+        {"user_id": 0}
+    ).sort([("vencimento", ASCENDING), ("_id", ASCENDING)]).to_list(None)
+    return bucket_debt_alerts(debts, today)
+
+def debt_alerts_current(stored: Optional[dict], today: date, debts_version: int) -> bool:
+    # A precomputed document is reused only for the day and debts it was built from
+    return stored is not None and stored["day"] == today.isoformat() and stored["debts_version"] == debts_version
+
+async def refresh_debt_alerts(user_id: str, today: date, debts_version: Optional[int] = None) -> dict:
+    if debts_version is None:
+        versions = await db.user_versions.find_one({"_id": user_id}, {"debts": 1}) or {}
+        debts_version = versions.get("debts", 0)
+    doc = {
+        "_id": user_id,
+        "day": today.isoformat(),
+        "debts_version": debts_version,
+        "buckets": await compute_debt_alerts(user_id, today),
+        "computed_at": datetime.utcnow()
+    }
+    await db.debt_alerts.replace_one({"_id": user_id}, doc, upsert=True)
+    return doc
+
+async def precompute_debt_alerts() -> int:
+    today = alerts_today()
+    user_ids = await db.debts.distinct("user_id", {"status": "pendente"})
+    semaphore = asyncio.Semaphore(ALERTS_PRECOMPUTE_CONCURRENCY)
     
-    # Calculate profit
-    lucro = total_receitas - total_despesas
+    async def refresh(user_id):
+        async with semaphore:
+            await refresh_debt_alerts(user_id, today)
     
-    # Group by cultura
-    receitas_por_cultura = {}
-    for r in revenues:
-        cultura = r.get("cultura", "Outro")
-        receitas_por_cultura[cultura] = receitas_por_cultura.get(cultura, 0) + r["valor"]
+    await asyncio.gather(*(refresh(u) for u in user_ids))
+    return len(user_ids)
+
+@api_router.get("/alerts/debts")
+async def get_debt_alerts(request: Request, current_user = Depends(get_current_user)):
+    user_id = str(current_user["_id"])
+    today = alerts_today()
+    versions, stored = await asyncio.gather(
+        db.user_versions.find_one({"_id": user_id}, {"debts": 1}),
+        db.debt_alerts.find_one({"_id": user_id}),
+    )
+    debts_version = (versions or {}).get("debts", 0)
     
-    despesas_por_cultura = {}
-    for e in expenses:
-        cultura = e.get("cultura", "Outro")
-        despesas_por_cultura[cultura] = despesas_por_cultura.get(cultura, 0) + e["valor"]
+    etag = 'W/"' + hashlib.sha1(f"{user_id}|alerts|{today}|{debts_version}".encode("utf-8")).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
     
-    return {
-        "total_receitas": total_receitas,
-        "total_despesas": total_despesas,
-        "lucro": lucro,
-        "total_dividas_pendentes": total_dividas,
-        "receitas_por_cultura": receitas_por_cultura,
-        "despesas_por_cultura": despesas_por_cultura,
-        "dividas_pendentes": [{"id": str(d["_id"]), **{k: v for k, v in d.items() if k != "_id"}} for d in debts]
+    if not debt_alerts_current(stored, today, debts_version):
+        stored = await refresh_debt_alerts(user_id, today, debts_version)
+    return FastJSONResponse({"dia": stored["day"], "atualizado_em": stored["computed_at"], **stored["buckets"]}, headers=headers)
+
+
+# ==================== ANALYTICS ====================
+
+# Cash flow over time for the dashboard chart. Each collection is grouped by
+# Mongo with $dateTrunc over `data` (a range scan on the user_data_id index)
+# into local days, weeks (starting Monday) or months of ALERTS_TIMEZONE, the
+# same calendar the alerts tab uses. Empty buckets are zero-filled and the
+# series goes out as parallel arrays, ready for the chart.
+CASHFLOW_DEFAULT_RANGE = {
+    "day": timedelta(days=90),
+    "week": timedelta(days=365),
+    "month": timedelta(days=365),
+}
+CASHFLOW_MAX_BUCKETS = 1500
+
+def cashflow_bucket_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+def next_cashflow_bucket(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day + timedelta(days=7)
+    if granularity == "month":
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return day + timedelta(days=1)
+
+def local_day(value: datetime) -> date:
+    return value.replace(tzinfo=timezone.utc).astimezone(ALERTS_TIMEZONE).date()
+
+def cashflow_buckets(start: datetime, end: datetime, granularity: str) -> List[date]:
+    # Local start days of every bucket touching [start, end]
+    buckets = []
+    day, last = cashflow_bucket_start(local_day(start), granularity), local_day(end)
+    while day <= last:
+        buckets.append(day)
+        if len(buckets) > CASHFLOW_MAX_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"At most {CASHFLOW_MAX_BUCKETS} buckets per series")
+        day = next_cashflow_bucket(day, granularity)
+    return buckets
+
+def cashflow_range(start: datetime, end: datetime, granularity: str) -> Tuple[datetime, List[date]]:
+    # The first bucket is always whole, so `start` moves back to its local midnight
+    buckets = cashflow_buckets(start, end, granularity)
+    return min(start, local_midnight_utc(buckets[0])), buckets
+
+def cashflow_pipeline(user_id: str, start: datetime, end: datetime, granularity: str, cultura: Optional[str] = None) -> list:
+    match = {"user_id": user_id, "data": {"$gte": start, "$lte": end}}
+    if cultura:
+        match["cultura"] = cultura
+    trunc = {"date": "$data", "unit": granularity, "timezone": ALERTS_TIMEZONE.key}
+    if granularity == "week":
+        trunc["startOfWeek"] = "monday"
+    return [
+        {"$match": match},
+        {"$group": {"_id": {"$dateTrunc": trunc}, "total": {"$sum": "$valor"}}},
+    ]
+
+def cashflow_series(buckets: List[date], receitas: List[dict], despesas: List[dict]) -> dict:
+    # `receitas`/`despesas` are the $group outputs: bucket start (UTC) -> total
+    def by_bucket(groups):
+        return {local_day(g["_id"]): g["total"] for g in groups}
+    
+    receitas_by, despesas_by = by_bucket(receitas), by_bucket(despesas)
+    series = {"buckets": [], "receitas": [], "despesas": [], "saldo_acumulado": []}
+    saldo = 0.0
+    for day in buckets:
+        receita, despesa = receitas_by.get(day, 0.0), despesas_by.get(day, 0.0)
+        saldo += receita - despesa
+        series["buckets"].append(day.isoformat())
+        series["receitas"].append(round(receita, 2))
+        series["despesas"].append(round(despesa, 2))
+        series["saldo_acumulado"].append(round(saldo, 2))
+    return series
+
+@api_router.get("/analytics/cashflow")
+async def get_cashflow(
+    request: Request,
+    granularity: str = "month",
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    cultura: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    if granularity not in CASHFLOW_DEFAULT_RANGE:
+        raise HTTPException(status_code=400, detail="Granularity must be day, week or month")
+    user_id = str(current_user["_id"])
+    # Up to the end of today by default, so the range only moves once a day
+    end = naive_utc(to) or local_midnight_utc(alerts_today() + timedelta(days=1)) - timedelta(milliseconds=1)
+    start = naive_utc(from_) or end - CASHFLOW_DEFAULT_RANGE[granularity]
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    start, buckets = cashflow_range(start, end, granularity)
+    
+    # The default range depends on the day, so it is part of the ETag too
+    versions_etag = await collection_etag(request, user_id, ("expenses", "revenues"))
+    etag = 'W/"' + hashlib.sha1(f"{versions_etag}|{start.isoformat()}|{end.isoformat()}".encode("utf-8")).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    with span("db"):
+        receitas, despesas = await asyncio.gather(
+            db.revenues.aggregate(cashflow_pipeline(user_id, start, end, granularity, cultura)).to_list(None),
+            db.expenses.aggregate(cashflow_pipeline(user_id, start, end, granularity, cultura)).to_list(None),
+        )
+    with span("compute"):
+        series = cashflow_series(buckets, receitas, despesas)
+    return FastJSONResponse({
+        "granularity": granularity,
+        "from": start,
+        "to": end,
+        "cultura": cultura,
+        **series
+    }, headers=headers)
+
+
+# ==================== PROJECTION ====================
+
+# Balance for the months ahead (see projection.py): pending debts on their due
+# dates plus recurring flows inferred from the last PROJECTION_HISTORY_MONTHS
+# of revenues and expenses, starting from today's balance (the dashboard's
+# lucro). Projections are stored in cashflow_projections stamped with the day,
+# horizon and data versions they were built from, like debt_alerts; the
+# `manage.py projections precompute` batch fills them for every user over a
+# process pool, and a stale one is rebuilt on read.
+PROJECTION_HISTORY_MONTHS = int(os.environ.get('PROJECTION_HISTORY_MONTHS', '36'))
+PROJECTION_DEFAULT_MONTHS = 6
+PROJECTION_MAX_MONTHS = 24
+PROJECTION_COLLECTIONS = ("expenses", "revenues", "debts")
+
+def projection_versions(doc: Optional[dict]) -> str:
+    return ".".join(str((doc or {}).get(c, 0)) for c in PROJECTION_COLLECTIONS)
+
+async def load_projection_payload(user_id: str, today: date, months: int) -> dict:
+    year, month = divmod(today.year * 12 + today.month - 1 - PROJECTION_HISTORY_MONTHS, 12)
+    since = local_midnight_utc(date(year, month + 1, 1))
+    flows = {"_id": 0, "data": 1, "valor": 1, "cultura": 1, "categoria": 1}
+    receitas, despesas, dividas, stats = await asyncio.gather(
+        db.revenues.find({"user_id": user_id, "data": {"$gte": since}}, flows).to_list(None),
+        db.expenses.find({"user_id": user_id, "data": {"$gte": since}}, flows).to_list(None),
+        db.debts.find({"user_id": user_id, "status": "pendente"}, {"_id": 0, "vencimento": 1, "valor": 1}).to_list(None),
+        load_user_stats(user_id),
+    )
+    saldo = sum(d.get("receitas", 0) - d.get("despesas", 0) for d in stats if d["scope"] == "cultura")
+    return build_payload(user_id, receitas, despesas, dividas, saldo, today, months, ALERTS_TIMEZONE.key)
+
+async def store_projection(user_id: str, today: date, months: int, versions: str, projection: dict) -> dict:
+    doc = {
+        "_id": user_id,
+        "day": today.isoformat(),
+        "months": months,
+        "versions": versions,
+        "projection": projection,
+        "computed_at": datetime.utcnow()
     }
+    await db.cashflow_projections.replace_one({"_id": user_id}, doc, upsert=True)
+    return doc
+
+async def precompute_projections(executor, months: int = PROJECTION_DEFAULT_MONTHS, concurrency: int = 8) -> int:
+    # Loading stays on the event loop while `executor` (a process pool) projects.
+    # A slot is held from loading until the projection is stored, so at most
+    # `concurrency` payloads are in memory or queued for the pool; with more
+    # slots than pool workers, Mongo reads for the next users overlap the NumPy work
+    today = alerts_today()
+    loop = asyncio.get_running_loop()
+    user_ids = [str(u["_id"]) async for u in db.users.find({}, {"_id": 1})]
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def refresh(user_id):
+        async with semaphore:
+            versions = projection_versions(await db.user_versions.find_one({"_id": user_id}))
+            payload = await load_projection_payload(user_id, today, months)
+            projection = await loop.run_in_executor(executor, project, payload)
+            await store_projection(user_id, today, months, versions, projection)
+    
+    await asyncio.gather(*(refresh(u) for u in user_ids))
+    return len(user_ids)
+
+@api_router.get("/analytics/projection")
+async def get_projection(
+    request: Request,
+    meses: int = Query(PROJECTION_DEFAULT_MONTHS, ge=1, le=PROJECTION_MAX_MONTHS),
+    current_user = Depends(get_current_user)
+):
+    user_id = str(current_user["_id"])
+    today = alerts_today()
+    doc, stored = await asyncio.gather(
+        db.user_versions.find_one({"_id": user_id}),
+        db.cashflow_projections.find_one({"_id": user_id}),
+    )
+    versions = projection_versions(doc)
+    
+    etag = 'W/"' + hashlib.sha1(f"{user_id}|projection|{today}|{meses}|{versions}".encode("utf-8")).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    if stored is None or (stored["day"], stored["months"], stored["versions"]) != (today.isoformat(), meses, versions):
+        with span("db"):
+            payload = await load_projection_payload(user_id, today, meses)
+        with span("compute"):
+            projection = await asyncio.get_running_loop().run_in_executor(None, project, payload)
+        stored = {"projection": projection, "computed_at": datetime.utcnow()}
+        # Only the default horizon is kept; the batch precomputes that one
+        if meses == PROJECTION_DEFAULT_MONTHS:
+            stored = await store_projection(user_id, today, meses, versions, projection)
+    return FastJSONResponse({"meses": meses, "atualizado_em": stored["computed_at"], **stored["projection"]}, headers=headers)
+
+# ==================== SYNC ====================
+
+# Delta sync for the offline-first app. Every write stamps `updated_at` and
+# every delete leaves a tombstone, so /api/sync?since=<token> returns only
+# what changed since the client's last sync. Tokens are positions in
+# (updated_at, _id) order plus the time they were issued; each response hands
+# back the token for the next one. Positions lag SYNC_OVERLAP behind the
+# clock so writes still in flight are picked up next time - clients upsert by
+# id, so the occasional repeat is harmless. Documents written before
+# updated_at existed sort first, as if stamped at SYNC_EPOCH, so they still
+# page correctly; `manage.py sync backfill` stamps them so later changes to
+# them are picked up too.
+SYNC_COLLECTIONS = {
+    "expenses": Expense,
+    "revenues": Revenue,
+    "debts": Debt,
+    "fields": Field,
+    "harvests": Harvest,
+}
+SYNC_MAX_CHANGES = int(os.environ.get('SYNC_MAX_CHANGES', 2000))  # per collection per response
+SYNC_OVERLAP = timedelta(seconds=float(os.environ.get('SYNC_OVERLAP_SECONDS', 5)))
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', 90))
+SYNC_ORIGIN = ObjectId("0" * 24)
+SYNC_EPOCH = datetime(1970, 1, 1)
+SYNC_INDEX = IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)], name="user_updated_id")
+
+async def record_deletion(user_id: str, collection: str, doc_id: str):
+    await db.tombstones.insert_one({
+        "user_id": user_id,
+        "collection": collection,
+        "doc_id": doc_id,
+        "updated_at": datetime.utcnow()
+    })
+
+async def touch_fields(user_id: str, field_ids: set):
+    # A field's productivity comes from its harvests, so harvest writes
+    # re-sync the field too
+    object_ids = [ObjectId(f) for f in field_ids if ObjectId.is_valid(f)]
+    if object_ids:
+        await db.fields.update_many({"_id": {"$in": object_ids}, "user_id": user_id}, {"$set": {"updated_at": datetime.utcnow()}})
+
+def encode_sync_token(position: datetime, oid: ObjectId, issued_at: datetime) -> str:
+    raw = f"{position.isoformat()}|{oid}|{issued_at.isoformat()}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_sync_token(token: str):
+    try:
+        position, oid, issued_at = base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8').split("|")
+        return datetime.fromisoformat(position), ObjectId(oid), datetime.fromisoformat(issued_at)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+@api_router.get("/sync")
+async def sync(since: Optional[str] = None, current_user = Depends(get_current_user)):
+    user_id = str(current_user["_id"])
+    now = datetime.utcnow()
+    query = {"user_id": user_id}
+    
+    # Without a token, or with one older than the tombstones we keep, the
+    # client gets everything and must replace its local copy
+    full = True
+    if since:
+        position, oid, issued_at = decode_sync_token(since)
+        if issued_at >= now - timedelta(days=SYNC_TOMBSTONE_DAYS):
+            full = False
+            query["$or"] = [{"updated_at": {"$gt": position}}, {"updated_at": position, "_id": {"$gt": oid}}]
+            if position <= SYNC_EPOCH:
+                # Resuming among documents without updated_at
+                query["$or"].append({"updated_at": None, "_id": {"$gt": oid}})
+    
+    async def no_docs():
+        return []
+    
+    order = [("updated_at", ASCENDING), ("_id", ASCENDING)]
+    names = [*SYNC_COLLECTIONS, "tombstones"]
+    results = await asyncio.gather(*(
+        db[name].find(query).sort(order).to_list(SYNC_MAX_CHANGES + 1) if not (full and name == "tombstones") else no_docs()
+        for name in names
+    ))
+    
+    # A collection with more changes than fit is cut at SYNC_MAX_CHANGES and the
+    # next token resumes from the earliest cut, so nothing is skipped
+    cut = None
+    for docs in results:
+        if len(docs) > SYNC_MAX_CHANGES:
+            del docs[SYNC_MAX_CHANGES:]
+            last = (docs[-1].get("updated_at") or SYNC_EPOCH, docs[-1]["_id"])
+            cut = last if cut is None else min(cut, last)
+    
+    batches = dict(zip(names, results))
+    changes = {
+        name: [{"id": str(d["_id"]), **{k: v for k, v in d.items() if k != "_id"}} for d in batches[name]]
+        for name in SYNC_COLLECTIONS
+    }
+    if batches["fields"]:
+        stats = await load_user_stats(user_id)
+        stats_by_field = {s["key"]: s for s in stats if s["scope"] == "field"}
+        changes["fields"] = [enrich_field(f, stats_by_field.get(str(f["_id"]))) for f in batches["fields"]]
+    
+    deleted = {name: [] for name in SYNC_COLLECTIONS}
+    for t in batches["tombstones"]:
+        deleted[t["collection"]].append(t["doc_id"])
+    
+    position, oid = cut if cut is not None else (now - SYNC_OVERLAP, SYNC_ORIGIN)
+    return FastJSONResponse({
+        "changes": changes,
+        "deleted": deleted,
+        "full": full,
+        "has_more": cut is not None,
+        "token": encode_sync_token(position, oid, now)
+    })
+
+
+# ==================== EXPORT ====================
+
+# Full-history exports stream cursor batches straight into the response, so
+# memory stays flat no matter how many rows a farm has.
+EXPORT_COLLECTIONS = {
+    "expenses": (Expense, "data"),
+    "revenues": (Revenue, "data"),
+    "debts": (Debt, "vencimento"),
+    "harvests": (Harvest, "data_colheita"),
+}
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+EXPORT_BATCH_SIZE = 1000
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+async def export_rows(collection: str, user_id: str, fmt: str, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None):
+    model, date_field = EXPORT_COLLECTIONS[collection]
+    columns = list(model.model_fields)
+    
+    query = {"user_id": user_id}
+    date_range = {}
+    if date_from is not None:
+        date_range["$gte"] = date_from
+    if date_to is not None:
+        date_range["$lte"] = date_to
+    if date_range:
+        query[date_field] = date_range
+    
+    cursor = db[collection].find(query).sort([(date_field, ASCENDING), ("_id", ASCENDING)]).batch_size(EXPORT_BATCH_SIZE)
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(columns)
+    
+    pending = 0
+    async for doc in cursor:
+        doc["id"] = doc.pop("_id")
+        if writer:
+            writer.writerow(["" if doc.get(c) is None else export_value(doc.get(c)) for c in columns])
+        else:
+            buffer.write(dumps({c: doc.get(c) for c in columns}).decode("utf-8"))
+            buffer.write("\n")
+        pending += 1
+        if pending == EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@api_router.get("/export/{collection}")
+async def export_collection(
+    collection: str,
+    format: str = "ndjson",
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    current_user = Depends(get_current_user)
+):
+    if collection not in EXPORT_COLLECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be ndjson or csv")
+    
+    filename = f"{collection}-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        export_rows(collection, str(current_user["_id"]), format, from_, to),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+# ==================== IMPORT ====================
+
+# Bulk onboarding of historical data: a JSON array body, a text/csv body or a
+# multipart CSV upload (`file`). Rows are validated with the same models as
+# the single-record endpoints, harvest fields are resolved once per distinct
+# field_id, and documents go in with unordered insert_many batches. Invalid
+# rows are reported back by their 0-based position and never abort the rest.
+# Parsing, validation and document building run in the default executor, as
+# valuation does, so a 200k-row import doesn't stall the event loop.
+IMPORT_COLLECTIONS = {
+    "expenses": (ExpenseCreate, expense_document),
+    "revenues": (RevenueCreate, revenue_document),
+    "harvests": (HarvestCreate, harvest_document),
+}
+IMPORT_MAX_ROWS = 200_000
+IMPORT_BATCH_SIZE = 1000
+
+def parse_csv(text: str) -> List[dict]:
+    # Empty cells become None so optional fields validate as missing
+    return [
+        {k: (v if v != "" else None) for k, v in row.items() if k is not None}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+
+def row_error(row: int, msg: str, loc: Optional[list] = None) -> dict:
+    return {"row": row, "errors": [{"loc": loc or [], "msg": msg}]}
+
+async def resolve_fields(user_id: str, field_ids: set) -> dict:
+    object_ids = [ObjectId(f) for f in field_ids if ObjectId.is_valid(f)]
+    fields = await db.fields.find({"_id": {"$in": object_ids}, "user_id": user_id}, {"nome": 1, "area_ha": 1}).to_list(None)
+    return {str(f["_id"]): f for f in fields}
+
+def validate_records(model, records: list) -> Tuple[list, List[dict]]:
+    # (row, model instance) for every valid record, and the errors of the rest
+    valid, errors = [], []
+    for row, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append(row_error(row, "Expected an object"))
+            continue
+        try:
+            valid.append((row, model.model_validate(record)))
+        except ValidationError as e:
+            errors.append({"row": row, "errors": [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]})
+    return valid, errors
+
+def build_documents(collection: str, user_id: str, valid: list, fields: Optional[dict]) -> Tuple[List[int], List[dict], List[dict]]:
+    # Rows, documents to insert and errors; harvests need their `fields`
+    _, build = IMPORT_COLLECTIONS[collection]
+    rows, docs, errors = [], [], []
+    for row, item in valid:
+        if fields is None:
+            docs.append(build(item, user_id))
+        elif item.field_id not in fields:
+            errors.append(row_error(row, "Field not found", ["field_id"]))
+            continue
+        elif not fields[item.field_id].get("area_ha"):
+            # Productivity is sacas per hectare
+            errors.append(row_error(row, "Field has no area", ["field_id"]))
+            continue
+        else:
+            docs.append(build(item, user_id, fields[item.field_id]))
+        rows.append(row)
+    return rows, docs, errors
+
+async def import_records(collection: str, user_id: str, records: list) -> dict:
+    model, _ = IMPORT_COLLECTIONS[collection]
+    loop = asyncio.get_running_loop()
+    valid, errors = await loop.run_in_executor(None, validate_records, model, records)
+    
+    fields = None
+    if collection == "harvests":
+        fields = await resolve_fields(user_id, {item.field_id for _, item in valid})
+    rows, docs, build_errors = await loop.run_in_executor(None, build_documents, collection, user_id, valid, fields)
+    errors.extend(build_errors)
+    
+    inserted = []
+    for start in range(0, len(docs), IMPORT_BATCH_SIZE):
+        batch = docs[start:start + IMPORT_BATCH_SIZE]
+        try:
+            await db[collection].insert_many(batch, ordered=False)
+            inserted.extend(batch)
+        except BulkWriteError as e:
+            failed = set()
+            for err in e.details["writeErrors"]:
+                failed.add(err["index"])
+                errors.append(row_error(rows[start + err["index"]], err["errmsg"]))
+            inserted.extend(doc for i, doc in enumerate(batch) if i not in failed)
+    
+    await apply_stats_deltas(user_id, collection, inserted)
+    if collection == "harvests":
+        await touch_fields(user_id, {doc["field_id"] for doc in inserted})
+    if inserted:
+        await bump_versions(user_id, collection)
+    errors.sort(key=lambda e: e["row"])
+    return {"inserted": len(inserted), "errors": errors}
+
+@api_router.post("/import/{collection}")
+async def import_collection(collection: str, request: Request, current_user = Depends(get_current_user)):
+    if collection not in IMPORT_COLLECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    
+    content_type = request.headers.get("content-type", "")
+    loop = asyncio.get_running_loop()
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Missing CSV file")
+            body = await upload.read()
+            records = await loop.run_in_executor(None, lambda: parse_csv(body.decode("utf-8-sig")))
+        elif content_type.startswith("text/csv"):
+            body = await request.body()
+            records = await loop.run_in_executor(None, lambda: parse_csv(body.decode("utf-8-sig")))
+        else:
+            body = await request.body()
+            records = await loop.run_in_executor(None, json.loads, body)
+    except (UnicodeDecodeError, csv.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Could not parse import body")
+    
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of records")
+    if len(records) > IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {IMPORT_MAX_ROWS} rows per import")
+    
+    return await import_records(collection, str(current_user["_id"]), records)
 
 
 # ==================== QUOTATIONS ====================
 
+QUOTATIONS_REFRESH_SECONDS = float(os.environ.get('QUOTATIONS_REFRESH_SECONDS', 60))
+QUOTATIONS_MAX_STALE_SECONDS = float(os.environ.get('QUOTATIONS_MAX_STALE_SECONDS', 3600))
+quotation_feed = QuotationFeed(
+    provider_from_env(os.environ.get('QUOTATIONS_PROVIDER', 'mock'), os.environ.get('QUOTATIONS_FIXTURE')),
+    interval=QUOTATIONS_REFRESH_SECONDS,
+    max_stale=QUOTATIONS_MAX_STALE_SECONDS
+)
+
+QUOTATIONS_TICK_RETENTION_DAYS = int(os.environ.get('QUOTATIONS_TICK_RETENTION_DAYS', 90))
+quotation_history = QuotationHistory(db, tick_retention_days=QUOTATIONS_TICK_RETENTION_DAYS)
+
+# Seconds between attempts at creating the history collections on startup
+QUOTATIONS_SETUP_RETRY_SECONDS = float(os.environ.get('QUOTATIONS_SETUP_RETRY_SECONDS', 30))
+
+async def setup_quotation_history():
+    # Runs in the background from startup(): the rest of the API doesn't need
+    # these collections, so a Mongo error here is logged and retried instead of
+    # failing the boot. Snapshots recorded meanwhile still land in quotation_ticks.
+    while True:
+        try:
+            await quotation_history.setup()
+            return
+        except PyMongoError as e:
+            logger.error(f"Quotation history setup failed, retrying in {QUOTATIONS_SETUP_RETRY_SECONDS:g}s: {e}")
+            await asyncio.sleep(QUOTATIONS_SETUP_RETRY_SECONDS)
+
+# Range served when the client doesn't pass `from`
+HISTORY_DEFAULT_RANGE = {
+    "minute": timedelta(days=1),
+    "hour": timedelta(days=7),
+    "day": timedelta(days=365),
+    "week": timedelta(days=3 * 365),
+}
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 @api_router.get("/quotations/b3")
-async def get_b3_quotations():
-    # Mock data - In production, integrate with real B3 API
-    import random
-    
-    # Commodities agrícolas
-    base_prices = {
-        "Soja": 130.50,
-        "Milho": 65.20,
-        "Trigo": 95.80,
-        "Algodão": 180.30,
-        "Aveia": 45.60
+async def get_b3_quotations(request: Request):
+    # Every client gets the same pre-encoded snapshot; the provider is only
+    # hit by the quotations.refresh job (see JOBS)
+    try:
+        snapshot = await quotation_feed.get()
+    except Exception:
+        raise HTTPException(status_code=503, detail="Quotations unavailable")
+    
+    headers = {
+        "ETag": snapshot.etag,
+        "Last-Modified": format_datetime(snapshot.fetched_at.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": f"public, max-age={int(quotation_feed.interval)}, stale-while-revalidate={int(quotation_feed.interval)}"
     }
+    if not_modified(request, snapshot.etag, snapshot.fetched_at):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+@api_router.get("/quotations/history")
+async def get_quotation_history(
+    produto: str,
+    interval: str = "day",
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None
+):
+    if interval not in HISTORY_DEFAULT_RANGE:
+        raise HTTPException(status_code=400, detail="Interval must be minute, hour, day or week")
+    end = naive_utc(to) or datetime.utcnow()
+    start = naive_utc(from_) or end - HISTORY_DEFAULT_RANGE[interval]
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    return FastJSONResponse(await quotation_history.series(produto, interval, start, end))
+
+
+# ==================== VALUATION ====================
+
+@api_router.get("/valuation/harvests")
+async def get_harvest_valuation(current_user = Depends(get_current_user)):
+    user_id = str(current_user["_id"])
+    try:
+        snapshot = await quotation_feed.get()
+    except Exception:
+        raise HTTPException(status_code=503, detail="Quotations unavailable")
     
-    quotations = []
+    harvests, closes, stats = await asyncio.gather(
+        db.harvests.find({"user_id": user_id}, {"_id": 0, **{c: 1 for c in HARVEST_COLUMNS}}).batch_size(10000).to_list(None),
+        db.quotation_ohlc.find({"granularity": "day"}, {"_id": 0, "produto": 1, "bucket": 1, "close": 1}).to_list(None),
+        load_user_stats(user_id),
+    )
+    current_prices = {q["produto"]: q["preco"] for q in snapshot.quotations}
+    receitas = {d["key"]: d.get("receitas", 0) for d in stats if d["scope"] == "cultura" and d.get("receitas_count", 0) > 0}
     
-    # Adicionar commodities agrícolas
-    for produto, base_price in base_prices.items():
-        variation = random.uniform(-5, 5)
-        current_price = base_price * (1 + variation / 100)
-        
-        quotations.append({
-            "produto": produto,
-            "preco": round(current_price, 2),
-            "variacao": round(variation, 2),
-            "unidade": "R$/sc",
-            "data": datetime.utcnow().isoformat()
-        })
-    
-    # Adicionar Dólar (USDBRL)
-    dolar_base = 5.85
-    dolar_variation = random.uniform(-2, 2)
-    dolar_price = dolar_base * (1 + dolar_variation / 100)
-    
-    quotations.insert(0, {  # Inserir no início da lista
-        "produto": "Dólar (USDBRL)",
-        "preco": round(dolar_price, 4),
-        "variacao": round(dolar_variation, 2),
-        "unidade": "R$",
-        "data": datetime.utcnow().isoformat()
-    })
+    # Vectorized in pandas, off the event loop
+    loop = asyncio.get_running_loop()
+    valuation = await loop.run_in_executor(
+        None, lambda: value_harvests(harvests_frame(harvests), current_prices, closes_frame(closes), receitas)
+    )
+    valuation["cotacoes_em"] = snapshot.fetched_at.isoformat()
+    return FastJSONResponse(valuation)
+
+
+# ==================== WEATHER ====================
+
+# The clima tab goes through the backend so one provider key (or none, for
+# Open-Meteo) serves every phone. Weather is cached per grid tile of
+# WEATHER_TILE_DEGREES (0.1 degree is about 11 km), so farms in the same tile
+# share a single upstream fetch; see weather.py.
+WEATHER_CURRENT_TTL = float(os.environ.get('WEATHER_CURRENT_TTL', 600))
+WEATHER_FORECAST_TTL = float(os.environ.get('WEATHER_FORECAST_TTL', 3600))
+weather_service = WeatherService(
+    weather_provider_from_env(os.environ.get('WEATHER_PROVIDER', 'mock'), os.environ.get('WEATHER_FIXTURE')),
+    tile_degrees=float(os.environ.get('WEATHER_TILE_DEGREES', 0.1)),
+    current_ttl=WEATHER_CURRENT_TTL,
+    forecast_ttl=WEATHER_FORECAST_TTL,
+    max_stale=float(os.environ.get('WEATHER_MAX_STALE_SECONDS', 6 * 3600)),
+    forecast_days=int(os.environ.get('WEATHER_FORECAST_DAYS', 5)),
+    maxsize=int(os.environ.get('WEATHER_CACHE_SIZE', 5000))
+)
+
+@api_router.get("/weather")
+async def get_weather(
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    cidade: Optional[str] = Query(None, min_length=2, max_length=100),
+    current_user = Depends(get_current_user)
+):
+    local = None
+    if lat is None or lon is None:
+        if not cidade:
+            raise HTTPException(status_code=400, detail="Pass lat and lon, or cidade")
+        try:
+            place = await weather_service.geocode(cidade)
+        except Exception:
+            logger.exception("Weather geocoding failed")
+            raise HTTPException(status_code=503, detail="Weather unavailable")
+        if place is None:
+            raise HTTPException(status_code=404, detail="City not found")
+        lat, lon, local = place["latitude"], place["longitude"], place["nome"]
     
-    return quotations
+    try:
+        data = await weather_service.get(lat, lon)
+    except Exception:
+        logger.exception("Weather fetch failed")
+        raise HTTPException(status_code=503, detail="Weather unavailable")
+    return FastJSONResponse(
+        {"local": local, **data},
+        headers={"Cache-Control": f"private, max-age={int(min(WEATHER_CURRENT_TTL, 300))}"}
+    )
+
+
+# ==================== BATCH ====================
+
+# One round trip for a whole screen: the operations are GET paths on this
+# API, authenticated once and run concurrently through the app's own router
+# (no middleware, no network). Bodies are spliced into the combined response
+# as-is rather than decoded and re-encoded. An operation may carry the ETag
+# it already has (`if_none_match`) and come back as a 304 with no body.
+BATCH_MAX_OPERATIONS = 20
+BATCH_EXCLUDED_PREFIXES = ("/api/batch", "/api/export")
+BATCH_FORWARDED_HEADERS = ("etag", "last-modified", "cache-control")
+
+class BatchStreamingResponse(Exception):
+    # Raised from send() to stop a streaming handler; may reach dispatch_get
+    # wrapped in the response's task group ExceptionGroup
+    pass
+
+def batch_route(target: str) -> Optional[str]:
+    # Template of the route `target` resolves to, matched on the decoded path
+    # exactly as dispatch_get will route it (a path served for other methods
+    # only counts too: it would answer 405)
+    scope = {"type": "http", "method": "GET", "path": unquote(target.partition("?")[0]), "root_path": ""}
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial
+
+def batch_error(status_code: int, detail: str) -> dict:
+    return {"status": status_code, "headers": {}, "body": dumps({"detail": detail}), "json": True}
+
+async def dispatch_get(parent: Request, target: str, if_none_match: Optional[str] = None) -> dict:
+    path, _, query = target.partition("?")
+    headers = [(k, v) for k, v in parent.scope["headers"] if k in (b"authorization", b"accept")]
+    try:
+        if if_none_match:
+            headers.append((b"if-none-match", if_none_match.encode("latin-1")))
+        scope = {
+            **parent.scope,
+            "method": "GET",
+            "path": unquote(path),
+            "raw_path": path.encode("latin-1"),
+            "query_string": query.encode("latin-1"),
+            "headers": headers,
+        }
+    except UnicodeEncodeError:
+        return batch_error(400, "Paths and ETags must be ASCII (percent-encode the rest)")
+    
+    # No body, then a disconnect that never comes: a handler listening for it
+    # must wait rather than spin on more requests
+    never = asyncio.Event()
+    received = False
+    
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await never.wait()
+    
+    response = {"status": 500, "headers": [], "body": [], "streaming": False}
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            if message.get("more_body", False):
+                response["streaming"] = True
+                raise BatchStreamingResponse()
+            response["body"].append(message.get("body", b""))
+    
+    try:
+        await app.router(scope, receive, send)
+    except StarletteHTTPException as e:
+        # Unmatched paths and methods raise instead of responding; outside a
+        # batch the exception middleware turns them into responses
+        return batch_error(e.status_code, e.detail)
+    except Exception:
+        if response["streaming"]:
+            return batch_error(400, "Streaming responses can't be batched")
+        logger.exception(f"Batch operation failed: GET {target}")
+        return {"status": 500, "headers": {}, "body": b'{"detail":"Internal Server Error"}', "json": True}
+    
+    headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in response["headers"]}
+    return {
+        "status": response["status"],
+        "headers": {k: v for k, v in headers.items() if k in BATCH_FORWARDED_HEADERS},
+        "body": b"".join(response["body"]),
+        "json": headers.get("content-type", "").startswith("application/json"),
+    }
+
+@api_router.post("/batch")
+async def batch(batch_request: BatchRequest, request: Request, current_user = Depends(get_current_user)):
+    operations = batch_request.operations
+    if not operations:
+        raise HTTPException(status_code=400, detail="No operations")
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_OPERATIONS} operations per batch")
+    for op in operations:
+        # Checked on the route the path resolves to, so percent-encoding can't sneak past
+        route = batch_route(op.path)
+        if not op.path.startswith("/api/") or (route or "").startswith(BATCH_EXCLUDED_PREFIXES):
+            raise HTTPException(status_code=400, detail=f"Operation not allowed in a batch: {op.path}")
+    
+    token = batch_user.set(current_user)
+    try:
+        results = await asyncio.gather(*(dispatch_get(request, op.path, op.if_none_match) for op in operations))
+    finally:
+        batch_user.reset(token)
+    
+    parts = []
+    for op, result in zip(operations, results):
+        body = result["body"] if result["json"] and result["body"] else dumps(result["body"].decode("utf-8", "replace") or None)
+        parts.append(
+            b'{"path":' + dumps(op.path) + b',"status":' + str(result["status"]).encode() +
+            b',"headers":' + dumps(result["headers"]) + b',"body":' + body + b'}'
+        )
+    return Response(content=b'{"responses":[' + b",".join(parts) + b']}', media_type="application/json")
+
+
+# ==================== JOBS ====================
+
+# Periodic work runs in the API processes themselves (see scheduler.py).
+# Exclusive jobs hold a lease in scheduler_leases, so each run happens on one
+# worker of one replica; quotations.refresh is local because every worker
+# serves quotations from its own in-memory snapshot.
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TRIAL_EXPIRY_SECONDS = float(os.environ.get('TRIAL_EXPIRY_SECONDS', 3600))
+ROLLUPS_VERIFY_CRON = os.environ.get('ROLLUPS_VERIFY_CRON', '30 6 * * *')
+
+scheduler = Scheduler(MongoLeaseStore(db.scheduler_leases), owner=f"{socket.gethostname()}:{os.getpid()}")
+
+async def refresh_quotations():
+    await asyncio.shield(quotation_feed.refresh())
+
+last_recorded_quotations: Optional[datetime] = None
+
+async def record_quotations():
+    # Whichever worker holds the lease records its snapshot, once per fetch
+    global last_recorded_quotations
+    snapshot = await quotation_feed.get()
+    if snapshot.fetched_at != last_recorded_quotations:
+        await quotation_history.record(snapshot)
+        last_recorded_quotations = snapshot.fetched_at
+
+async def run_debt_alerts_precompute():
+    count = await precompute_debt_alerts()
+    logger.info(f"Precomputed debt alerts for {count} user(s)")
+
+async def run_rollups_verify():
+    # Report only: a rebuild can still miscount a write caught in flight (see
+    # rebuild_user_stats), so fixing is left to an operator
+    # (`manage.py rollups rebuild --user-id`)
+    user_ids = await db.user_stats.distinct("user_id", {"scope": "meta", "built_at": {"$exists": True}})
+    drifted = 0
+    for user_id in user_ids:
+        drift = await verify_user_stats(user_id)
+        if drift:
+            drifted += 1
+            logger.warning(f"Rollups for {user_id} drifted on {len(drift)} metric(s); run `manage.py rollups rebuild --user-id {user_id}`")
+    logger.info(f"Verified rollups for {len(user_ids)} user(s), {drifted} drifted")
+
+async def expire_trials():
+    # Sessions under AUTH_TRUST_TOKEN_CLAIMS keep their token's plan (see AUTH HELPERS)
+    now = datetime.utcnow()
+    expired = await db.users.distinct("_id", {"plan": "trial", "trial_end_date": {"$lt": now}})
+    if not expired:
+        return
+    await db.users.update_many(
+        {"_id": {"$in": expired}, "plan": "trial"},
+        {"$set": {"plan": "expired"}}
+    )
+    for user_id in expired:
+        invalidate_user(str(user_id))
+    logger.info(f"Expired {len(expired)} trial(s)")
+
+scheduler.add_job(
+    "quotations.refresh", refresh_quotations,
+    Interval(QUOTATIONS_REFRESH_SECONDS, jitter=min(5.0, QUOTATIONS_REFRESH_SECONDS / 10)),
+    exclusive=False, timeout=30, run_at_start=True
+)
+scheduler.add_job("quotations.record", record_quotations, Interval(QUOTATIONS_REFRESH_SECONDS), timeout=30)
+scheduler.add_job("alerts.precompute", run_debt_alerts_precompute, Cron("1 0 * * *", tz=ALERTS_TIMEZONE), timeout=1800)
+scheduler.add_job("rollups.verify", run_rollups_verify, Cron(ROLLUPS_VERIFY_CRON, jitter=300), timeout=3600)
+scheduler.add_job("users.expire_trials", expire_trials, Interval(TRIAL_EXPIRY_SECONDS, jitter=60), timeout=300, run_at_start=True)
+
+
+# ==================== ADMIN ====================
+
+# Every per-user query filters on user_id first, so each collection gets a
+# compound index led by it. Created idempotently on startup.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("plan", ASCENDING), ("trial_end_date", ASCENDING)], name="plan_trial_end"),
+    ],
+    "expenses": [
+        IndexModel([("user_id", ASCENDING), ("data", DESCENDING), ("_id", DESCENDING)], name="user_data_id"),
+        SYNC_INDEX,
+    ],
+    "revenues": [
+        IndexModel([("user_id", ASCENDING), ("data", DESCENDING), ("_id", DESCENDING)], name="user_data_id"),
+        SYNC_INDEX,
+    ],
+    "debts": [
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("vencimento", ASCENDING)], name="user_status_vencimento"),
+        IndexModel([("user_id", ASCENDING), ("vencimento", ASCENDING), ("_id", ASCENDING)], name="user_vencimento_id"),
+        SYNC_INDEX,
+    ],
+    "fields": [IndexModel([("user_id", ASCENDING)], name="user"), SYNC_INDEX],
+    "harvests": [
+        IndexModel([("user_id", ASCENDING), ("field_id", ASCENDING)], name="user_field"),
+        IndexModel([("user_id", ASCENDING), ("data_colheita", DESCENDING), ("_id", DESCENDING)], name="user_data_colheita_id"),
+        SYNC_INDEX,
+    ],
+    "tombstones": [
+        SYNC_INDEX,
+        IndexModel([("updated_at", ASCENDING)], expireAfterSeconds=SYNC_TOMBSTONE_DAYS * 86400, name="ttl"),
+    ],
+    "user_stats": [IndexModel([("user_id", ASCENDING), ("scope", ASCENDING), ("key", ASCENDING)], unique=True, name="user_scope_key")],
+}
+
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()}
+
+async def ensure_indexes():
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # Conflicting options or duplicate data for a unique index: keep serving
+            logger.error(f"Could not create indexes on {collection}: {e}")
+
+async def get_admin_user(current_user = Depends(get_current_user)):
+    if (await user_profile(current_user))["email"].lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+@api_router.get("/admin/indexes")
+async def get_index_report(current_user = Depends(get_admin_user)):
+    report = {}
+    for collection in INDEXES:
+        stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+        report[collection] = sorted([
+            {
+                "name": s["name"],
+                "key": dict(s["key"]),
+                "accesses": s["accesses"]["ops"],
+                "since": s["accesses"]["since"],
+                "declared": any(i.document["name"] == s["name"] for i in INDEXES[collection]),
+            }
+            for s in stats
+        ], key=lambda s: s["name"])
+    return report
+
+
+@api_router.get("/admin/jobs")
+async def get_job_stats(current_user = Depends(get_admin_user)):
+    return {"enabled": SCHEDULER_ENABLED, "owner": scheduler.owner, "jobs": scheduler.stats()}
+
+
+@api_router.get("/admin/cache")
+async def get_cache_stats(current_user = Depends(get_admin_user)):
+    return {
+        "users": {**user_cache.stats(), "trust_token_claims": AUTH_TRUST_TOKEN_CLAIMS},
+        "weather": weather_service.stats()
+    }
+
+
+# ==================== METRICS ====================
+
+# Prometheus scrape endpoint, outside /api. With METRICS_TOKEN set, scrapers
+# must send it as a bearer token.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    if METRICS_TOKEN:
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied.encode("utf-8"), METRICS_TOKEN.encode("utf-8")):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 
 # ==================== ROOT ====================
@@ -564,6 +2144,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# brotli and zstd are used when their packages are installed; gzip always is
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_ENCODINGS = [e.strip() for e in os.environ.get('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',') if e.strip()]
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    encodings=COMPRESSION_ENCODINGS,
+    routes={
+        # Exports stream hundreds of MB: cheaper levels keep a worker from
+        # spending a core per download, at a few points of ratio
+        "/api/export/": {"levels": {"gzip": 1, "br": 1}},
+    }
+)
+
+# Request counts and latency per route template (see metrics.py), compression included
+app.add_middleware(MetricsMiddleware)
+
+# Per-request phase timings (see timing.py) in a Server-Timing header and a
+# JSON log line, for requests of at least SERVER_TIMING_LOG_MS. Added last so
+# it sees the whole request, compression included. Not installed at all
+# unless SERVER_TIMING is set.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+SERVER_TIMING_LOG_MS = float(os.environ.get('SERVER_TIMING_LOG_MS', 0))
+if SERVER_TIMING:
+    app.add_middleware(TimingMiddleware, log_min_ms=SERVER_TIMING_LOG_MS)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -571,6 +2177,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
+# Background tasks started by startup() and cancelled by shutdown()
+startup_tasks: List[asyncio.Task] = []
+
+async def startup():
+    await ensure_indexes()
+    startup_tasks.append(asyncio.create_task(setup_quotation_history()))
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+
+async def shutdown():
+    for task in startup_tasks:
+        task.cancel()
+    await asyncio.gather(*startup_tasks, return_exceptions=True)
+    startup_tasks.clear()
+    await scheduler.stop()
     client.close()
+    bcrypt_executor.shutdown(wait=False)
+    mark_process_dead()
@@ -0,0 +1,144 @@
+"""
+Per-request timing.
+
+TimingMiddleware gives every request a RequestTimings, and code on the
+request path wraps its phases in `span(name)`:
+
+    with span("db"):
+        docs = await db.fields.find(...).to_list(1000)
+
+Durations accumulate per name (a span entered seven times is reported once
+with its total and a count, which is how an N+1 shows up). Spans may nest,
+and each is reported on its own, so they can add up to more than the total.
+They go out in a Server-Timing header, next to the request's total, and in
+one JSON log line per request. Outside a timed request (the server only installs the
+middleware when SERVER_TIMING is set) `span` returns a shared no-op and
+costs a context variable lookup.
+"""
+
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("timing")
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}  # name -> [seconds, count]
+
+    def add(self, name: str, seconds: float):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        parts = []
+        for name, (seconds, count) in self.spans.items():
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+class _Span:
+    __slots__ = ("timings", "name", "started")
+
+    def __init__(self, timings: RequestTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str):
+    """Time a block under `name` in the current request, if it is being timed."""
+    timings = _current.get()
+    if timings is None:
+        return _NO_SPAN
+    return _Span(timings, name)
+
+
+class TimingMiddleware:
+    """ASGI middleware timing each HTTP request.
+
+    Adds a Server-Timing header when the response starts and logs one JSON
+    line when it ends (only for requests of at least `log_min_ms`; None
+    disables the log).
+    """
+
+    def __init__(self, app, header: bool = True, log_min_ms: Optional[float] = 0.0):
+        self.app = app
+        self.header = header
+        self.log_min_ms = log_min_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = None
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.header:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.header().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _current.reset(token)
+            self.log(scope, status, timings)
+
+    def log(self, scope, status: Optional[int], timings: RequestTimings):
+        total_ms = timings.elapsed() * 1000
+        if self.log_min_ms is None or total_ms < self.log_min_ms:
+            return
+        endpoint = scope.get("endpoint")
+        logger.info(json.dumps({
+            "method": scope["method"],
+            "path": scope["path"],
+            "handler": getattr(endpoint, "__name__", None),
+            "status": status,
+            "total_ms": round(total_ms, 2),
+            "spans": {name: {"ms": round(seconds * 1000, 2), "count": count} for name, (seconds, count) in timings.spans.items()},
+        }, ensure_ascii=False))
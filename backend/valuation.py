@@ -0,0 +1,129 @@
+"""
+Mark-to-market valuation of stored harvests.
+
+Everything here works on columnar pandas frames: harvests are joined with
+current prices by cultura and with the daily close on (or before) their
+harvest date via merge_asof, then aggregated per cultura and per field.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+HARVEST_COLUMNS = ["field_id", "field_name", "area_ha", "cultura", "quantidade_sacas", "data_colheita"]
+
+
+def harvests_frame(docs: List[dict]) -> pd.DataFrame:
+    # Built column by column with explicit dtypes: much cheaper than letting
+    # pandas infer a frame from a list of dicts
+    def column(name):
+        return [d.get(name) for d in docs]
+
+    return pd.DataFrame({
+        # Grouping keys as categoricals: groupby on object strings dominates otherwise
+        "field_id": pd.Categorical(column("field_id")),
+        "field_name": pd.Series(column("field_name"), dtype=object),
+        "area_ha": np.array(column("area_ha"), dtype="float64"),
+        "cultura": pd.Categorical(column("cultura")),
+        "quantidade_sacas": np.array(column("quantidade_sacas"), dtype="float64"),
+        "data_colheita": pd.DatetimeIndex(column("data_colheita")).astype("datetime64[ns]"),
+    })
+
+
+def closes_frame(docs: List[dict]) -> pd.DataFrame:
+    """Daily closes as produto/bucket/close rows (quotation_ohlc day documents)."""
+    frame = pd.DataFrame(docs, columns=["produto", "bucket", "close"])
+    # Join keys must share dtypes with harvests_frame for merge_asof
+    frame["produto"] = frame["produto"].astype(str)
+    frame["bucket"] = pd.to_datetime(frame["bucket"]).astype("datetime64[ns]")
+    frame["close"] = frame["close"].astype("float64")
+    return frame
+
+
+def _round(value) -> float:
+    return None if pd.isna(value) else round(float(value), 2)
+
+
+def _records(frame: pd.DataFrame) -> List[dict]:
+    return frame.round(2).astype(object).where(frame.notna(), None).to_dict("records")
+
+
+def value_harvests(
+    harvests: pd.DataFrame,
+    current_prices: Dict[str, float],
+    closes: pd.DataFrame,
+    receitas: Dict[str, float],
+) -> dict:
+    """Value every harvest at today's price and at the close of its harvest day.
+
+    Returns totals, a per-cultura breakdown (including P&L of the price move
+    since harvest and booked revenues for comparison) and value per hectare
+    for each field. Harvests with no quotation for their cultura, or harvested
+    before price history began, are left out of the affected sums and counted;
+    a sum with nothing left in it is null rather than 0.
+    """
+    df = harvests.sort_values("data_colheita", kind="stable")
+    df = df.assign(
+        preco_atual=df["cultura"].map(current_prices).astype("float64"),
+        # merge_asof wants plain join keys on both sides
+        cultura=df["cultura"].astype(str),
+    )
+
+    if len(closes):
+        df = pd.merge_asof(
+            df,
+            closes.sort_values("bucket").rename(columns={"close": "preco_colheita"}),
+            left_on="data_colheita",
+            right_on="bucket",
+            left_by="cultura",
+            right_by="produto",
+            direction="backward",
+        )
+    else:
+        df = df.assign(preco_colheita=np.nan)
+
+    df["cultura"] = df["cultura"].astype("category")
+    sacas = df["quantidade_sacas"].to_numpy()
+    df["valor_atual"] = sacas * df["preco_atual"].to_numpy()
+    df["valor_colheita"] = sacas * df["preco_colheita"].to_numpy()
+    df["pnl"] = df["valor_atual"] - df["valor_colheita"]
+
+    df["sem_preco"] = df["preco_atual"].isna()
+    df["sem_historico"] = df["preco_colheita"].isna()
+
+    # min_count=1 so a value nobody could price stays null instead of summing to 0
+    valores = ["valor_atual", "valor_colheita", "pnl"]
+    by_cultura = df.groupby("cultura", sort=True, observed=True)
+    por_cultura = pd.concat([
+        by_cultura["quantidade_sacas"].sum().rename("sacas"),
+        by_cultura[valores].sum(min_count=1),
+        by_cultura[["sem_preco", "sem_historico"]].sum().add_prefix("safras_"),
+    ], axis=1).reset_index()
+    por_cultura["preco_atual"] = por_cultura["cultura"].map(current_prices).astype("float64")
+    por_cultura["receitas"] = por_cultura["cultura"].map(receitas).astype("float64").fillna(0.0)
+    por_cultura["receitas_vs_colheita"] = por_cultura["receitas"] - por_cultura["valor_colheita"]
+
+    # Harvests can outlive their field; area comes from the harvest itself
+    by_talhao = df.groupby("field_id", sort=False, observed=True)
+    por_talhao = pd.concat([
+        by_talhao.agg(nome=("field_name", "first"), area_ha=("area_ha", "first"), sacas=("quantidade_sacas", "sum")),
+        by_talhao["valor_atual"].sum(min_count=1),
+    ], axis=1).reset_index()
+    por_talhao["valor_por_ha"] = por_talhao["valor_atual"] / por_talhao["area_ha"].replace(0, np.nan)
+
+    culturas = _records(por_cultura[[
+        "cultura", "sacas", "preco_atual", "valor_atual", "valor_colheita", "pnl",
+        "receitas", "receitas_vs_colheita", "safras_sem_preco", "safras_sem_historico",
+    ]])
+    talhoes = _records(por_talhao.sort_values("valor_atual", ascending=False))
+
+    return {
+        "total_sacas": _round(df["quantidade_sacas"].sum()),
+        "valor_atual": _round(df["valor_atual"].sum(min_count=1)),
+        "valor_colheita": _round(df["valor_colheita"].sum(min_count=1)),
+        "pnl": _round(df["pnl"].sum(min_count=1)),
+        "receitas": _round(sum(receitas.values())),
+        "por_cultura": culturas,
+        "por_talhao": talhoes,
+    }
@@ -0,0 +1,323 @@
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+import unicodedata
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Condition codes understood by the app's icons
+CONDITIONS = ("sunny", "partly-sunny", "cloudy", "rainy")
+
+
+# ==================== PROVIDERS ====================
+
+class WeatherProvider(abc.ABC):
+    """Source of weather data for a point.
+
+    `current` returns {temperatura, condicao, umidade, vento_kmh}; `forecast`
+    returns one {data, temp_max, temp_min, condicao, chuva_prob} per day;
+    `geocode` resolves a city name to {nome, latitude, longitude} or None.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def current(self, lat: float, lon: float) -> dict:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def forecast(self, lat: float, lon: float, days: int) -> List[dict]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def geocode(self, query: str) -> Optional[dict]:
+        raise NotImplementedError
+
+
+class MockProvider(WeatherProvider):
+    """Plausible weather derived from the coordinates and the date, stable within a day."""
+
+    name = "mock"
+
+    @staticmethod
+    def _rng(*parts) -> random.Random:
+        seed = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+        return random.Random(int(seed[:16], 16))
+
+    async def current(self, lat: float, lon: float) -> dict:
+        rng = self._rng(round(lat, 4), round(lon, 4), date.today(), datetime.utcnow().hour)
+        return {
+            "temperatura": round(rng.uniform(18, 33), 1),
+            "condicao": rng.choice(CONDITIONS),
+            "umidade": rng.randint(45, 90),
+            "vento_kmh": round(rng.uniform(3, 25), 1),
+        }
+
+    async def forecast(self, lat: float, lon: float, days: int) -> List[dict]:
+        forecast = []
+        for offset in range(days):
+            day = date.today() + timedelta(days=offset)
+            rng = self._rng(round(lat, 4), round(lon, 4), day)
+            temp_min = round(rng.uniform(14, 22), 1)
+            forecast.append({
+                "data": day.isoformat(),
+                "temp_max": round(temp_min + rng.uniform(5, 12), 1),
+                "temp_min": temp_min,
+                "condicao": rng.choice(CONDITIONS),
+                "chuva_prob": rng.randint(0, 100),
+            })
+        return forecast
+
+    async def geocode(self, query: str) -> Optional[dict]:
+        # Somewhere in the agricultural belt, the same spot for the same name
+        rng = self._rng(normalize_place(query))
+        return {"nome": query.strip().title(), "latitude": round(rng.uniform(-30, -10), 4), "longitude": round(rng.uniform(-56, -44), 4)}
+
+
+class FixtureProvider(WeatherProvider):
+    """Serves weather from a JSON file with `current`, `forecast` and `places` keys, re-read on every call."""
+
+    name = "fixture"
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    async def _load(self) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._read)
+
+    def _read(self) -> dict:
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    async def current(self, lat: float, lon: float) -> dict:
+        return (await self._load())["current"]
+
+    async def forecast(self, lat: float, lon: float, days: int) -> List[dict]:
+        return (await self._load())["forecast"][:days]
+
+    async def geocode(self, query: str) -> Optional[dict]:
+        places = (await self._load()).get("places", {})
+        return {normalize_place(k): v for k, v in places.items()}.get(normalize_place(query))
+
+
+class OpenMeteoProvider(WeatherProvider):
+    """Open-Meteo forecast and geocoding APIs (no key required)."""
+
+    name = "open-meteo"
+    FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+    GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+
+    def __init__(self, timeout: float = 10.0):
+        import requests  # only needed by this provider
+
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    async def _get(self, url: str, params: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._request, url, params)
+
+    def _request(self, url: str, params: dict) -> dict:
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def condition(code: int) -> str:
+        # WMO weather interpretation codes
+        if code == 0:
+            return "sunny"
+        if code in (1, 2):
+            return "partly-sunny"
+        if code in (3, 45, 48) or 71 <= code <= 77 or code in (85, 86):
+            return "cloudy"
+        return "rainy"
+
+    async def current(self, lat: float, lon: float) -> dict:
+        data = await self._get(self.FORECAST_URL, {
+            "latitude": lat,
+            "longitude": lon,
+            "current": "temperature_2m,relative_humidity_2m,wind_speed_10m,weather_code",
+        })
+        current = data["current"]
+        return {
+            "temperatura": current["temperature_2m"],
+            "condicao": self.condition(current["weather_code"]),
+            "umidade": current["relative_humidity_2m"],
+            "vento_kmh": current["wind_speed_10m"],
+        }
+
+    async def forecast(self, lat: float, lon: float, days: int) -> List[dict]:
+        data = await self._get(self.FORECAST_URL, {
+            "latitude": lat,
+            "longitude": lon,
+            "daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max,weather_code",
+            "timezone": "auto",
+            "forecast_days": days,
+        })
+        daily = data["daily"]
+        return [
+            {
+                "data": day,
+                "temp_max": daily["temperature_2m_max"][i],
+                "temp_min": daily["temperature_2m_min"][i],
+                "condicao": self.condition(daily["weather_code"][i]),
+                "chuva_prob": daily["precipitation_probability_max"][i],
+            }
+            for i, day in enumerate(daily["time"])
+        ]
+
+    async def geocode(self, query: str) -> Optional[dict]:
+        data = await self._get(self.GEOCODING_URL, {"name": query, "count": 1, "language": "pt", "countryCode": "BR"})
+        results = data.get("results") or []
+        if not results:
+            return None
+        place = results[0]
+        nome = place["name"] + (f", {place['admin1']}" if place.get("admin1") else "")
+        return {"nome": nome, "latitude": place["latitude"], "longitude": place["longitude"]}
+
+
+def provider_from_env(name: str, fixture_path: Optional[str] = None) -> WeatherProvider:
+    if name == "mock":
+        return MockProvider()
+    if name == "fixture":
+        if not fixture_path:
+            raise ValueError("WEATHER_FIXTURE must point to a JSON file for the fixture provider")
+        return FixtureProvider(Path(fixture_path))
+    if name == "open-meteo":
+        return OpenMeteoProvider()
+    raise ValueError(f"Unknown weather provider: {name}")
+
+
+# ==================== SERVICE ====================
+
+def normalize_place(query: str) -> str:
+    text = unicodedata.normalize("NFKD", query.strip().lower())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+
+def tile_for(lat: float, lon: float, tile_degrees: float) -> Tuple[int, int]:
+    return math.floor(lat / tile_degrees), math.floor(lon / tile_degrees)
+
+
+def tile_center(tile: Tuple[int, int], tile_degrees: float) -> Tuple[float, float]:
+    return round((tile[0] + 0.5) * tile_degrees, 4), round((tile[1] + 0.5) * tile_degrees, 4)
+
+
+class WeatherService:
+    """Weather per grid tile, cached and shared by every caller in the tile.
+
+    Coordinates snap to a `tile_degrees` grid and the provider is always asked
+    for the tile's center, so neighbouring farms share one upstream fetch and
+    one cache entry. Current conditions and forecasts are cached separately,
+    for `current_ttl` and `forecast_ttl` seconds. Concurrent misses on a tile
+    wait on a single fetch; if the provider fails, data up to `max_stale`
+    seconds old is served instead.
+    """
+
+    def __init__(
+        self,
+        provider: WeatherProvider,
+        tile_degrees: float = 0.1,
+        current_ttl: float = 600.0,
+        forecast_ttl: float = 3600.0,
+        max_stale: float = 6 * 3600.0,
+        forecast_days: int = 5,
+        maxsize: int = 5000,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.provider = provider
+        self.tile_degrees = tile_degrees
+        self.ttls = {"current": current_ttl, "forecast": forecast_ttl}
+        self.forecast_days = forecast_days
+        self.timer = timer
+        self.cache = TTLCache(maxsize=maxsize, ttl=max_stale, timer=timer)
+        self.places = TTLCache(maxsize=maxsize, ttl=7 * 86400, timer=timer)
+        self.fetches = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+
+    def tile(self, lat: float, lon: float) -> Tuple[int, int]:
+        return tile_for(lat, lon, self.tile_degrees)
+
+    async def _fetch(self, kind: str, tile: Tuple[int, int]):
+        lat, lon = tile_center(tile, self.tile_degrees)
+        self.fetches += 1
+        if kind == "current":
+            data = await self.provider.current(lat, lon)
+        else:
+            data = await self.provider.forecast(lat, lon, self.forecast_days)
+        fetched_at = datetime.utcnow()
+        self.cache.set((kind, tile), (data, fetched_at, self.timer()))
+        return data, fetched_at
+
+    async def _get(self, kind: str, tile: Tuple[int, int]) -> Tuple[object, datetime]:
+        key = (kind, tile)
+        entry = self.cache.get(key)
+        if entry is not None and self.timer() - entry[2] < self.ttls[kind]:
+            return entry[0], entry[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(kind, tile))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        try:
+            # Shielded: one caller going away must not cancel everyone's fetch
+            return await asyncio.shield(task)
+        except Exception as e:
+            if entry is None:
+                raise
+            logger.warning(f"Weather {kind} fetch for tile {tile} failed, serving stale data: {e}")
+            self.stale_served += 1
+            return entry[0], entry[1]
+
+    async def get(self, lat: float, lon: float) -> dict:
+        tile = self.tile(lat, lon)
+        (current, current_at), (forecast, forecast_at) = await asyncio.gather(
+            self._get("current", tile), self._get("forecast", tile)
+        )
+        center = tile_center(tile, self.tile_degrees)
+        return {
+            "latitude": center[0],
+            "longitude": center[1],
+            "tile": f"{self.tile_degrees:g}:{tile[0]}:{tile[1]}",
+            "atual": {**current, "atualizado_em": current_at},
+            "previsao": forecast,
+            "previsao_atualizada_em": forecast_at,
+        }
+
+    async def geocode(self, query: str) -> Optional[dict]:
+        key = normalize_place(query)
+        place = self.places.get(key)
+        if place is None:
+            place = await self.provider.geocode(query)
+            if place is not None:
+                self.places.set(key, place)
+        return place
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider.name,
+            "tile_degrees": self.tile_degrees,
+            "fetches": self.fetches,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "inflight": len(self._inflight),
+            "tiles": self.cache.stats(),
+            "places": self.places.stats(),
+        }
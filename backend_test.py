@@ -9,7 +9,9 @@ import json
 from datetime import datetime, timedelta
 import sys
 import os
+import time
 import uuid
+from urllib.parse import quote
 
 # Get backend URL from frontend .env
 def get_backend_url():
@@ -399,6 +401,118 @@ class AgroTrackTester:
             response, status = self.make_request("DELETE", f"/fields/{field_id}", token=self.user1_token)
             self.log_test("Delete Field", status == 200, "Field deleted successfully")
 
+    def test_fields_productivity_rollup(self):
+        """Test that GET /fields productivity matches the per-field harvest loop"""
+        print("\n=== Testing Fields Productivity Rollup ===")
+        
+        if not self.user1_token:
+            self.log_test("Fields Rollup Test", False, "No authentication token")
+            return
+            
+        # Two fields, one with several harvests and one without any
+        created_fields = []
+        for nome, area in [("Talhão Leste", 40.0), ("Talhão Oeste", 12.5)]:
+            response, status = self.make_request("POST", "/fields", {
+                "nome": nome,
+                "area_ha": area,
+                "cultura": "Milho"
+            }, token=self.user1_token)
+            if response and "id" in response:
+                created_fields.append(response["id"])
+                
+        if len(created_fields) != 2:
+            self.log_test("Fields Rollup Setup", False, "Failed to create fields")
+            return
+            
+        created_harvests = []
+        for sacas in [2400.0, 2650.5, 1980.0]:
+            response, status = self.make_request("POST", "/harvests", {
+                "field_id": created_fields[0],
+                "cultura": "Milho",
+                "quantidade_sacas": sacas,
+                "data_colheita": datetime.now().isoformat()
+            }, token=self.user1_token)
+            if response and "id" in response:
+                created_harvests.append(response["id"])
+                
+        fields, _ = self.make_request("GET", "/fields", token=self.user1_token)
+        harvests, _ = self.make_request("GET", "/harvests", token=self.user1_token)
+        
+        if fields is None or harvests is None:
+            self.log_test("Fields Rollup", False, "Failed to load fields or harvests")
+        else:
+            # Same computation the old per-field loop did
+            mismatches = []
+            for field in fields:
+                if field["id"] not in created_fields:
+                    continue
+                field_harvests = [h for h in harvests if h["field_id"] == field["id"]]
+                total_sacas = sum(h["quantidade_sacas"] for h in field_harvests)
+                num_harvests = len(field_harvests)
+                expected = round((total_sacas / (field["area_ha"] * num_harvests)) if num_harvests > 0 else 0, 2)
+                
+                if (field["total_safras"] != num_harvests
+                        or abs(field["total_sacas"] - total_sacas) > 1e-6
+                        or field["produtividade_media"] != expected):
+                    mismatches.append(field["nome"])
+                    
+            self.log_test("Fields Rollup", not mismatches,
+                         f"Mismatched fields: {mismatches}" if mismatches else "Productivity matches per-field loop")
+            
+        # Cleanup
+        for harvest_id in created_harvests:
+            self.make_request("DELETE", f"/harvests/{harvest_id}", token=self.user1_token)
+        for field_id in created_fields:
+            self.make_request("DELETE", f"/fields/{field_id}", token=self.user1_token)
+
+    def test_delta_sync(self):
+        """Test that /sync returns only changes and deletions since the last token"""
+        print("\n=== Testing Delta Sync ===")
+        
+        if not self.user1_token:
+            self.log_test("Delta Sync Test", False, "No authentication token")
+            return
+            
+        initial, _ = self.make_request("GET", "/sync", token=self.user1_token)
+        if not initial or not initial.get("full") or not initial.get("token"):
+            self.log_test("Delta Sync Initial", False, "Initial sync should be a full sync with a token")
+            return
+        self.log_test("Delta Sync Initial", True, f"Full sync with {sum(len(v) for v in initial['changes'].values())} documents")
+        
+        # Writes made after the token was issued, past the server's overlap window
+        time.sleep(6)
+        expense, _ = self.make_request("POST", "/expenses", {
+            "valor": 870.0,
+            "categoria": "Defensivos",
+            "cultura": "Soja",
+            "tipo": "Custeio",
+            "data": datetime.now().isoformat()
+        }, token=self.user1_token)
+        revenue, _ = self.make_request("POST", "/revenues", {
+            "valor": 12500.0,
+            "cultura": "Soja",
+            "tipo": "Venda",
+            "data": datetime.now().isoformat()
+        }, token=self.user1_token)
+        if not expense or not revenue:
+            self.log_test("Delta Sync Setup", False, "Failed to create records")
+            return
+        self.make_request("DELETE", f"/revenues/{revenue['id']}", token=self.user1_token)
+        
+        delta, _ = self.make_request("GET", f"/sync?since={quote(initial['token'])}", token=self.user1_token)
+        if delta is None:
+            self.log_test("Delta Sync", False, "Failed to sync with token")
+        else:
+            changed = [e["id"] for e in delta["changes"]["expenses"]]
+            ok = (not delta["full"]
+                  and expense["id"] in changed
+                  and revenue["id"] in delta["deleted"]["revenues"]
+                  and all(v == [] for k, v in delta["changes"].items() if k not in ("expenses", "revenues")))
+            self.log_test("Delta Sync", ok, "Only new and deleted records returned" if ok else f"Unexpected delta: {delta}")
+            
+        # Cleanup
+        self.make_request("DELETE", f"/expenses/{expense['id']}", token=self.user1_token)
+
     def test_dashboard_summary(self):
         """Test dashboard summary calculations"""
         print("\n=== Testing Dashboard Summary ===")
@@ -463,6 +577,84 @@ class AgroTrackTester:
         else:
             self.log_test("Dashboard Summary", False, "Failed to get dashboard summary")
 
+    def test_cashflow_series(self):
+        """Test monthly cash flow buckets and the running balance"""
+        print("\n=== Testing Cash Flow Series ===")
+        
+        if not self.user1_token:
+            self.log_test("Cash Flow Test", False, "No authentication token")
+            return
+            
+        # An old range nothing else writes to
+        revenue, _ = self.make_request("POST", "/revenues", {
+            "valor": 8000.0,
+            "cultura": "Milho",
+            "tipo": "Venda",
+            "data": "2019-03-15T15:00:00"
+        }, token=self.user1_token)
+        expense, _ = self.make_request("POST", "/expenses", {
+            "valor": 2500.0,
+            "categoria": "Sementes",
+            "cultura": "Milho",
+            "tipo": "Custeio",
+            "data": "2019-05-02T15:00:00"
+        }, token=self.user1_token)
+        if not revenue or not expense:
+            self.log_test("Cash Flow Setup", False, "Failed to create records")
+            return
+        
+        query = "granularity=month&from=2019-03-10T12:00:00&to=2019-05-20T12:00:00&cultura=Milho"
+        series, _ = self.make_request("GET", f"/analytics/cashflow?{query}", token=self.user1_token)
+        if series is None:
+            self.log_test("Cash Flow Series", False, "Failed to get cash flow")
+        else:
+            ok = (series["buckets"] == ["2019-03-01", "2019-04-01", "2019-05-01"]
+                  and series["receitas"] == [8000.0, 0.0, 0.0]
+                  and series["despesas"] == [0.0, 0.0, 2500.0]
+                  and series["saldo_acumulado"] == [8000.0, 8000.0, 5500.0])
+            self.log_test("Cash Flow Series", ok, "Monthly buckets and running balance" if ok else f"Unexpected series: {series}")
+        
+        _, status = self.make_request("GET", "/analytics/cashflow?granularity=year", token=self.user1_token, expect_status=400)
+        self.log_test("Cash Flow Validation", status == 400, f"Unknown granularity returns {status}")
+        
+        # Cleanup
+        self.make_request("DELETE", f"/revenues/{revenue['id']}", token=self.user1_token)
+        self.make_request("DELETE", f"/expenses/{expense['id']}", token=self.user1_token)
+
+    def test_cashflow_projection(self):
+        """Test that a pending debt lands in the balance projection"""
+        print("\n=== Testing Cash Flow Projection ===")
+        
+        if not self.user1_token:
+            self.log_test("Projection Test", False, "No authentication token")
+            return
+        
+        before, _ = self.make_request("GET", "/analytics/projection?meses=3", token=self.user1_token)
+        debt, _ = self.make_request("POST", "/debts", {
+            "valor": 12345.0,
+            "credor": "Cooperativa",
+            "vencimento": (datetime.now() + timedelta(days=10)).isoformat(),
+            "cultura": "Soja",
+            "status": "pendente",
+            "descricao": "Projection test"
+        }, token=self.user1_token)
+        after, _ = self.make_request("GET", "/analytics/projection?meses=3", token=self.user1_token)
+        if before is None or after is None or not debt:
+            self.log_test("Cash Flow Projection", False, "Failed to get projections")
+        else:
+            ok = (len(after["saldo"]) == len(before["saldo"])
+                  and abs(after["dividas"]["total"] - before["dividas"]["total"] - 12345.0) < 0.01
+                  and abs(before["saldo"][-1] - after["saldo"][-1] - 12345.0) < 0.01
+                  and after["saldo_minimo"]["valor"] <= after["saldo"][-1])
+            self.log_test("Cash Flow Projection", ok, "Debt lowers the projected balance" if ok else f"Unexpected projection: {after}")
+        
+        _, status = self.make_request("GET", "/analytics/projection?meses=60", token=self.user1_token, expect_status=422)
+        self.log_test("Projection Validation", status == 422, f"Too long a horizon returns {status}")
+        
+        # Cleanup
+        if debt:
+            self.make_request("DELETE", f"/debts/{debt['id']}", token=self.user1_token)
+
     def test_quotations_b3(self):
         """Test B3 quotations (mock data)"""
         print("\n=== Testing B3 Quotations ===")
@@ -556,9 +748,15 @@ class AgroTrackTester:
             field_id = self.test_fields_crud()
             if field_id:
                 self.test_harvests_crud(field_id)
+            self.test_fields_productivity_rollup()
+            
+            # Offline sync
+            self.test_delta_sync()
             
             # Dashboard and quotations
             self.test_dashboard_summary()
+            self.test_cashflow_series()
+            self.test_cashflow_projection()
             self.test_quotations_b3()
             
             # Authorization
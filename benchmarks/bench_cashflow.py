@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Cash flow series benchmark
+
+Seeds one user with several years of revenues and expenses (N rows each per
+year) and times two ways of producing the /api/analytics/cashflow series, per
+granularity, over the whole history (daily: the last year, as the endpoint
+caps the number of buckets):
+
+  client   - download (data, valor) for the range and bucket in Python, as
+             the app would have to without the endpoint
+  pipeline - the endpoint's $dateTrunc/$group pipelines plus zero-filling
+
+Also prints the winning plan of the revenues pipeline, which should be an
+index scan on user_data_id.
+
+Usage: python benchmarks/bench_cashflow.py [--years 5] [--per-year 20000]
+Runs against MONGO_URL using the BENCH_DB_NAME database (dropped afterwards).
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "agro_track_bench")
+
+import server  # noqa: E402
+
+CULTURAS = ["Soja", "Milho", "Trigo", "Algodão", "Café"]
+USER_ID = "bench-user"
+BATCH = 10_000
+RUNS = 5
+
+
+async def seed(start, end, per_year):
+    db = server.db
+    for name in ("revenues", "expenses"):
+        await db[name].drop()
+    await server.ensure_indexes()
+    span = (end - start).total_seconds()
+    years = span / (365 * 86400)
+    for name in ("revenues", "expenses"):
+        batch = []
+        for _ in range(int(per_year * years)):
+            batch.append({
+                "user_id": USER_ID,
+                "valor": round(random.uniform(10, 50_000), 2),
+                "cultura": random.choice(CULTURAS),
+                "tipo": "bench",
+                "data": start + timedelta(seconds=random.uniform(0, span)),
+                "created_at": datetime.utcnow(),
+            })
+            if len(batch) == BATCH:
+                await db[name].insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            await db[name].insert_many(batch, ordered=False)
+
+
+async def client_series(start, end, granularity):
+    db = server.db
+    buckets = server.cashflow_buckets(start, end, granularity)
+    totals = {}
+    for name, kind in (("revenues", "receitas"), ("expenses", "despesas")):
+        async for doc in db[name].find({"user_id": USER_ID, "data": {"$gte": start, "$lte": end}}, {"_id": 0, "data": 1, "valor": 1}):
+            bucket = server.cashflow_bucket_start(server.local_day(doc["data"]), granularity)
+            totals[kind, bucket] = totals.get((kind, bucket), 0.0) + doc["valor"]
+    saldo, series = 0.0, []
+    for day in buckets:
+        saldo += totals.get(("receitas", day), 0.0) - totals.get(("despesas", day), 0.0)
+        series.append(round(saldo, 2))
+    return series
+
+
+async def pipeline_series(start, end, granularity):
+    db = server.db
+    buckets = server.cashflow_buckets(start, end, granularity)
+    receitas, despesas = await asyncio.gather(
+        db.revenues.aggregate(server.cashflow_pipeline(USER_ID, start, end, granularity)).to_list(None),
+        db.expenses.aggregate(server.cashflow_pipeline(USER_ID, start, end, granularity)).to_list(None),
+    )
+    return server.cashflow_series(buckets, receitas, despesas)["saldo_acumulado"]
+
+
+async def timed(fn, *args):
+    samples = []
+    value = None
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        value = await fn(*args)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return value, statistics.median(samples)
+
+
+def winning_stage(plan):
+    # Innermost input stage of the winning plan, e.g. IXSCAN user_data_id
+    stage = plan.get("queryPlan", plan)
+    while "inputStage" in stage:
+        stage = stage["inputStage"]
+    return f"{stage['stage']} {stage.get('indexName', '')}".strip()
+
+
+async def main(years, per_year):
+    end = datetime(2025, 1, 1)
+    start = end - timedelta(days=round(365.25 * years))
+    await seed(start, end, per_year)
+    rows = await server.db.revenues.count_documents({}) + await server.db.expenses.count_documents({})
+
+    explain = await server.db.command(
+        "explain",
+        {"aggregate": "revenues", "pipeline": server.cashflow_pipeline(USER_ID, start, end, "month"), "cursor": {}},
+        verbosity="queryPlanner"
+    )
+    planner = explain.get("queryPlanner") or explain["stages"][0]["$cursor"]["queryPlanner"]
+    print(f"{rows} rows over {years} year(s); revenues plan: {winning_stage(planner['winningPlan'])}")
+
+    print(f"{'granularity':>11} {'buckets':>8} {'client ms':>10} {'pipeline ms':>12}  balances match")
+    for granularity in ("day", "week", "month"):
+        since = end - timedelta(days=365) if granularity == "day" else start
+        client, client_ms = await timed(client_series, since, end, granularity)
+        pipeline, pipeline_ms = await timed(pipeline_series, since, end, granularity)
+        match = len(client) == len(pipeline) and all(abs(a - b) < 0.05 for a, b in zip(client, pipeline))
+        print(f"{granularity:>11} {len(pipeline):>8} {client_ms:>10.1f} {pipeline_ms:>12.1f}  {match}")
+    await server.client.drop_database(os.environ["DB_NAME"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--per-year", type=int, default=20_000, help="revenues and expenses per year, each")
+    args = parser.parse_args()
+    asyncio.run(main(args.years, args.per_year))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Response compression benchmark
+
+Encodes expense list pages of 10 to 10k rows the way the API serves them and
+compresses each with every available encoder at a few levels, reporting
+compressed size, bytes saved and CPU time per response. brotli and zstd rows
+only appear when those packages are installed.
+
+Usage: python benchmarks/bench_compression.py [--rows 10,100,1000,10000]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from bson import ObjectId  # noqa: E402
+
+from compression import DEFAULT_LEVELS, ENCODERS  # noqa: E402
+from serialization import dumps  # noqa: E402
+
+LEVELS = {"gzip": [1, 4, 6, 9], "br": [1, 2, 4, 6], "zstd": [1, 3, 6, 12]}
+RUNS = 20
+
+
+def page(n):
+    start = datetime(2024, 1, 1)
+    user_id = str(ObjectId())
+    return dumps([
+        {
+            "id": str(ObjectId()),
+            "user_id": user_id,
+            "valor": round(100.0 + (i * 37) % 9973 / 7, 2),
+            "categoria": ("Insumos", "Maquinário", "Mão de obra", "Combustível")[i % 4],
+            "cultura": ("Soja", "Milho", "Trigo")[i % 3],
+            "tipo": "Custeio",
+            "data": start + timedelta(hours=i * 7),
+            "descricao": f"Nota fiscal {10000 + i}",
+            "created_at": start + timedelta(hours=i * 7, seconds=42),
+            "updated_at": start + timedelta(hours=i * 7, seconds=42),
+        }
+        for i in range(n)
+    ])
+
+
+def compress(encoding, level, body):
+    encoder = ENCODERS[encoding](level)
+    return encoder.compress(body) + encoder.finish()
+
+
+def timed(encoding, level, body):
+    samples = []
+    out = b""
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        out = compress(encoding, level, body)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return len(out), statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", default="10,100,1000,10000")
+    args = parser.parse_args()
+
+    print(f"encoders available: {', '.join(ENCODERS)} (defaults {DEFAULT_LEVELS})")
+    print(f"{'rows':>6} {'raw KiB':>8} {'encoding':>9} {'level':>5} {'out KiB':>8} {'saved':>6} {'ms':>8} {'MiB/s':>7}")
+    for rows in (int(r) for r in args.rows.split(",")):
+        body = page(rows)
+        for encoding in ENCODERS:
+            for level in LEVELS[encoding]:
+                size, ms = timed(encoding, level, body)
+                saved = 1 - size / len(body)
+                throughput = len(body) / 2**20 / (ms / 1000)
+                print(f"{rows:>6} {len(body) / 1024:>8.1f} {encoding:>9} {level:>5} {size / 1024:>8.1f} {saved:>6.1%} {ms:>8.2f} {throughput:>7.0f}")
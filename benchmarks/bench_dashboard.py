@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Dashboard summary benchmark
+
+Seeds one user with N revenues, N expenses and N/10 debts and times three ways
+of producing the /api/dashboard/summary totals:
+
+  legacy   - download every document and sum in Python (uncapped)
+  pipeline - recompute from scratch with the server-side aggregation
+  rollup   - read the incrementally maintained user_stats documents
+
+Usage: python benchmarks/bench_dashboard.py [sizes...]   (default: 1000 100000 1000000)
+Runs against MONGO_URL using the BENCH_DB_NAME database (dropped before each size).
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "agro_track_bench")
+
+import server  # noqa: E402
+
+CULTURAS = ["Soja", "Milho", "Trigo", "Algodão", "Café"]
+USER_ID = "bench-user"
+BATCH = 10_000
+RUNS = 5
+
+
+def make_docs(n, extra):
+    start = datetime(2018, 1, 1)
+    for i in range(n):
+        doc = {
+            "user_id": USER_ID,
+            "valor": round(random.uniform(10, 50_000), 2),
+            "cultura": random.choice(CULTURAS),
+            "tipo": "bench",
+            "data": start + timedelta(minutes=i),
+            "descricao": "benchmark row",
+            "created_at": datetime.utcnow(),
+        }
+        doc.update(extra(i))
+        yield doc
+
+
+async def seed(n):
+    db = server.db
+    for name in ("revenues", "expenses", "debts", "user_stats"):
+        await db[name].drop()
+    plans = [
+        ("revenues", n, lambda i: {}),
+        ("expenses", n, lambda i: {"categoria": "Insumos"}),
+        ("debts", max(n // 10, 1), lambda i: {
+            "credor": "Banco",
+            "status": "pendente" if i % 2 else "pago",
+            "vencimento": datetime(2025, 1, 1) + timedelta(days=i % 365),
+        }),
+    ]
+    for name, count, extra in plans:
+        batch = []
+        for doc in make_docs(count, extra):
+            batch.append(doc)
+            if len(batch) == BATCH:
+                await db[name].insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            await db[name].insert_many(batch, ordered=False)
+
+
+async def legacy_summary():
+    db = server.db
+    revenues = await db.revenues.find({"user_id": USER_ID}).to_list(None)
+    expenses = await db.expenses.find({"user_id": USER_ID}).to_list(None)
+    debts = await db.debts.find({"user_id": USER_ID, "status": "pendente"}).to_list(None)
+    receitas_por_cultura, despesas_por_cultura = {}, {}
+    for r in revenues:
+        receitas_por_cultura[r["cultura"]] = receitas_por_cultura.get(r["cultura"], 0) + r["valor"]
+    for e in expenses:
+        despesas_por_cultura[e["cultura"]] = despesas_por_cultura.get(e["cultura"], 0) + e["valor"]
+    return sum(r["valor"] for r in revenues), sum(e["valor"] for e in expenses), sum(d["valor"] for d in debts)
+
+
+async def pipeline_summary():
+    summary = server.build_dashboard_summary(await server.compute_user_stats(USER_ID), [])
+    return summary["total_receitas"], summary["total_despesas"], summary["total_dividas_pendentes"]
+
+
+async def rollup_summary():
+    summary = server.build_dashboard_summary(await server.load_user_stats(USER_ID), [])
+    return summary["total_receitas"], summary["total_despesas"], summary["total_dividas_pendentes"]
+
+
+async def timed(fn):
+    samples = []
+    value = None
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        value = await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return value, statistics.median(samples)
+
+
+async def main(sizes):
+    print(f"{'rows/user':>10} {'legacy ms':>12} {'pipeline ms':>12} {'rollup ms':>10}  totals match")
+    for n in sizes:
+        await seed(n)
+        await server.rebuild_user_stats(USER_ID)
+        legacy, legacy_ms = await timed(legacy_summary)
+        pipeline, pipeline_ms = await timed(pipeline_summary)
+        rollup, rollup_ms = await timed(rollup_summary)
+        match = all(
+            abs(a - b) < 1e-6 * max(1.0, abs(a))
+            for other in (pipeline, rollup) for a, b in zip(legacy, other)
+        )
+        print(f"{n:>10} {legacy_ms:>12.1f} {pipeline_ms:>12.1f} {rollup_ms:>10.2f}  {match}")
+    await server.client.drop_database(os.environ["DB_NAME"])
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 100_000, 1_000_000]
+    asyncio.run(main(sizes))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Streaming export benchmark
+
+Seeds N synthetic expenses for one user and drains the /api/export stream
+generator in both formats, reporting throughput and peak RSS. For contrast,
+--buffered also loads the same rows with to_list() the way the list
+endpoints do, which is what an uncapped non-streaming export would cost.
+
+Usage: python benchmarks/bench_export.py [--rows 1000000] [--buffered]
+Runs against MONGO_URL using the BENCH_DB_NAME database (dropped at the end).
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "agro_track_bench")
+
+import server  # noqa: E402
+
+USER_ID = "bench-user"
+BATCH = 10_000
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(rows):
+    await server.db.expenses.drop()
+    start = datetime(2015, 1, 1)
+    for offset in range(0, rows, BATCH):
+        await server.db.expenses.insert_many([
+            {
+                "user_id": USER_ID,
+                "valor": 100.0 + i % 1000,
+                "categoria": "Insumos",
+                "cultura": "Soja",
+                "tipo": "Custeio",
+                "data": start + timedelta(minutes=i),
+                "descricao": f"linha {i}",
+                "created_at": datetime.utcnow(),
+            }
+            for i in range(offset, min(offset + BATCH, rows))
+        ], ordered=False)
+
+
+async def drain(fmt):
+    total_bytes = 0
+    t0 = time.perf_counter()
+    async for chunk in server.export_rows("expenses", USER_ID, fmt):
+        total_bytes += len(chunk.encode("utf-8"))
+    return total_bytes, time.perf_counter() - t0
+
+
+async def buffered():
+    t0 = time.perf_counter()
+    docs = await server.db.expenses.find({"user_id": USER_ID}).to_list(None)
+    return len(docs), time.perf_counter() - t0
+
+
+async def main(rows, compare_buffered):
+    await seed(rows)
+    print(f"seeded {rows} rows, peak RSS after seeding: {peak_rss_mb():.1f} MiB")
+
+    print(f"{'mode':<10} {'MiB out':>9} {'seconds':>9} {'rows/s':>11} {'peak RSS MiB':>13}")
+    for fmt in ("ndjson", "csv"):
+        total_bytes, seconds = await drain(fmt)
+        print(f"{fmt:<10} {total_bytes / 2**20:>9.1f} {seconds:>9.2f} {rows / seconds:>11.0f} {peak_rss_mb():>13.1f}")
+
+    if compare_buffered:
+        count, seconds = await buffered()
+        print(f"{'to_list':<10} {'-':>9} {seconds:>9.2f} {count / seconds:>11.0f} {peak_rss_mb():>13.1f}")
+
+    await server.client.drop_database(os.environ["DB_NAME"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--buffered", action="store_true", help="also measure a buffered to_list() load (run last)")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.buffered))
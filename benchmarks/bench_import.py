@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Bulk import benchmark
+
+Builds N synthetic expense rows (JSON and CSV) plus N harvest rows spread over
+200 fields, and times the /api/import pipeline: parsing, model validation,
+field resolution and unordered insert_many batches.
+
+Usage: python benchmarks/bench_import.py [--rows 100000]
+Runs against MONGO_URL using the BENCH_DB_NAME database (dropped at the end).
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "agro_track_bench")
+
+import server  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def expense_rows(n):
+    start = datetime(2015, 1, 1)
+    return [
+        {
+            "valor": 100.0 + i % 997,
+            "categoria": "Insumos",
+            "cultura": ("Soja", "Milho", "Trigo")[i % 3],
+            "tipo": "Custeio",
+            "data": (start + timedelta(hours=i)).isoformat(),
+            "descricao": f"linha {i}",
+        }
+        for i in range(n)
+    ]
+
+
+def to_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+async def timed(label, rows, coro):
+    t0 = time.perf_counter()
+    result = await coro
+    seconds = time.perf_counter() - t0
+    print(f"{label:<16} {rows:>9} {result['inserted']:>9} {len(result['errors']):>7} {seconds:>8.2f} {rows / seconds:>10.0f}")
+
+
+async def main(n):
+    for name in ("expenses", "harvests", "fields", "user_stats"):
+        await server.db[name].drop()
+
+    fields = [{"user_id": USER_ID, "nome": f"Talhão {i}", "area_ha": 10.0 + i, "cultura": "Soja"} for i in range(200)]
+    await server.db.fields.insert_many(fields)
+    field_ids = [str(f["_id"]) for f in fields]
+
+    rows = expense_rows(n)
+    csv_text = to_csv(rows)
+    harvests = [
+        {
+            "field_id": field_ids[i % len(field_ids)],
+            "cultura": "Soja",
+            "quantidade_sacas": 50.0 + i % 300,
+            "data_colheita": (datetime(2015, 1, 1) + timedelta(days=i % 3650)).isoformat(),
+        }
+        for i in range(n)
+    ]
+
+    print(f"{'input':<16} {'rows':>9} {'inserted':>9} {'errors':>7} {'seconds':>8} {'rows/s':>10}")
+    await timed("expenses json", n, server.import_records("expenses", USER_ID, rows))
+
+    async def from_csv():
+        return await server.import_records("expenses", USER_ID, server.parse_csv(csv_text))
+    await timed("expenses csv", n, from_csv())
+
+    await timed("harvests json", n, server.import_records("harvests", USER_ID, harvests))
+
+    await server.client.drop_database(os.environ["DB_NAME"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
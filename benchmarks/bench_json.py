@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+List response encoding benchmark
+
+Encodes a page of N expense documents shaped like what Mongo returns (ObjectId
+ids, datetime fields) the way the list endpoints did before - jsonable_encoder
+followed by the stdlib encoder in JSONResponse - and through FastJSONResponse
+with orjson and with the stdlib fallback.
+
+Usage: python benchmarks/bench_json.py [--rows 1000]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+import serialization  # noqa: E402
+
+RUNS = 50
+
+
+def documents(n):
+    start = datetime(2024, 1, 1)
+    user_id = str(ObjectId())
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "valor": 100.0 + i % 997,
+            "categoria": "Insumos",
+            "cultura": ("Soja", "Milho", "Trigo")[i % 3],
+            "tipo": "Custeio",
+            "data": start + timedelta(hours=i),
+            "descricao": f"Compra de adubo, nota {i}",
+            "created_at": start + timedelta(hours=i, seconds=7),
+        }
+        for i in range(n)
+    ]
+
+
+def to_items(docs):
+    # What list_documents hands to the response
+    return [{"id": str(d["_id"]), **{k: v for k, v in d.items() if k != "_id"}} for d in docs]
+
+
+def before(docs):
+    return JSONResponse(jsonable_encoder(to_items(docs))).body
+
+
+def fast_orjson(docs):
+    return serialization.FastJSONResponse(to_items(docs)).body
+
+
+def fast_stdlib(docs):
+    return serialization._dumps_stdlib(to_items(docs))
+
+
+def timed(fn, docs):
+    samples = []
+    body = b""
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        body = fn(docs)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return body, statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    docs = documents(args.rows)
+    engines = [("jsonable_encoder+json", before), ("stdlib fallback", fast_stdlib)]
+    if serialization.orjson is not None:
+        engines.append(("orjson", fast_orjson))
+    else:
+        print("orjson not installed; FastJSONResponse uses the stdlib fallback")
+
+    print(f"{'encoder':<22} {'rows':>6} {'median ms':>10} {'KiB':>7}")
+    for label, fn in engines:
+        body, ms = timed(fn, docs)
+        print(f"{label:<22} {args.rows:>6} {ms:>10.2f} {len(body) / 1024:>7.1f}")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Login load benchmark
+
+Measures GET /api/expenses latency while a pool of clients hammers
+POST /api/auth/login. With bcrypt running on the event loop every login
+blocks the worker for the whole hash, so cheap GETs queue behind it; with
+the hashing offloaded the GET tail should stay close to the idle baseline.
+
+Run it against the server before and after the change:
+
+    uvicorn server:app --port 8001          # from backend/
+    python benchmarks/bench_login_load.py --base-url http://localhost:8001/api
+"""
+
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def setup_user(base_url):
+    email = f"bench_{uuid.uuid4().hex[:8]}@test.com"
+    password = "bench-password"
+    response = requests.post(f"{base_url}/auth/register", json={
+        "name": "Bench User",
+        "email": email,
+        "password": password
+    })
+    response.raise_for_status()
+    token = response.json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(50):
+        requests.post(f"{base_url}/expenses", headers=headers, json={
+            "valor": 100.0 + i,
+            "categoria": "Insumos",
+            "cultura": "Soja",
+            "tipo": "Custeio",
+            "data": datetime.now().isoformat()
+        }).raise_for_status()
+    return email, password, headers
+
+
+def measure_gets(base_url, headers, duration):
+    samples = []
+    deadline = time.perf_counter() + duration
+    with requests.Session() as session:
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            session.get(f"{base_url}/expenses", headers=headers).raise_for_status()
+            samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def login_loop(base_url, email, password, stop, counter):
+    with requests.Session() as session:
+        while not stop.is_set():
+            session.post(f"{base_url}/auth/login", json={"email": email, "password": password})
+            counter.append(1)
+
+
+def run(base_url, logins, duration):
+    email, password, headers = setup_user(base_url)
+
+    baseline = measure_gets(base_url, headers, duration)
+
+    stop = threading.Event()
+    counter = []
+    with ThreadPoolExecutor(max_workers=logins) as pool:
+        for _ in range(logins):
+            pool.submit(login_loop, base_url, email, password, stop, counter)
+        loaded = measure_gets(base_url, headers, duration)
+        stop.set()
+
+    print(f"{'scenario':<28} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, samples in (("idle", baseline), (f"{logins} concurrent logins", loaded)):
+        print(f"{name:<28} {len(samples):>9} {statistics.median(samples):>9.1f} {percentile(samples, 99):>9.1f}")
+    print(f"logins completed under load: {len(counter)} ({len(counter) / duration:.1f}/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8001/api")
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    args = parser.parse_args()
+    run(args.base_url, args.logins, args.duration)
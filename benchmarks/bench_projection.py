@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Cash flow projection benchmark
+
+Builds synthetic users (revenues and expenses spread over --years of history,
+with a monthly payroll and a yearly harvest sale to find, plus pending debts)
+and times projection.project:
+
+  single - one user with the full history, per --months horizon
+  batch  - --users such users, serially and over a process pool of --workers,
+           the way `manage.py projections precompute` runs them
+
+No database is needed: payloads are built in memory, as the server would
+after loading them.
+
+Usage: python benchmarks/bench_projection.py [--years 5] [--per-year 2000] [--users 2000] [--workers 4]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from projection import build_payload, project  # noqa: E402
+
+CULTURAS = ["Soja", "Milho", "Trigo", "Algodão", "Café"]
+CATEGORIAS = ["Sementes", "Fertilizantes", "Defensivos", "Diesel", "Manutenção"]
+TODAY = date(2025, 1, 15)
+RUNS = 20
+
+
+def synthetic_payload(user_id, years, per_year, months, rng):
+    start = datetime.combine(TODAY, datetime.min.time()) - timedelta(days=round(365.25 * years))
+    span = (datetime.combine(TODAY, datetime.min.time()) - start).total_seconds()
+
+    def when():
+        return start + timedelta(seconds=rng.uniform(0, span))
+
+    receitas = [{"data": when(), "valor": rng.uniform(10, 50_000), "cultura": rng.choice(CULTURAS)} for _ in range(per_year * years)]
+    despesas = [{"data": when(), "valor": rng.uniform(10, 20_000), "categoria": rng.choice(CATEGORIAS)} for _ in range(per_year * years)]
+    for year in range(TODAY.year - years, TODAY.year):
+        receitas.append({"data": datetime(year, 3, 20, 15), "valor": 400_000.0, "cultura": "Soja"})
+        for month in range(1, 13):
+            despesas.append({"data": datetime(year, month, 5, 15), "valor": 25_000.0, "categoria": "Mão de obra"})
+    dividas = [{"vencimento": datetime.combine(TODAY + timedelta(days=rng.randint(-30, 720)), datetime.min.time()), "valor": rng.uniform(1_000, 100_000)} for _ in range(40)]
+    return build_payload(user_id, receitas, despesas, dividas, rng.uniform(-50_000, 500_000), TODAY, months, "America/Sao_Paulo")
+
+
+def timed(fn, *args):
+    samples = []
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main(years, per_year, users, workers):
+    rng = random.Random(42)
+    print(f"single user, {years} year(s) x {2 * per_year} flows/year")
+    print(f"{'months':>7} {'days':>6} {'patterns':>9} {'ms':>8}")
+    for months in (3, 6, 12, 24):
+        payload = synthetic_payload("bench", years, per_year, months, rng)
+        result = project(payload)
+        print(f"{months:>7} {len(result['saldo']):>6} {len(result['recorrencias']):>9} {timed(project, payload):>8.2f}")
+
+    payloads = [synthetic_payload(f"user-{i}", years, per_year // 10, 6, rng) for i in range(users)]
+    t0 = time.perf_counter()
+    serial = [project(p) for p in payloads]
+    serial_s = time.perf_counter() - t0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Warm the workers up so process start-up is not counted
+        list(pool.map(project, payloads[:workers]))
+        t0 = time.perf_counter()
+        pooled = list(pool.map(project, payloads, chunksize=16))
+        pooled_s = time.perf_counter() - t0
+    match = all(a["saldo"] == b["saldo"] for a, b in zip(serial, pooled))
+    print(f"\nbatch of {users} user(s), {years} year(s) x {2 * per_year // 10} flows/year each")
+    print(f"  serial         {serial_s:8.2f}s  {users / serial_s:8.0f} users/s")
+    print(f"  pool ({workers} procs) {pooled_s:8.2f}s  {users / pooled_s:8.0f} users/s  results match: {match}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--per-year", type=int, default=2_000, help="revenues and expenses per year, each")
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    main(args.years, args.per_year, args.users, args.workers)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Request timing overhead benchmark
+
+Measures what the timing instrumentation (backend/timing.py) costs:
+
+  span     - one `with span(...)` block outside a timed request (how every
+             span runs with SERVER_TIMING unset) and inside one
+  request  - requests/s of a small ASGI app whose handler enters --spans
+             spans, called directly without and with TimingMiddleware (log
+             line disabled, since its cost depends on the log handler)
+
+Usage: python benchmarks/bench_timing.py [--spans 8] [--requests 20000]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from timing import RequestTimings, TimingMiddleware, _current, span  # noqa: E402
+
+SPAN_LOOPS = 1_000_000
+RUNS = 5
+
+
+def span_ns(timed):
+    token = _current.set(RequestTimings() if timed else None)
+    try:
+        samples = []
+        for _ in range(RUNS):
+            t0 = time.perf_counter()
+            for _ in range(SPAN_LOOPS):
+                with span("db"):
+                    pass
+            samples.append((time.perf_counter() - t0) / SPAN_LOOPS * 1e9)
+        return statistics.median(samples)
+    finally:
+        _current.reset(token)
+
+
+def make_app(spans):
+    async def app(scope, receive, send):
+        for _ in range(spans):
+            with span("db"):
+                pass
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b"[]"})
+    return app
+
+
+async def requests_per_second(app, count):
+    scope = {"type": "http", "method": "GET", "path": "/api/fields", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    t0 = time.perf_counter()
+    for _ in range(count):
+        await app(scope, receive, send)
+    return count / (time.perf_counter() - t0)
+
+
+def main(spans, count):
+    print(f"{'span':>10} {'ns':>8}")
+    print(f"{'disabled':>10} {span_ns(False):>8.0f}")
+    print(f"{'enabled':>10} {span_ns(True):>8.0f}")
+
+    app = make_app(spans)
+    plain = asyncio.run(requests_per_second(app, count))
+    timed = asyncio.run(requests_per_second(TimingMiddleware(app, log_min_ms=None), count))
+    print(f"\n{spans} span(s) per request")
+    print(f"  without middleware {plain:10.0f} req/s")
+    print(f"  with middleware    {timed:10.0f} req/s  ({(1 / timed - 1 / plain) * 1e6:.1f} us per request)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--spans", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+    main(args.spans, args.requests)
@@ -9,7 +9,7 @@ import {
 } from 'react-native';
 import { Ionicons } from '@expo/vector-icons';
 import api from '../utils/api';
-import { Debt } from '../types';
+import { Debt, DebtAlerts } from '../types';
 import { format, differenceInDays } from 'date-fns';
 import { ptBR } from 'date-fns/locale';
 
@@ -24,21 +24,10 @@ export default function Alertas() {
 
   async function loadAlerts() {
     try {
-      const response = await api.get('/api/debts');
-      const debts = response.data;
-      
-      // Filtrar dívidas pendentes que vencem em até 30 dias
-      const today = new Date();
-      const alerts = debts.filter((debt: Debt) => {
-        if (debt.status !== 'pendente') return false;
-        const vencimento = new Date(debt.vencimento);
-        const daysUntil = differenceInDays(vencimento, today);
-        return daysUntil <= 30 && daysUntil >= 0;
-      }).sort((a: Debt, b: Debt) => 
-        new Date(a.vencimento).getTime() - new Date(b.vencimento).getTime()
-      );
-      
-      setDebtAlerts(alerts);
+      // Dívidas pendentes que vencem em até 30 dias, já agrupadas e ordenadas pelo servidor
+      const response = await api.get<DebtAlerts>('/api/alerts/debts');
+      const { urgentes, atencao, proximas } = response.data;
+      setDebtAlerts([...urgentes.dividas, ...atencao.dividas, ...proximas.dividas]);
     } catch (error) {
       console.log('Error loading alerts:', error);
     } finally {
@@ -10,31 +10,46 @@ import {
   TouchableOpacity,
 } from 'react-native';
 import { Ionicons } from '@expo/vector-icons';
-import axios from 'axios';
+import { format } from 'date-fns';
+import { ptBR } from 'date-fns/locale';
+import api from '../utils/api';
+import { WeatherReport } from '../types';
 
-// Dados mock para demonstração (sem API key)
-const mockWeatherData = {
-  location: 'São Paulo, BR',
-  temperature: 25,
-  condition: 'Parcialmente nublado',
-  humidity: 65,
-  windSpeed: 12,
-  forecast: [
-    { day: 'Segunda', temp: 26, condition: 'sunny', rain: 10 },
-    { day: 'Terça', temp: 24, condition: 'cloudy', rain: 40 },
-    { day: 'Quarta', temp: 23, condition: 'rainy', rain: 80 },
-    { day: 'Quinta', temp: 25, condition: 'partly-sunny', rain: 20 },
-    { day: 'Sexta', temp: 27, condition: 'sunny', rain: 5 },
-  ],
+const CONDITION_LABELS: Record<string, string> = {
+  sunny: 'Ensolarado',
+  'partly-sunny': 'Parcialmente nublado',
+  cloudy: 'Nublado',
+  rainy: 'Chuvoso',
 };
 
 export default function Clima() {
-  const [weather, setWeather] = useState(mockWeatherData);
-  const [loading, setLoading] = useState(false);
+  const [weather, setWeather] = useState<WeatherReport | null>(null);
+  const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
+  const [error, setError] = useState<string | null>(null);
   const [city, setCity] = useState('São Paulo');
   const [searchCity, setSearchCity] = useState('São Paulo');
 
+  useEffect(() => {
+    loadWeather(city);
+  }, []);
+
+  async function loadWeather(cidade: string) {
+    try {
+      // O servidor agrupa fazendas vizinhas e guarda a previsão em cache
+      const response = await api.get<WeatherReport>('/api/weather', { params: { cidade } });
+      setWeather(response.data);
+      setCity(cidade);
+      setError(null);
+    } catch (err: any) {
+      console.log('Error loading weather:', err);
+      setError(err?.response?.status === 404 ? 'Cidade não encontrada' : 'Previsão indisponível no momento');
+    } finally {
+      setLoading(false);
+      setRefreshing(false);
+    }
+  }
+
   function getWeatherIcon(condition: string) {
     const icons: Record<string, string> = {
       sunny: 'sunny',
@@ -47,33 +62,15 @@ export default function Clima() {
 
   function onRefresh() {
     setRefreshing(true);
-    setTimeout(() => {
-      // Simular atualização
-      setRefreshing(false);
-    }, 1000);
+    loadWeather(city);
   }
 
   function handleSearch() {
     if (!searchCity.trim()) {
       return;
     }
-    
-    // Simular busca com dados mock personalizados
-    const newWeather = {
-      location: `${searchCity}, BR`,
-      temperature: Math.floor(Math.random() * 15) + 20, // 20-35°C
-      condition: ['Ensolarado', 'Parcialmente nublado', 'Nublado', 'Chuvoso'][Math.floor(Math.random() * 4)],
-      humidity: Math.floor(Math.random() * 30) + 50, // 50-80%
-      windSpeed: Math.floor(Math.random() * 20) + 5, // 5-25 km/h
-      forecast: mockWeatherData.forecast.map(day => ({
-        ...day,
-        temp: Math.floor(Math.random() * 10) + 20,
-        rain: Math.floor(Math.random() * 100),
-      })),
-    };
-    
-    setWeather(newWeather);
-    setCity(searchCity);
+    setLoading(true);
+    loadWeather(searchCity.trim());
   }
 
   return (
@@ -107,58 +104,66 @@ export default function Clima() {
         </TouchableOpacity>
       </View>
 
-      <View style={styles.currentWeather}>
-        <View style={styles.locationRow}>
-          <Ionicons name="location" size={20} color="#10b981" />
-          <Text style={styles.location}>{weather.location}</Text>
-        </View>
-        
-        <View style={styles.tempContainer}>
-          <Text style={styles.temperature}>{weather.temperature}°</Text>
-          <Ionicons name="partly-sunny" size={80} color="#f59e0b" />
-        </View>
-        
-        <Text style={styles.condition}>{weather.condition}</Text>
+      {loading && !weather && <ActivityIndicator size="large" color="#10b981" style={styles.loader} />}
 
-        <View style={styles.detailsRow}>
-          <View style={styles.detailItem}>
-            <Ionicons name="water" size={20} color="#3b82f6" />
-            <Text style={styles.detailText}>{weather.humidity}%</Text>
-            <Text style={styles.detailLabel}>Umidade</Text>
-          </View>
-          
-          <View style={styles.detailItem}>
-            <Ionicons name="speedometer" size={20} color="#10b981" />
-            <Text style={styles.detailText}>{weather.windSpeed} km/h</Text>
-            <Text style={styles.detailLabel}>Vento</Text>
-          </View>
+      {error && (
+        <View style={styles.infoCard}>
+          <Ionicons name="information-circle" size={24} color="#3b82f6" />
+          <Text style={styles.infoText}>{error}</Text>
         </View>
-      </View>
+      )}
 
-      <View style={styles.forecastContainer}>
-        <Text style={styles.forecastTitle}>Próximos 5 dias</Text>
-        
-        {weather.forecast.map((day, index) => (
-          <View key={index} style={styles.forecastDay}>
-            <Text style={styles.forecastDayName}>{day.day}</Text>
-            <View style={styles.forecastDetails}>
-              <Ionicons name={getWeatherIcon(day.condition)} size={24} color="#f59e0b" />
-              <Text style={styles.forecastTemp}>{day.temp}°</Text>
-              <View style={styles.rainBadge}>
-                <Ionicons name="rainy" size={14} color="#3b82f6" />
-                <Text style={styles.rainText}>{day.rain}%</Text>
+      {weather && (
+        <>
+          <View style={styles.currentWeather}>
+            <View style={styles.locationRow}>
+              <Ionicons name="location" size={20} color="#10b981" />
+              <Text style={styles.location}>{weather.local || city}</Text>
+            </View>
+
+            <View style={styles.tempContainer}>
+              <Text style={styles.temperature}>{Math.round(weather.atual.temperatura)}°</Text>
+              <Ionicons name={getWeatherIcon(weather.atual.condicao)} size={80} color="#f59e0b" />
+            </View>
+
+            <Text style={styles.condition}>{CONDITION_LABELS[weather.atual.condicao] || weather.atual.condicao}</Text>
+
+            <View style={styles.detailsRow}>
+              <View style={styles.detailItem}>
+                <Ionicons name="water" size={20} color="#3b82f6" />
+                <Text style={styles.detailText}>{Math.round(weather.atual.umidade)}%</Text>
+                <Text style={styles.detailLabel}>Umidade</Text>
+              </View>
+
+              <View style={styles.detailItem}>
+                <Ionicons name="speedometer" size={20} color="#10b981" />
+                <Text style={styles.detailText}>{Math.round(weather.atual.vento_kmh)} km/h</Text>
+                <Text style={styles.detailLabel}>Vento</Text>
               </View>
             </View>
           </View>
-        ))}
-      </View>
 
-      <View style={styles.infoCard}>
-        <Ionicons name="information-circle" size={24} color="#3b82f6" />
-        <Text style={styles.infoText}>
-          Dados de previsão do tempo em demonstração. Para dados reais, configure uma chave da API AccuWeather.
-        </Text>
-      </View>
+          <View style={styles.forecastContainer}>
+            <Text style={styles.forecastTitle}>Próximos {weather.previsao.length} dias</Text>
+
+            {weather.previsao.map((day) => (
+              <View key={day.data} style={styles.forecastDay}>
+                <Text style={styles.forecastDayName}>
+                  {format(new Date(`${day.data}T12:00:00`), 'EEEE', { locale: ptBR })}
+                </Text>
+                <View style={styles.forecastDetails}>
+                  <Ionicons name={getWeatherIcon(day.condicao)} size={24} color="#f59e0b" />
+                  <Text style={styles.forecastTemp}>{Math.round(day.temp_max)}°</Text>
+                  <View style={styles.rainBadge}>
+                    <Ionicons name="rainy" size={14} color="#3b82f6" />
+                    <Text style={styles.rainText}>{Math.round(day.chuva_prob)}%</Text>
+                  </View>
+                </View>
+              </View>
+            ))}
+          </View>
+        </>
+      )}
     </ScrollView>
   );
 }
@@ -168,6 +173,9 @@ const styles = StyleSheet.create({
     flex: 1,
     backgroundColor: '#0f172a',
   },
+  loader: {
+    marginTop: 48,
+  },
   header: {
     flexDirection: 'row',
     alignItems: 'center',
@@ -303,6 +311,7 @@ const styles = StyleSheet.create({
     color: '#fff',
     fontWeight: '600',
     flex: 1,
+    textTransform: 'capitalize',
   },
   forecastDetails: {
     flexDirection: 'row',
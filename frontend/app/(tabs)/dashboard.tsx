@@ -9,15 +9,18 @@ import {
   ActivityIndicator,
 } from 'react-native';
 import { LineChart, PieChart } from 'react-native-chart-kit';
-import api from '../utils/api';
-import { DashboardSummary, Field } from '../types';
+import api, { batchGet } from '../utils/api';
+import { CashflowSeries, DashboardSummary, Field } from '../types';
 import { Ionicons } from '@expo/vector-icons';
+import { format, parseISO } from 'date-fns';
+import { ptBR } from 'date-fns/locale';
 
 const screenWidth = Dimensions.get('window').width;
 
 export default function Dashboard() {
   const [summary, setSummary] = useState<DashboardSummary | null>(null);
   const [fields, setFields] = useState<Field[]>([]);
+  const [cashflow, setCashflow] = useState<CashflowSeries | null>(null);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
 
@@ -25,14 +28,25 @@ export default function Dashboard() {
     loadData();
   }, []);
 
+  async function loadCashflow() {
+    // Fetched on its own so a failing series only empties the chart
+    try {
+      const response = await api.get<CashflowSeries>('/api/analytics/cashflow', { params: { granularity: 'month' } });
+      setCashflow(response.data);
+    } catch (error) {
+      console.log('Error loading cash flow:', error);
+      setCashflow(null);
+    }
+  }
+
   async function loadData() {
     try {
-      const [summaryRes, fieldsRes] = await Promise.all([
-        api.get('/api/dashboard/summary'),
-        api.get('/api/fields')
+      const [[summaryData, fieldsData]] = await Promise.all([
+        batchGet<[DashboardSummary, Field[]]>(['/api/dashboard/summary', '/api/fields']),
+        loadCashflow(),
       ]);
-      setSummary(summaryRes.data);
-      setFields(fieldsRes.data);
+      setSummary(summaryData);
+      setFields(fieldsData);
     } catch (error) {
       console.log('Error loading dashboard:', error);
     } finally {
@@ -64,11 +78,14 @@ export default function Dashboard() {
     );
   }
 
+  // Saldo acumulado mês a mês nos últimos 12 meses
   const chartData = {
-    labels: ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun'],
+    labels: (cashflow?.buckets || []).map((bucket, index) =>
+      index % 2 === 0 ? format(parseISO(bucket), 'MMM', { locale: ptBR }) : ''
+    ),
     datasets: [
       {
-        data: [20, 45, 28, 80, 99, 43],
+        data: cashflow?.saldo_acumulado.length ? cashflow.saldo_acumulado : [0],
         color: (opacity = 1) => `rgba(16, 185, 129, ${opacity})`,
         strokeWidth: 2,
       },
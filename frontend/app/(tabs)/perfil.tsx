@@ -6,6 +6,11 @@ import { Ionicons } from '@expo/vector-icons';
 import { format } from 'date-fns';
 import { ptBR } from 'date-fns/locale';
 
+const PLAN_LABELS: Record<string, string> = {
+  trial: 'Trial (14 dias)',
+  expired: 'Trial expirado',
+};
+
 export default function Perfil() {
   const { user, signOut } = useAuth();
   const router = useRouter();
@@ -69,7 +74,7 @@ export default function Perfil() {
             <View style={styles.infoContent}>
               <Text style={styles.infoLabel}>Plano</Text>
               <Text style={styles.infoValue}>
-                {user?.plan === 'trial' ? 'Trial (14 dias)' : user?.plan}
+                {(user?.plan && PLAN_LABELS[user.plan]) || user?.plan}
               </Text>
             </View>
           </View>
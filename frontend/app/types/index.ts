@@ -42,6 +42,21 @@ export interface Debt {
   created_at: string;
 }
 
+export interface DebtAlertBucket {
+  total: number;
+  count: number;
+  dividas: (Debt & { dias: number })[];
+}
+
+export interface DebtAlerts {
+  dia: string;
+  atualizado_em: string;
+  vencidas: DebtAlertBucket;
+  urgentes: DebtAlertBucket;
+  atencao: DebtAlertBucket;
+  proximas: DebtAlertBucket;
+}
+
 export interface Field {
   id: string;
   user_id: string;
@@ -85,4 +100,40 @@ export interface Quotation {
   variacao: number;
   unidade: string;
   data: string;
-}
\ No newline at end of file
+}
+export type WeatherCondition = 'sunny' | 'partly-sunny' | 'cloudy' | 'rainy';
+
+export interface WeatherDay {
+  data: string;
+  temp_max: number;
+  temp_min: number;
+  condicao: WeatherCondition;
+  chuva_prob: number;
+}
+
+export interface WeatherReport {
+  local: string | null;
+  latitude: number;
+  longitude: number;
+  tile: string;
+  atual: {
+    temperatura: number;
+    condicao: WeatherCondition;
+    umidade: number;
+    vento_kmh: number;
+    atualizado_em: string;
+  };
+  previsao: WeatherDay[];
+  previsao_atualizada_em: string;
+}
+
+export interface CashflowSeries {
+  granularity: 'day' | 'week' | 'month';
+  from: string;
+  to: string;
+  cultura: string | null;
+  buckets: string[];
+  receitas: number[];
+  despesas: number[];
+  saldo_acumulado: number[];
+}
@@ -24,4 +24,18 @@ api.interceptors.request.use(
   }
 );
 
+// Several GETs in one round trip through /api/batch. Resolves to the bodies
+// in request order; rejects if any operation did not succeed.
+export async function batchGet<T extends unknown[]>(paths: string[]): Promise<T> {
+  const response = await api.post('/api/batch', {
+    operations: paths.map((path) => ({ path })),
+  });
+  return response.data.responses.map((r: { path: string; status: number; body: unknown }) => {
+    if (r.status >= 400) {
+      throw new Error(`${r.path} failed with status ${r.status}`);
+    }
+    return r.body;
+  }) as T;
+}
+
 export default api;
\ No newline at end of file
@@ -0,0 +1,19 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """An in-memory database with the declared indexes, patched in as server.db."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import server
+
+    mock_db = mongomock_motor.AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(server, "db", mock_db)
+    asyncio.run(server.ensure_indexes())
+    return mock_db
@@ -0,0 +1,75 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import server
+from server import bucket_debt_alerts, debt_alerts_current, local_midnight_utc
+
+pytestmark = pytest.mark.skipif(server.ALERTS_TIMEZONE.key != "America/Sao_Paulo", reason="expects the default ALERTS_TIMEZONE")
+
+TODAY = date(2024, 3, 10)
+
+
+def debt(vencimento, valor=100.0, **extra):
+    return {"_id": ObjectId(), "descricao": "Parcela", "valor": valor, "status": "pendente", "vencimento": vencimento, **extra}
+
+
+def due_in(days, **extra):
+    # Stored the way the API stores them: the UTC instant of a local midnight
+    return debt(local_midnight_utc(TODAY + timedelta(days=days)), **extra)
+
+
+def summary(buckets):
+    return {name: [d["dias"] for d in bucket["dividas"]] for name, bucket in buckets.items()}
+
+
+def test_buckets_by_days_until_due():
+    debts = [due_in(days) for days in (-3, -1, 0, 5, 6, 15, 16, 30)]
+    assert summary(bucket_debt_alerts(debts, TODAY)) == {
+        "vencidas": [-3, -1],
+        "urgentes": [0, 5],
+        "atencao": [6, 15],
+        "proximas": [16, 30],
+    }
+
+
+def test_days_are_counted_on_the_local_calendar():
+    debts = [
+        debt(datetime(2024, 3, 10, 2, 59)),  # 23:59 on the 9th in São Paulo
+        debt(datetime(2024, 3, 10, 3, 0)),  # local midnight of the 10th
+        debt(datetime(2024, 3, 11, 2, 0)),  # still the 10th locally
+    ]
+    assert summary(bucket_debt_alerts(debts, TODAY)) == {"vencidas": [-1], "urgentes": [0, 0], "atencao": [], "proximas": []}
+
+
+def test_totals_and_entries():
+    debts = [due_in(-1, valor=250.5), due_in(2, valor=100.0), due_in(4, valor=49.5, cultura="Soja")]
+    buckets = bucket_debt_alerts(debts, TODAY)
+
+    assert (buckets["vencidas"]["total"], buckets["vencidas"]["count"]) == (250.5, 1)
+    assert (buckets["urgentes"]["total"], buckets["urgentes"]["count"]) == (149.5, 2)
+    assert buckets["atencao"] == {"total": 0, "count": 0, "dividas": []}
+    entry = buckets["urgentes"]["dividas"][1]
+    assert entry["id"] == str(debts[2]["_id"]) and "_id" not in entry
+    assert (entry["cultura"], entry["dias"], entry["valor"]) == ("Soja", 4, 49.5)
+
+
+def test_stored_alerts_are_reused_only_for_their_day_and_debts_version():
+    stored = {"_id": "u1", "day": TODAY.isoformat(), "debts_version": 7, "buckets": {}}
+    assert debt_alerts_current(stored, TODAY, 7)
+    assert not debt_alerts_current(None, TODAY, 0)
+    assert not debt_alerts_current(stored, TODAY + timedelta(days=1), 7)
+    assert not debt_alerts_current(stored, TODAY, 8)
+
+
+def test_compute_reads_pending_debts_inside_the_window(db):
+    debts = [due_in(d, user_id="u1") for d in (30, -2, 31, 1)]
+    debts.append(due_in(1, user_id="u1", status="pago"))
+    debts.append(due_in(1, user_id="u2"))
+    asyncio.run(db.debts.insert_many(debts))
+
+    buckets = asyncio.run(server.compute_debt_alerts("u1", TODAY))
+    assert summary(buckets) == {"vencidas": [-2], "urgentes": [1], "atencao": [], "proximas": [30]}
+    assert all("user_id" not in d for bucket in buckets.values() for d in bucket["dividas"])
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+
+import jwt
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import server
+
+
+@pytest.fixture
+def user(db, monkeypatch):
+    doc = {
+        "_id": ObjectId(), "name": "Ana", "email": "Ana@Example.com", "phone": "+55 11 99999-0000",
+        "password": "x", "plan": "trial", "trial_end_date": datetime(2024, 3, 15),
+    }
+    asyncio.run(db.users.insert_one(doc))
+    monkeypatch.setattr(server, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    return doc
+
+
+def authenticate(doc):
+    token = server.create_access_token(server.token_claims(str(doc["_id"]), doc))
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return token, asyncio.run(server.get_current_user(credentials))
+
+
+def test_tokens_carry_no_contact_details(user):
+    token, current_user = authenticate(user)
+    claims = jwt.decode(token, options={"verify_signature": False})
+    assert set(claims) == {"sub", "name", "plan", "exp"}
+    assert current_user == {"_id": user["_id"], "name": "Ana", "plan": "trial"}
+
+
+def test_me_looks_up_contact_details(user):
+    _, current_user = authenticate(user)
+    me = asyncio.run(server.get_me(current_user=current_user))
+    assert me == {
+        "id": str(user["_id"]), "name": "Ana", "email": "Ana@Example.com", "phone": "+55 11 99999-0000",
+        "plan": "trial", "trial_end_date": "2024-03-15T00:00:00",
+    }
+
+
+def test_admin_check_reads_the_email_from_the_user(user, monkeypatch):
+    _, current_user = authenticate(user)
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"ana@example.com"})
+    assert asyncio.run(server.get_admin_user(current_user=current_user)) is current_user
+
+    monkeypatch.setattr(server, "ADMIN_EMAILS", set())
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.get_admin_user(current_user=current_user))
+    assert excinfo.value.status_code == 403
+
+
+def test_concurrent_registration_loses_with_a_400(db, monkeypatch):
+    data = server.UserRegister(name="Bia", email="bia@example.com", password="secret")
+
+    async def racing_hash(password):
+        # The other request inserts while this one is hashing, after its check
+        await db.users.insert_one({"name": "Bia", "email": "bia@example.com", "password": "x"})
+        return "hashed"
+
+    monkeypatch.setattr(server, "hash_password", racing_hash)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.register(data))
+    assert (excinfo.value.status_code, excinfo.value.detail) == (400, "Email already registered")
+    assert asyncio.run(db.users.count_documents({"email": "bia@example.com"})) == 1
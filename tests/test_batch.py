@@ -0,0 +1,79 @@
+
+import pytest
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import server
+
+USER = {"_id": ObjectId(), "name": "Batch", "email": "batch@example.com", "plan": "trial"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    async def stream_rows():
+        async def rows():
+            yield b"a\n"
+            yield b"b\n"
+        return StreamingResponse(rows(), media_type="text/plain")
+
+    # No Mongo here: auth is overridden and the operations used below
+    # (root, B3 quotations, unknown routes) never reach the database
+    server.app.dependency_overrides[server.get_current_user] = lambda: USER
+    server.app.add_api_route("/api/test-stream", stream_rows)
+    yield TestClient(server.app)
+    server.app.dependency_overrides.clear()
+    server.app.router.routes = [r for r in server.app.router.routes if getattr(r, "path", None) != "/api/test-stream"]
+
+
+def run(client, *operations):
+    response = client.post("/api/batch", json={"operations": list(operations)})
+    return response.status_code, response.json()
+
+
+@pytest.mark.parametrize("path", [
+    "/api/export/expenses",
+    "/api/%65xport/expenses",
+    "/api/%65%78port/expenses?format=csv",
+    "/api/batch",
+    "/fields",
+])
+def test_excluded_paths_are_refused_after_decoding(client, path):
+    status, body = run(client, {"path": "/api/"}, {"path": path})
+    assert status == 400
+    assert "not allowed" in body["detail"]
+
+
+def test_operations_fail_individually(client):
+    status, body = run(
+        client,
+        {"path": "/api/"},
+        {"path": "/api/does-not-exist"},
+        {"path": "/api/caf\u00e9\u2615"},
+        {"path": "/api/quotations/%62%33"},
+    )
+    assert status == 200
+    root, unknown, non_latin, quotations = body["responses"]
+    assert (root["status"], root["body"]) == (200, {"message": "Agro Track API", "version": "1.0"})
+    assert unknown["status"] == 404
+    assert non_latin["status"] == 400
+    assert quotations["status"] == 200 and quotations["path"] == "/api/quotations/%62%33"
+    assert isinstance(quotations["body"], list)
+
+
+def test_if_none_match_returns_304_without_body(client):
+    _, first = run(client, {"path": "/api/quotations/b3"})
+    etag = first["responses"][0]["headers"]["etag"]
+    _, second = run(client, {"path": "/api/quotations/b3", "if_none_match": etag})
+    [result] = second["responses"]
+    assert result["status"] == 304
+    assert result["headers"]["etag"] == etag
+    assert result["body"] is None
+
+
+def test_streaming_responses_are_refused(client):
+    status, body = run(client, {"path": "/api/test-stream"})
+    assert status == 200
+    [result] = body["responses"]
+    assert result["status"] == 400
+    assert "Streaming" in result["body"]["detail"]
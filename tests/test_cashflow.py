@@ -0,0 +1,64 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import CASHFLOW_MAX_BUCKETS, cashflow_buckets, cashflow_range, cashflow_series, local_midnight_utc
+
+pytestmark = pytest.mark.skipif(server.ALERTS_TIMEZONE.key != "America/Sao_Paulo", reason="expects the default ALERTS_TIMEZONE")
+
+
+def test_weeks_start_on_local_monday():
+    # Wednesday noon to Wednesday noon, two weeks later
+    assert cashflow_buckets(datetime(2024, 3, 6, 12), datetime(2024, 3, 20, 12), "week") == [
+        date(2024, 3, 4), date(2024, 3, 11), date(2024, 3, 18)
+    ]
+    # 02:00 UTC on Monday is still Sunday in São Paulo (UTC-3)
+    assert cashflow_buckets(datetime(2024, 3, 4, 2), datetime(2024, 3, 4, 2), "week") == [date(2024, 2, 26)]
+    assert cashflow_buckets(datetime(2024, 3, 4, 3), datetime(2024, 3, 4, 3), "week") == [date(2024, 3, 4)]
+
+
+def test_months_cross_the_year():
+    assert cashflow_buckets(datetime(2023, 11, 20), datetime(2024, 2, 1, 12), "month") == [
+        date(2023, 11, 1), date(2023, 12, 1), date(2024, 1, 1), date(2024, 2, 1)
+    ]
+
+
+def test_first_bucket_is_widened_to_its_local_midnight():
+    start, buckets = cashflow_range(datetime(2024, 3, 15, 12), datetime(2024, 4, 2), "month")
+    assert buckets == [date(2024, 3, 1), date(2024, 4, 1)]
+    assert start == datetime(2024, 3, 1, 3) == local_midnight_utc(date(2024, 3, 1))
+
+    aligned = datetime(2024, 3, 4, 3)
+    assert cashflow_range(aligned, aligned + timedelta(days=1), "week")[0] == aligned
+
+
+def test_bucket_cap():
+    start = datetime(2020, 1, 1, 12)
+    assert len(cashflow_buckets(start, start + timedelta(days=CASHFLOW_MAX_BUCKETS - 1), "day")) == CASHFLOW_MAX_BUCKETS
+    with pytest.raises(HTTPException) as excinfo:
+        cashflow_buckets(start, start + timedelta(days=CASHFLOW_MAX_BUCKETS), "day")
+    assert excinfo.value.status_code == 400
+
+
+def test_series_zero_fills_and_accumulates():
+    buckets = [date(2024, 3, 4), date(2024, 3, 11), date(2024, 3, 18)]
+    # $group outputs carry the bucket's local midnight in UTC
+    receitas = [{"_id": local_midnight_utc(date(2024, 3, 11)), "total": 100.0}]
+    despesas = [
+        {"_id": local_midnight_utc(date(2024, 3, 4)), "total": 30.5},
+        {"_id": local_midnight_utc(date(2024, 3, 18)), "total": 10.0 / 3},
+    ]
+    assert cashflow_series(buckets, receitas, despesas) == {
+        "buckets": ["2024-03-04", "2024-03-11", "2024-03-18"],
+        "receitas": [0.0, 100.0, 0.0],
+        "despesas": [30.5, 0.0, 3.33],
+        "saldo_acumulado": [-30.5, 69.5, 66.17],
+    }
+
+
+def test_empty_series():
+    assert cashflow_series([date(2024, 3, 1)], [], []) == {
+        "buckets": ["2024-03-01"], "receitas": [0.0], "despesas": [0.0], "saldo_acumulado": [0.0]
+    }
@@ -0,0 +1,179 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from compression import ENCODERS, CompressionMiddleware, negotiate
+
+ROWS = [{"id": i, "cultura": "Soja", "valor": 1234.5 + i} for i in range(200)]
+
+
+async def rows(request):
+    return JSONResponse(ROWS, headers={"ETag": '"abc"'})
+
+
+async def weak(request):
+    return JSONResponse(ROWS, headers={"ETag": 'W/"abc"'})
+
+
+async def small(request):
+    return JSONResponse({"ok": True})
+
+
+async def png(request):
+    return Response(b"\x89PNG" + bytes(4096), media_type="image/png")
+
+
+async def encoded(request):
+    return Response(gzip.compress(json.dumps(ROWS).encode()), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+
+async def not_modified(request):
+    return Response(status_code=304, headers={"ETag": '"abc"'})
+
+
+async def stream(request):
+    async def lines():
+        for row in ROWS[:3]:
+            yield json.dumps(row) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+APP = Starlette(routes=[
+    Route(path, endpoint)
+    for path, endpoint in [
+        ("/api/rows", rows), ("/api/weak", weak), ("/api/small", small), ("/api/png", png),
+        ("/api/encoded", encoded), ("/api/not-modified", not_modified), ("/api/stream", stream),
+        ("/api/export/rows", rows), ("/api/export/small", small), ("/api/raw/rows", rows),
+    ]
+])
+
+
+def middleware(**kwargs):
+    return CompressionMiddleware(APP, encodings=("br", "gzip"), routes={
+        "/api/export/": {"encodings": ["gzip"], "levels": {"gzip": 1}},
+        "/api/export/small": {"minimum_size": 0},
+        "/api/raw/": None,
+    }, **kwargs)
+
+
+def call(app, path, accept_encoding=None):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": headers, "http_version": "1.1", "scheme": "http", "server": ("test", 80)}
+    messages, requests = [], [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # Streaming responses listen for a disconnect until they are done
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start, bodies = messages[0], [m for m in messages[1:] if m["type"] == "http.response.body"]
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, bodies
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, br", "br"),  # tie: server preference
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("*;q=0.1, gzip;q=0", "br"),
+    ("identity", None),
+    ("gzip;q=bogus", None),
+    ("", None),
+])
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding, ["br", "gzip"]) == expected
+
+
+def test_json_is_compressed_with_the_negotiated_encoding():
+    status, headers, [body] = call(middleware(), "/api/rows", "gzip")
+    assert status == 200
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(body["body"])
+    assert json.loads(gzip.decompress(body["body"])) == ROWS
+
+
+@pytest.mark.skipif("br" not in ENCODERS, reason="brotli not installed")
+def test_brotli_when_preferred():
+    import brotli
+
+    _, headers, [body] = call(middleware(), "/api/rows", "gzip;q=0.8, br")
+    assert headers["content-encoding"] == "br"
+    assert json.loads(brotli.decompress(body["body"])) == ROWS
+
+
+def test_strong_etags_are_weakened():
+    _, headers, _ = call(middleware(), "/api/rows", "gzip")
+    assert headers["etag"] == 'W/"abc"'
+    _, headers, _ = call(middleware(), "/api/weak", "gzip")
+    assert headers["etag"] == 'W/"abc"'
+    # Served as is, the representation is the identity one
+    _, headers, _ = call(middleware(), "/api/rows")
+    assert headers["etag"] == '"abc"'
+
+
+@pytest.mark.parametrize("path, accept_encoding", [
+    ("/api/small", "gzip"),  # under minimum_size
+    ("/api/rows", None),  # no Accept-Encoding
+    ("/api/rows", "identity"),  # nothing acceptable
+    ("/api/export/rows", "br"),  # not offered under the prefix
+])
+def test_uncompressed_responses_still_vary(path, accept_encoding):
+    _, headers, bodies = call(middleware(), path, accept_encoding)
+    assert "content-encoding" not in headers
+    assert headers["vary"] == "Accept-Encoding"
+    assert [b["body"] for b in bodies] == [b["body"] for b in call(APP, path)[2]]
+
+
+def test_prefix_opt_out():
+    _, headers, [body] = call(middleware(), "/api/raw/rows", "gzip")
+    assert "content-encoding" not in headers
+    assert "vary" not in headers
+    assert json.loads(body["body"]) == ROWS
+
+
+def test_prefix_overrides():
+    _, headers, [body] = call(middleware(), "/api/export/rows", "gzip, br")
+    assert headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body["body"])) == ROWS
+    # Longest prefix wins
+    _, headers, [body] = call(middleware(), "/api/export/small", "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body["body"])) == {"ok": True}
+
+
+@pytest.mark.parametrize("path", ["/api/png", "/api/encoded", "/api/not-modified"])
+def test_incompressible_responses_pass_through(path):
+    _, headers, bodies = call(middleware(minimum_size=0), path, "gzip")
+    _, identity_headers, identity_bodies = call(APP, path)
+    assert headers.get("content-encoding") == identity_headers.get("content-encoding")
+    assert [b["body"] for b in bodies] == [b["body"] for b in identity_bodies]
+
+
+def test_streams_are_flushed_chunk_by_chunk():
+    _, headers, bodies = call(middleware(), "/api/stream", "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert bodies[-1]["more_body"] is False
+
+    # Every chunk decodes on arrival to the rows sent so far
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    received = []
+    for body in bodies[:-1]:
+        received.append(decoder.decompress(body["body"]))
+    lines = b"".join(received).decode().splitlines()
+    assert [json.loads(line) for line in lines] == ROWS[:3]
+    assert all(received)
+    assert decoder.decompress(bodies[-1]["body"]) == b"" and decoder.eof
@@ -0,0 +1,88 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import server
+
+USER = {"_id": ObjectId(), "name": "Export", "plan": "trial"}
+USER_ID = str(USER["_id"])
+COLUMNS = list(server.Expense.model_fields)
+
+
+@pytest.fixture
+def expenses(db, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_BATCH_SIZE", 2)
+    docs = [
+        {"_id": ObjectId(), "user_id": USER_ID, "valor": float(day), "categoria": "Insumos", "cultura": "Soja",
+         "tipo": "variavel", "data": datetime(2024, 3, day), "descricao": None, "created_at": datetime(2024, 3, day)}
+        for day in (5, 1, 3, 2, 4)
+    ]
+    docs[0]["descricao"] = 'Adubo "NPK", 20kg\nsegunda linha'
+    asyncio.run(db.expenses.insert_many(docs + [{**docs[1], "_id": ObjectId(), "user_id": "someone else"}]))
+    return sorted(docs, key=lambda d: d["data"])
+
+
+def chunks(fmt, date_from=None, date_to=None):
+    async def collect():
+        return [chunk async for chunk in server.export_rows("expenses", USER_ID, fmt, date_from, date_to)]
+    return asyncio.run(collect())
+
+
+def test_csv_has_a_header_and_quotes_values(expenses):
+    rows = list(csv.reader(io.StringIO("".join(chunks("csv")))))
+    assert rows[0] == COLUMNS
+    assert [row[COLUMNS.index("id")] for row in rows[1:]] == [str(d["_id"]) for d in expenses]
+
+    row = dict(zip(COLUMNS, rows[-1]))
+    assert row["descricao"] == 'Adubo "NPK", 20kg\nsegunda linha'
+    assert (row["valor"], row["data"], row["user_id"]) == ("5.0", "2024-03-05T00:00:00", USER_ID)
+    # None is written as an empty cell
+    assert dict(zip(COLUMNS, rows[1]))["descricao"] == ""
+
+
+def test_ndjson_has_one_object_per_line(expenses):
+    lines = "".join(chunks("ndjson")).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [r["id"] for r in records] == [str(d["_id"]) for d in expenses]
+    assert all(list(r) == COLUMNS for r in records)
+    assert (records[0]["data"], records[0]["descricao"], records[-1]["descricao"]) == ("2024-03-01T00:00:00", None, expenses[-1]["descricao"])
+
+
+@pytest.mark.parametrize("fmt, header", [("csv", 1), ("ndjson", 0)])
+def test_rows_are_flushed_per_cursor_batch(expenses, fmt, header):
+    # Five rows in batches of two: two full chunks and the remainder
+    sizes = [len(list(csv.reader(io.StringIO(c)))) if fmt == "csv" else len(c.splitlines()) for c in chunks(fmt)]
+    assert sizes == [2 + header, 2, 1]
+
+
+def test_date_filters_are_inclusive(expenses):
+    lines = "".join(chunks("ndjson", datetime(2024, 3, 2), datetime(2024, 3, 4))).splitlines()
+    assert [json.loads(line)["valor"] for line in lines] == [2.0, 3.0, 4.0]
+    assert chunks("csv", datetime(2025, 1, 1)) == [",".join(COLUMNS) + "\r\n"]
+    assert chunks("ndjson", datetime(2025, 1, 1)) == []
+
+
+def test_endpoint_streams_the_export(expenses):
+    server.app.dependency_overrides[server.get_current_user] = lambda: USER
+    try:
+        client = TestClient(server.app)
+        response = client.get("/api/export/expenses", params={"format": "csv", "from": "2024-03-04T00:00:00"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.headers["content-disposition"].startswith('attachment; filename="expenses-')
+        assert len(list(csv.reader(io.StringIO(response.text)))) == 3
+
+        response = client.get("/api/export/expenses")
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert len(response.text.splitlines()) == 5
+
+        assert client.get("/api/export/users").status_code == 404
+        assert client.get("/api/export/expenses", params={"format": "xlsx"}).status_code == 400
+    finally:
+        server.app.dependency_overrides.clear()
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import server
+
+USER = {"_id": ObjectId(), "name": "Fields", "plan": "trial"}
+USER_ID = str(USER["_id"])
+
+
+@pytest.fixture
+def client(db):
+    field_id = ObjectId()
+    asyncio.run(db.fields.insert_one({"_id": field_id, "user_id": USER_ID, "nome": "Talhão 1", "area_ha": 10.0, "cultura": "Soja"}))
+    asyncio.run(db.user_stats.insert_many([
+        {"user_id": USER_ID, "scope": "meta", "key": "", "built_at": datetime(2024, 3, 1)},
+        {"user_id": USER_ID, "scope": "field", "key": str(field_id), "total_sacas": 1100.0, "total_safras": 2},
+        {"user_id": USER_ID, "scope": "cultura", "key": "Soja", "receitas": 500.0, "receitas_count": 1, "despesas": 200.0, "despesas_count": 2},
+    ]))
+    asyncio.run(db.debts.insert_one({"user_id": USER_ID, "valor": 50.0, "credor": "Banco", "cultura": "Soja", "status": "pendente", "vencimento": datetime(2024, 4, 1)}))
+    asyncio.run(db.expenses.insert_one({"user_id": USER_ID, "valor": 10.0, "categoria": "Insumos", "cultura": "Soja", "tipo": "variavel", "data": datetime(2024, 3, 1)}))
+
+    server.app.dependency_overrides[server.get_current_user] = lambda: USER
+    yield TestClient(server.app)
+    server.app.dependency_overrides.clear()
+
+
+def forbid(monkeypatch, name):
+    async def fail(*args, **kwargs):
+        raise AssertionError(f"{name} should not run")
+    monkeypatch.setattr(server, name, fail)
+
+
+def test_parse_fields():
+    allowed = {"valor", "data", "cultura"}
+    assert server.parse_fields(None, allowed) is None
+    assert server.parse_fields("", allowed) is None
+    assert server.parse_fields(" valor, id,,data ", allowed) == {"valor", "data"}
+    with pytest.raises(HTTPException) as excinfo:
+        server.parse_fields("valor,zeta,alfa", allowed)
+    assert (excinfo.value.status_code, excinfo.value.detail) == (400, "Unknown fields: alfa, zeta")
+
+
+@pytest.mark.parametrize("path, known", [("/api/fields", "nome"), ("/api/dashboard/summary", "lucro"), ("/api/expenses", "valor")])
+def test_unknown_fields_are_rejected(client, path, known):
+    response = client.get(path, params={"fields": f"{known},bogus"})
+    assert (response.status_code, response.json()["detail"]) == (400, "Unknown fields: bogus")
+
+
+def test_fields_without_stats_skip_the_rollups(client, monkeypatch):
+    forbid(monkeypatch, "load_user_stats")
+    assert [set(f) for f in client.get("/api/fields", params={"fields": "nome"}).json()] == [{"id", "nome"}]
+
+
+def test_field_stats_still_read_area_ha(client):
+    fields = client.get("/api/fields", params={"fields": "produtividade_media,total_safras"}).json()
+    # area_ha is fetched for the computation but not returned
+    assert [{k: v for k, v in f.items() if k != "id"} for f in fields] == [{"produtividade_media": 55.0, "total_safras": 2}]
+
+    full = client.get("/api/fields").json()[0]
+    assert {"nome", "area_ha", "cultura", "produtividade_media", "total_safras", "total_sacas"} <= set(full)
+
+
+def test_dashboard_summary_returns_only_the_requested_keys(client, monkeypatch):
+    assert client.get("/api/dashboard/summary", params={"fields": "lucro,total_receitas"}).json() == {"lucro": 300.0, "total_receitas": 500.0}
+
+    forbid(monkeypatch, "load_user_stats")
+    debts = client.get("/api/dashboard/summary", params={"fields": "dividas_pendentes"}).json()
+    assert list(debts) == ["dividas_pendentes"]
+    assert [d["valor"] for d in debts["dividas_pendentes"]] == [50.0]
+
+
+def test_list_projection_trims_items(client):
+    # The date is read to build the cursor, but only the requested keys come back
+    page = client.get("/api/expenses", params={"fields": "valor", "limit": 10}).json()
+    assert page["items"] == [{"id": page["items"][0]["id"], "valor": 10.0}]
+    assert [set(e) for e in client.get("/api/expenses", params={"fields": "valor,cultura"}).json()] == [{"id", "valor", "cultura"}]
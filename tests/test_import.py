@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import server
+
+USER = {"_id": ObjectId(), "name": "Import", "plan": "trial"}
+USER_ID = str(USER["_id"])
+
+
+def expense(valor, **extra):
+    return {"valor": valor, "categoria": "Insumos", "cultura": "Soja", "tipo": "variavel", "data": "2024-03-01T00:00:00", **extra}
+
+
+def test_invalid_rows_are_reported_and_the_rest_inserted(db):
+    records = [expense(10.0), "not an object", expense("abc"), expense(5.5)]
+    result = asyncio.run(server.import_records("expenses", USER_ID, records))
+
+    assert result["inserted"] == 2
+    assert [e["row"] for e in result["errors"]] == [1, 2]
+    assert result["errors"][0]["errors"][0]["msg"] == "Expected an object"
+    assert result["errors"][1]["errors"][0]["loc"] == ["valor"]
+    assert asyncio.run(db.expenses.count_documents({"user_id": USER_ID})) == 2
+
+
+def test_harvests_need_an_existing_field(db):
+    field_id = asyncio.run(db.fields.insert_one({"user_id": USER_ID, "nome": "Talhão 1", "area_ha": 10.0})).inserted_id
+    records = [
+        {"field_id": str(field_id), "cultura": "Soja", "quantidade_sacas": 550, "data_colheita": "2024-03-01T00:00:00"},
+        {"field_id": str(ObjectId()), "cultura": "Soja", "quantidade_sacas": 1, "data_colheita": "2024-03-01T00:00:00"},
+    ]
+    result = asyncio.run(server.import_records("harvests", USER_ID, records))
+
+    assert result["inserted"] == 1
+    assert result["errors"] == [{"row": 1, "errors": [{"loc": ["field_id"], "msg": "Field not found"}]}]
+    harvest = asyncio.run(db.harvests.find_one({"user_id": USER_ID}))
+    assert (harvest["field_name"], harvest["produtividade"]) == ("Talhão 1", 55.0)
+
+
+def test_harvests_on_a_field_without_area_are_row_errors(db):
+    field_id = asyncio.run(db.fields.insert_one({"user_id": USER_ID, "nome": "Talhão 0", "area_ha": 0.0})).inserted_id
+    records = [{"field_id": str(field_id), "cultura": "Soja", "quantidade_sacas": 10, "data_colheita": "2024-03-01T00:00:00"}]
+    result = asyncio.run(server.import_records("harvests", USER_ID, records))
+
+    assert result == {"inserted": 0, "errors": [{"row": 0, "errors": [{"loc": ["field_id"], "msg": "Field has no area"}]}]}
+    assert asyncio.run(db.harvests.count_documents({})) == 0
+
+
+def test_parsing_and_validation_run_off_the_event_loop(db, monkeypatch):
+    threads = {}
+    for name in ("parse_csv", "validate_records", "build_documents"):
+        def record(*args, _original=getattr(server, name), _name=name):
+            threads[_name] = threading.current_thread()
+            return _original(*args)
+        monkeypatch.setattr(server, name, record)
+
+    server.app.dependency_overrides[server.get_current_user] = lambda: USER
+    try:
+        client = TestClient(server.app)
+        csv_body = "valor,categoria,cultura,tipo,data,descricao\n10.5,Insumos,Soja,variavel,2024-03-01T00:00:00,\n"
+        response = client.post("/api/import/expenses", content=csv_body.encode(), headers={"Content-Type": "text/csv"})
+        assert response.json() == {"inserted": 1, "errors": []}
+        response = client.post("/api/import/expenses", json=[expense(1.0)])
+        assert response.json() == {"inserted": 1, "errors": []}
+        assert client.post("/api/import/expenses", content=b"[{", headers={"Content-Type": "application/json"}).status_code == 400
+        assert client.post("/api/import/expenses", json={"valor": 1}).status_code == 400
+    finally:
+        server.app.dependency_overrides.clear()
+
+    assert set(threads) == {"parse_csv", "validate_records", "build_documents"}
+    # The loop's default executor names its threads asyncio_N
+    assert all(thread.name.startswith("asyncio_") for thread in threads.values())
@@ -0,0 +1,114 @@
+import os
+import subprocess
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+from prometheus_client import REGISTRY
+from pymongo import monitoring
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from metrics import MetricsMiddleware, MongoCommandMetrics, MongoPoolMetrics
+
+BACKEND = Path(__file__).resolve().parent.parent / "backend"
+
+ADDRESS = ("localhost", 27017)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def get_item(request):
+    return PlainTextResponse(request.path_params["item_id"])
+
+
+async def fail(request):
+    raise RuntimeError("boom")
+
+
+def test_requests_are_labelled_by_route_template():
+    app = Starlette(routes=[Route("/items/{item_id}", get_item), Route("/fail", fail)])
+    client = TestClient(MetricsMiddleware(app), raise_server_exceptions=False)
+    before = sample("http_requests_total", method="GET", route="/items/{item_id}", status="200")
+
+    for item_id in ("a", "b", "c"):
+        client.get(f"/items/{item_id}")
+    client.get("/missing")
+    client.get("/fail")
+
+    assert sample("http_requests_total", method="GET", route="/items/{item_id}", status="200") == before + 3
+    assert sample("http_request_duration_seconds_count", method="GET", route="/items/{item_id}") >= 3
+    assert sample("http_requests_total", method="GET", route="unmatched", status="404") >= 1
+    assert sample("http_requests_total", method="GET", route="/fail", status="500") >= 1
+    assert sample("http_requests_in_progress", method="GET") == 0
+
+
+def test_command_listener_counts_per_collection():
+    listener = MongoCommandMetrics()
+    labels = {"collection": "expenses", "command": "find"}
+    before = sample("mongodb_documents_returned_total", **labels)
+
+    listener.started(monitoring.CommandStartedEvent({"find": "expenses", "filter": {}}, "agro", 1, ADDRESS, 1))
+    listener.succeeded(monitoring.CommandSucceededEvent(
+        timedelta(milliseconds=3), {"cursor": {"firstBatch": [{}, {}, {}], "id": 7}, "ok": 1}, "find", 1, ADDRESS, 1
+    ))
+    listener.started(monitoring.CommandStartedEvent({"getMore": 7, "collection": "expenses"}, "agro", 2, ADDRESS, 1))
+    listener.succeeded(monitoring.CommandSucceededEvent(
+        timedelta(milliseconds=1), {"cursor": {"nextBatch": [{}, {}], "id": 0}, "ok": 1}, "getMore", 2, ADDRESS, 1
+    ))
+    listener.started(monitoring.CommandStartedEvent({"insert": "debts", "documents": []}, "agro", 3, ADDRESS, 2))
+    listener.failed(monitoring.CommandFailedEvent(timedelta(milliseconds=2), {"ok": 0}, "insert", 3, ADDRESS, 2))
+
+    assert sample("mongodb_documents_returned_total", **labels) == before + 3
+    assert sample("mongodb_documents_returned_total", collection="expenses", command="getMore") >= 2
+    assert sample("mongodb_commands_total", collection="debts", command="insert", outcome="failed") >= 1
+    assert sample("mongodb_command_duration_seconds_count", **labels) >= 1
+    assert listener._collections == {}
+
+
+def test_pool_listener_measures_checkout_waits():
+    listener = MongoPoolMetrics()
+    waits = sample("mongodb_pool_checkout_wait_seconds_count")
+    in_use = sample("mongodb_pool_connections_in_use")
+
+    listener.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    listener.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 1))
+    assert sample("mongodb_pool_connections_in_use") == in_use + 1
+    listener.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+
+    assert sample("mongodb_pool_checkout_wait_seconds_count") == waits + 1
+    assert sample("mongodb_pool_connections_in_use") == in_use
+
+
+WORKER = """
+import sys
+sys.path.insert(0, {backend!r})
+from metrics import HTTP_REQUESTS, HTTP_IN_PROGRESS
+HTTP_REQUESTS.labels("GET", "/api/fields", "200").inc({count})
+HTTP_IN_PROGRESS.labels("GET").inc()
+"""
+
+SCRAPE = """
+import sys
+sys.path.insert(0, {backend!r})
+from metrics import render
+sys.stdout.write(render()[0].decode())
+"""
+
+
+def test_workers_are_aggregated_through_the_multiprocess_directory(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    for count in (2, 5):
+        subprocess.run([sys.executable, "-c", WORKER.format(backend=str(BACKEND), count=count)], env=env, check=True)
+    scrape = subprocess.run(
+        [sys.executable, "-c", SCRAPE.format(backend=str(BACKEND))], env=env, check=True, capture_output=True, text=True
+    ).stdout
+
+    assert 'http_requests_total{method="GET",route="/api/fields",status="200"} 7.0' in scrape
+    # Live gauges are only dropped by mark_process_dead, which these workers
+    # never called, so both in-flight requests still show
+    assert 'http_requests_in_progress{method="GET"} 2.0' in scrape
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import server
+
+USER = {"_id": ObjectId(), "name": "Pages", "plan": "trial"}
+USER_ID = str(USER["_id"])
+
+
+def params(**overrides):
+    return {"limit": None, "after": None, "from": None, "to": None, "fields": None, **overrides}
+
+
+def seed(db, days):
+    docs = [{"_id": ObjectId(), "user_id": USER_ID, "valor": float(i), "data": datetime(2024, 3, day)} for i, day in enumerate(days)]
+    asyncio.run(db.expenses.insert_many(docs + [{"user_id": "someone else", "valor": 0.0, "data": datetime(2024, 3, 1)}]))
+    return docs
+
+
+def walk(db, limit, direction=server.DESCENDING, **overrides):
+    pages, after = [], None
+    while True:
+        page = asyncio.run(server.list_documents(db.expenses, USER_ID, "data", params(limit=limit, after=after, **overrides), {"valor", "data"}, direction))
+        pages.append([item["id"] for item in page["items"]])
+        after = page["next_cursor"]
+        if after is None:
+            return pages
+
+
+def ids(docs):
+    return [str(d["_id"]) for d in docs]
+
+
+def test_pages_follow_date_then_id(db):
+    # Three documents share a date; _id breaks the tie so none is skipped or repeated
+    docs = seed(db, [5, 3, 3, 3, 1])
+    by_key = sorted(docs, key=lambda d: (d["data"], d["_id"]), reverse=True)
+
+    pages = walk(db, 2)
+    assert pages == [ids(by_key[0:2]), ids(by_key[2:4]), ids(by_key[4:])]
+    assert walk(db, 2, server.ASCENDING) == [ids(by_key[::-1][0:2]), ids(by_key[::-1][2:4]), ids(by_key[::-1][4:])]
+
+
+def test_last_page_has_no_next_cursor(db):
+    seed(db, [4, 3, 2, 1])
+    # An exact multiple of the page size doesn't leave an empty trailing page
+    assert [len(page) for page in walk(db, 2)] == [2, 2]
+    assert [len(page) for page in walk(db, 10)] == [4]
+
+
+def test_from_and_to_bound_every_page(db):
+    docs = seed(db, [9, 7, 5, 5, 3, 1])
+    inside = [d for d in docs if datetime(2024, 3, 3) <= d["data"] <= datetime(2024, 3, 7)]
+    pages = walk(db, 2, **{"from": datetime(2024, 3, 3), "to": datetime(2024, 3, 7)})
+    assert sorted(sum(pages, [])) == sorted(ids(inside))
+    assert [len(page) for page in pages] == [2, 2]
+
+
+def test_cursor_round_trip():
+    doc = {"_id": ObjectId(), "data": datetime(2024, 3, 1, 12, 30)}
+    assert server.decode_cursor(server.encode_cursor(doc, "data")) == (doc["data"], doc["_id"])
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm8tc2VwYXJhdG9y", "MjAyNC0wMy0wMVQwMDowMDowMHxub3QtYW4taWQ=", "ção"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        server.decode_cursor(cursor)
+    assert (excinfo.value.status_code, excinfo.value.detail) == (400, "Invalid cursor")
+
+
+def test_endpoint_pages_and_rejects_bad_cursors(db):
+    seed(db, [3, 2, 1])
+    server.app.dependency_overrides[server.get_current_user] = lambda: USER
+    try:
+        client = TestClient(server.app)
+        first = client.get("/api/expenses", params={"limit": 2}).json()
+        second = client.get("/api/expenses", params={"limit": 2, "after": first["next_cursor"]}).json()
+        assert [len(first["items"]), len(second["items"])] == [2, 1]
+        assert second["next_cursor"] is None
+        # Without limit or after the endpoint keeps returning a plain list
+        assert len(client.get("/api/expenses").json()) == 3
+
+        response = client.get("/api/expenses", params={"limit": 2, "after": "garbage"})
+        assert (response.status_code, response.json()["detail"]) == (400, "Invalid cursor")
+    finally:
+        server.app.dependency_overrides.clear()
@@ -0,0 +1,120 @@
+import asyncio
+import calendar
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from projection import build_payload, infer_recurring, project
+
+TODAY = date(2026, 10, 16)
+
+
+def months_before(today, count):
+    # (year, month) of the `count` whole months before `today`, oldest first
+    index = today.year * 12 + today.month - 1
+    return [divmod(i, 12) for i in range(index - count, index)]
+
+
+def history():
+    # Labour every month on the 5th, a soy sale every March, sporadic repairs
+    despesas, receitas = [], []
+    for i, (year, month) in enumerate(months_before(TODAY, 24)):
+        despesas.append({"data": datetime(year, month + 1, 5, 15), "valor": 3000.0, "categoria": "Mão de obra"})
+        if month + 1 == 3:
+            receitas.append({"data": datetime(year, 3, 20, 15), "valor": 50000.0, "cultura": "Soja"})
+        if i % 5 == 0:
+            despesas.append({"data": datetime(year, month + 1, 10, 15), "valor": 999.0, "categoria": "Manutenção"})
+    return receitas, despesas
+
+
+def test_infers_monthly_and_annual_flows():
+    receitas, despesas = history()
+    payload = build_payload("u", receitas, despesas, [], 0.0, TODAY, 6)
+    patterns = infer_recurring(payload["kind"], payload["chave"], payload["data"], payload["valor"], payload["today"])
+
+    found = {(c, f): (m, d, v) for c, f, m, d, v in zip(
+        patterns["chave"], patterns["frequencia"], patterns["mes"], patterns["dia"], patterns["valor"]
+    )}
+    assert found == {
+        ("Mão de obra", "mensal"): (-1, 5, 3000.0),
+        ("Soja", "anual"): (2, 20, 50000.0),
+    }
+
+
+def test_short_history_has_no_patterns():
+    despesas = [{"data": datetime(2026, 9, 5), "valor": 100.0, "categoria": "Diesel"}]
+    result = project(build_payload("u", [], despesas, [], 500.0, TODAY, 3))
+    assert result["recorrencias"] == []
+    assert set(result["saldo"]) == {500.0}
+
+
+def test_balance_minimum_and_shortfalls():
+    receitas, despesas = history()
+    dividas = [
+        {"vencimento": datetime(2026, 12, 1, 3), "valor": 20000.0},
+        # Overdue: due on the first day of the projection
+        {"vencimento": datetime(2026, 1, 1, 3), "valor": 100.0},
+        # Beyond the horizon
+        {"vencimento": datetime(2028, 1, 1, 3), "valor": 1e6},
+    ]
+    result = project(build_payload("u", receitas, despesas, dividas, 10000.0, TODAY, 6, "America/Sao_Paulo"))
+
+    assert (result["inicio"], result["fim"]) == ("2026-10-16", "2027-04-15")
+    assert len(result["saldo"]) == 182
+    assert result["saldo"][0] == 9900.0
+    assert result["dividas"] == {"count": 2, "total": 20100.0}
+    assert result["mensal"]["buckets"] == ["2026-10", "2026-11", "2026-12", "2027-01", "2027-02", "2027-03", "2027-04"]
+    assert result["mensal"]["saidas"][:3] == [100.0, 3000.0, 23000.0]
+
+    # Labour drains the balance until the March sale
+    assert result["saldo_minimo"] == {"valor": -25100.0, "data": "2027-03-05"}
+    [window] = result["janelas_deficit"]
+    assert window["inicio"] == "2026-12-01"
+    assert window["fim"] == "2027-03-19"
+    assert window["data_menor_saldo"] == "2027-03-05"
+    assert result["saldo"][-1] == 10000.0 - 100 - 20000 - 6 * 3000 + 50000
+
+
+def test_days_clip_to_month_length():
+    today = date(2026, 10, 31)
+    despesas = [
+        {"data": datetime(year, month + 1, calendar.monthrange(year, month + 1)[1]), "valor": 10.0, "categoria": "Arrendamento"}
+        for year, month in months_before(today, 12)
+    ]
+    result = project(build_payload("u", [], despesas, [], 0.0, today, 3))
+    [pattern] = result["recorrencias"]
+    assert pattern["dia"] == 31
+    # Oct 31, Nov 30 and Dec 31; the range ends on Jan 30
+    assert result["mensal"]["saidas"] == [10.0, 10.0, 10.0, 0.0]
+
+
+def test_precompute_bounds_payloads_in_flight(db, monkeypatch):
+    import server
+
+    asyncio.run(db.users.insert_many([{"name": f"u{i}", "email": f"u{i}@example.com"} for i in range(12)]))
+    in_flight, peak, stored = set(), [0], []
+
+    async def load(user_id, today, months):
+        in_flight.add(user_id)
+        peak[0] = max(peak[0], len(in_flight))
+        return user_id
+
+    def slow_project(payload):
+        time.sleep(0.005)
+        return {"user_id": payload}
+
+    async def store(user_id, today, months, versions, projection):
+        in_flight.discard(user_id)
+        stored.append(projection["user_id"])
+
+    monkeypatch.setattr(server, "load_projection_payload", load)
+    monkeypatch.setattr(server, "project", slow_project)
+    monkeypatch.setattr(server, "store_projection", store)
+
+    async def scenario():
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            return await server.precompute_projections(pool, 6, concurrency=3)
+
+    assert asyncio.run(scenario()) == 12
+    assert sorted(stored) == sorted(str(u["_id"]) for u in asyncio.run(db.users.find().to_list(None)))
+    assert peak[0] == 3
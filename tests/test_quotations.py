@@ -0,0 +1,297 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+import server
+from quotations import QuotationFeed, QuotationHistory, QuotationProvider, QuotationSnapshot, bucket_start
+
+
+class CountingProvider(QuotationProvider):
+    name = "counting"
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+
+    async def fetch(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return [{"produto": "Soja", "preco": 130.0 + self.calls, "variacao": 0.5, "unidade": "R$/sc", "data": "2024-03-01"}]
+
+
+def age(feed, seconds):
+    # Backdate the current snapshot instead of sleeping
+    feed.snapshot.monotonic -= seconds
+
+
+# A Friday; the week bucket starts on Monday 2024-02-26
+FRIDAY = datetime(2024, 3, 1, 10, 0)
+
+
+def snapshot(ts, **prices):
+    return QuotationSnapshot([{"produto": p, "preco": v, "variacao": 0.0} for p, v in prices.items()], ts)
+
+
+@pytest.fixture
+def store(db):
+    return QuotationHistory(db)
+
+
+async def record_all(store, ticks):
+    for ts, price in ticks:
+        await store.record(snapshot(ts, Soja=price))
+
+
+def test_bucket_start():
+    assert bucket_start(FRIDAY, "day") == datetime(2024, 3, 1)
+    assert bucket_start(FRIDAY, "week") == datetime(2024, 2, 26)
+    with pytest.raises(ValueError):
+        bucket_start(FRIDAY, "month")
+
+
+def test_record_folds_ticks_into_ohlc(store):
+    ticks = [(FRIDAY + timedelta(minutes=i), price) for i, price in enumerate([130.0, 134.5, 128.0, 131.0])]
+    # Next day, same week
+    ticks.append((FRIDAY + timedelta(days=1), 129.0))
+
+    async def scenario():
+        await record_all(store, ticks)
+        return await store.ohlc.find({"produto": "Soja"}, {"_id": 0}).sort([("granularity", 1), ("bucket", 1)]).to_list(None)
+
+    friday, saturday, week = asyncio.run(scenario())
+    assert friday == {
+        "produto": "Soja", "granularity": "day", "bucket": datetime(2024, 3, 1),
+        "open": 130.0, "high": 134.5, "low": 128.0, "close": 131.0,
+        "first_ts": ticks[0][0], "last_ts": ticks[3][0], "count": 4,
+    }
+    assert (saturday["open"], saturday["close"], saturday["count"]) == (129.0, 129.0, 1)
+    assert week["bucket"] == datetime(2024, 2, 26)
+    assert (week["open"], week["high"], week["low"], week["close"], week["count"]) == (130.0, 134.5, 128.0, 129.0, 5)
+
+
+def test_day_series_includes_the_bucket_containing_start(store):
+    ticks = [(FRIDAY + timedelta(days=d), 100.0 + d) for d in range(5)]
+
+    async def scenario():
+        await record_all(store, ticks)
+        # Starts mid-day on the 2nd, ends at the start of the 4th
+        return await store.series("Soja", "day", FRIDAY + timedelta(days=1, hours=5), datetime(2024, 3, 4))
+
+    series = asyncio.run(scenario())
+    assert series["t"] == ["2024-03-02T00:00:00", "2024-03-03T00:00:00", "2024-03-04T00:00:00"]
+    assert series["close"] == [101.0, 102.0, 103.0]
+
+
+def test_tick_series_are_downsampled_per_interval(store):
+    # Two minutes of 20s ticks, then one an hour later
+    ticks = [(FRIDAY + timedelta(seconds=20 * i), 100.0 + i) for i in range(6)]
+    ticks.append((FRIDAY + timedelta(hours=1, minutes=30), 90.0))
+
+    async def scenario():
+        await record_all(store, ticks)
+        minutes = await store.series("Soja", "minute", FRIDAY, FRIDAY + timedelta(minutes=1, seconds=30))
+        hours = await store.series("Soja", "hour", FRIDAY, FRIDAY + timedelta(hours=2))
+        return minutes, hours
+
+    minutes, hours = asyncio.run(scenario())
+    assert minutes["t"] == ["2024-03-01T10:00:00", "2024-03-01T10:01:00"]
+    # The 10:01:40 tick is past the end of the range
+    assert (minutes["open"], minutes["high"], minutes["low"], minutes["close"]) == (
+        [100.0, 103.0], [102.0, 104.0], [100.0, 103.0], [102.0, 104.0]
+    )
+    assert hours["t"] == ["2024-03-01T10:00:00", "2024-03-01T11:00:00"]
+    assert (hours["open"], hours["close"], hours["low"]) == ([100.0, 90.0], [105.0, 90.0], [100.0, 90.0])
+
+
+def test_unknown_interval_is_rejected(store):
+    with pytest.raises(ValueError):
+        asyncio.run(store.series("Soja", "month", FRIDAY, FRIDAY))
+
+
+# ==================== FEED ====================
+
+def test_provider_must_implement_fetch():
+    class Incomplete(QuotationProvider):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_first_read_waits_and_concurrent_readers_share_one_fetch():
+    provider = CountingProvider()
+    feed = QuotationFeed(provider, interval=60, max_stale=3600)
+
+    async def scenario():
+        return await asyncio.gather(*(feed.get() for _ in range(10)))
+
+    snapshots = asyncio.run(scenario())
+    assert provider.calls == 1
+    assert all(s is snapshots[0] for s in snapshots)
+    assert snapshots[0].quotations[0]["preco"] == 131.0
+
+
+def test_stale_snapshot_is_served_while_one_refresh_runs():
+    provider = CountingProvider()
+    feed = QuotationFeed(provider, interval=60, max_stale=3600)
+
+    async def scenario():
+        first = await feed.get()
+        # Fresh: served as is
+        assert await feed.get() is first and provider.calls == 1
+        age(feed, 120)
+        stale = await asyncio.gather(*(feed.get() for _ in range(5)))
+        await feed._inflight
+        return first, stale, await feed.get()
+
+    first, stale, refreshed = asyncio.run(scenario())
+    assert all(s is first for s in stale)
+    assert provider.calls == 2
+    assert refreshed is not first and refreshed.quotations[0]["preco"] == 132.0
+
+
+def test_failed_refresh_keeps_serving_the_last_snapshot():
+    provider = CountingProvider()
+    feed = QuotationFeed(provider, interval=60, max_stale=3600)
+
+    async def scenario():
+        first = await feed.get()
+        provider.fail = True
+        age(feed, 120)
+        assert await feed.get() is first
+        await asyncio.wait([feed._inflight])
+        # Past max_stale the reader waits for the provider, which fails again
+        age(feed, 7200)
+        return first, await feed.get()
+
+    first, served = asyncio.run(scenario())
+    assert served is first
+    assert provider.calls == 3
+
+
+def test_failure_without_a_snapshot_propagates():
+    provider = CountingProvider()
+    provider.fail = True
+    feed = QuotationFeed(provider)
+    with pytest.raises(RuntimeError):
+        asyncio.run(feed.get())
+
+
+def test_listeners_see_new_snapshots_and_their_errors_are_contained():
+    feed = QuotationFeed(CountingProvider())
+    seen = []
+
+    async def broken(snapshot):
+        raise RuntimeError("listener down")
+
+    async def record(snapshot):
+        seen.append(snapshot)
+
+    feed.add_listener(broken)
+    feed.add_listener(record)
+    snapshot = asyncio.run(feed.get())
+    assert seen == [snapshot]
+
+
+# ==================== ENDPOINT ====================
+
+@pytest.fixture
+def client(monkeypatch):
+    feed = QuotationFeed(CountingProvider(delay=0), interval=60, max_stale=3600)
+    monkeypatch.setattr(server, "quotation_feed", feed)
+    return TestClient(server.app)
+
+
+def test_endpoint_serves_the_snapshot_with_validators(client):
+    response = client.get("/api/quotations/b3")
+    snapshot = server.quotation_feed.snapshot
+    assert response.status_code == 200
+    assert response.content == snapshot.body
+    assert response.headers["etag"] == snapshot.etag
+    assert response.headers["last-modified"].endswith(" GMT")
+    assert response.headers["cache-control"] == "public, max-age=60, stale-while-revalidate=60"
+
+
+def test_if_none_match(client):
+    etag = client.get("/api/quotations/b3").headers["etag"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/api/quotations/b3", headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+    assert client.get("/api/quotations/b3", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_modified_since(client):
+    last_modified = client.get("/api/quotations/b3").headers["last-modified"]
+    fetched_at = server.quotation_feed.snapshot.fetched_at
+    earlier = format_datetime((fetched_at - timedelta(seconds=5)).replace(tzinfo=timezone.utc), usegmt=True)
+    assert client.get("/api/quotations/b3", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/api/quotations/b3", headers={"If-Modified-Since": earlier}).status_code == 200
+    assert client.get("/api/quotations/b3", headers={"If-Modified-Since": "not a date"}).status_code == 200
+    # If-None-Match wins over If-Modified-Since
+    response = client.get("/api/quotations/b3", headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified})
+    assert response.status_code == 200
+
+
+def test_endpoint_without_quotations_is_unavailable(client):
+    server.quotation_feed.provider.fail = True
+    assert client.get("/api/quotations/b3").status_code == 503
+
+
+# ==================== STARTUP ====================
+
+class FlakyHistory:
+    def __init__(self, failures):
+        self.failures = failures
+        self.attempts = 0
+        self.ready = threading.Event()
+
+    async def setup(self):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ServerSelectionTimeoutError("mongo down")
+        self.ready.set()
+
+
+class UnusedClient:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def lifespan(db, monkeypatch):
+    # Run the app's startup and shutdown without the scheduler or real clients
+    monkeypatch.setattr(server, "SCHEDULER_ENABLED", False)
+    monkeypatch.setattr(server, "QUOTATIONS_SETUP_RETRY_SECONDS", 0.01)
+    monkeypatch.setattr(server, "client", UnusedClient())
+    monkeypatch.setattr(server, "bcrypt_executor", ThreadPoolExecutor(max_workers=1))
+
+
+def test_history_setup_is_retried_without_blocking_startup(lifespan, monkeypatch):
+    history = FlakyHistory(failures=2)
+    monkeypatch.setattr(server, "quotation_history", history)
+    with TestClient(server.app) as client:
+        assert client.get("/api/").status_code == 200
+        assert history.ready.wait(5)
+    assert history.attempts == 3
+    assert server.startup_tasks == []
+
+
+def test_shutdown_cancels_a_pending_history_setup(lifespan, monkeypatch):
+    history = FlakyHistory(failures=10**6)
+    monkeypatch.setattr(server, "quotation_history", history)
+    monkeypatch.setattr(server, "QUOTATIONS_SETUP_RETRY_SECONDS", 3600)
+    with TestClient(server.app) as client:
+        assert client.get("/api/").status_code == 200
+    assert history.attempts == 1 and not history.ready.is_set()
+    assert server.startup_tasks == []
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import server
+
+USER = "u1"
+
+
+def expected(receitas, count):
+    return [{"user_id": USER, "scope": "cultura", "key": "Soja", "receitas": receitas, "receitas_count": count}]
+
+
+def stored(db):
+    async def read():
+        return await db.user_stats.find({"user_id": USER}, {"_id": 0}).to_list(None)
+    docs = asyncio.run(read())
+    return {(d["scope"], d["key"]): d for d in docs}
+
+
+def test_rebuild_deltas():
+    have = [
+        {"scope": "meta", "key": "", "built_at": datetime(2024, 3, 1)},
+        {"scope": "cultura", "key": "Soja", "receitas": 100.0, "receitas_count": 2},
+        {"scope": "field", "key": "gone", "total_sacas": 50, "total_safras": 1},
+    ]
+    want = [
+        {"scope": "cultura", "key": "Soja", "receitas": 150.0, "receitas_count": 2, "despesas": 10.0, "despesas_count": 1},
+        {"scope": "cultura", "key": "Milho", "receitas": 5.0, "receitas_count": 1},
+    ]
+    assert server.rebuild_deltas(have, want) == {
+        ("cultura", "Soja"): {"receitas": 50.0, "despesas": 10.0, "despesas_count": 1},
+        ("cultura", "Milho"): {"receitas": 5.0, "receitas_count": 1},
+        ("field", "gone"): {"total_sacas": -50, "total_safras": -1},
+    }
+
+
+def test_writes_during_the_computation_trigger_a_retry(db, monkeypatch):
+    calls = []
+
+    async def compute(user_id):
+        calls.append(user_id)
+        if len(calls) == 1:
+            # A revenue written while the pipelines run, too late for them to
+            # see its document but with its $inc already applied
+            await server.inc_user_stats(USER, "cultura", "Soja", {"receitas": 25.0, "receitas_count": 1})
+            return expected(100.0, 2)
+        return expected(125.0, 3)
+
+    monkeypatch.setattr(server, "compute_user_stats", compute)
+    docs = asyncio.run(server.load_user_stats(USER))
+
+    assert len(calls) == 2
+    assert docs == expected(125.0, 3)
+    rollups = stored(db)
+    assert rollups[("cultura", "Soja")]["receitas"] == 125.0
+    assert rollups[("cultura", "Soja")]["receitas_count"] == 3
+    assert "built_at" in rollups[("meta", "")] and "rebuilding_until" not in rollups[("meta", "")]
+
+
+def test_increments_after_the_rebuild_read_are_kept(db, monkeypatch):
+    original = server.read_user_stats
+    reads = []
+
+    async def read(user_id):
+        docs = await original(user_id)
+        reads.append(docs)
+        if len(reads) == 2:
+            # Lands between the last read and the rebuild's own $inc
+            await server.inc_user_stats(USER, "cultura", "Soja", {"receitas": 25.0, "receitas_count": 1})
+        return docs
+
+    monkeypatch.setattr(server, "read_user_stats", read)
+    monkeypatch.setattr(server, "compute_user_stats", lambda user_id: asyncio.sleep(0, expected(100.0, 2)))
+    asyncio.run(server.rebuild_user_stats(USER))
+
+    assert stored(db)[("cultura", "Soja")]["receitas"] == 125.0
+    assert stored(db)[("cultura", "Soja")]["receitas_count"] == 3
+
+
+def test_concurrent_first_reads_build_once(db, monkeypatch):
+    async def compute(user_id):
+        await asyncio.sleep(0.01)
+        return expected(100.0, 2)
+
+    monkeypatch.setattr(server, "compute_user_stats", compute)
+
+    async def scenario():
+        return await asyncio.gather(*(server.load_user_stats(USER) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert all(r == expected(100.0, 2) for r in results)
+    assert stored(db)[("cultura", "Soja")]["receitas"] == 100.0
+    assert stored(db)[("cultura", "Soja")]["receitas_count"] == 2
+
+
+def test_held_lease_is_respected_until_it_expires(db, monkeypatch):
+    monkeypatch.setattr(server, "compute_user_stats", lambda user_id: asyncio.sleep(0, expected(100.0, 2)))
+
+    async def lease(until):
+        await db.user_stats.update_one(
+            {"user_id": USER, "scope": "meta", "key": ""}, {"$set": {"rebuilding_until": until}}, upsert=True
+        )
+
+    asyncio.run(lease(datetime.utcnow() + timedelta(minutes=1)))
+    assert asyncio.run(server.load_user_stats(USER)) == expected(100.0, 2)
+    assert ("cultura", "Soja") not in stored(db)
+    assert asyncio.run(server.verify_user_stats(USER)) is None
+
+    # A rebuild that died leaves its lease behind
+    asyncio.run(lease(datetime.utcnow() - timedelta(seconds=1)))
+    asyncio.run(server.load_user_stats(USER))
+    assert stored(db)[("cultura", "Soja")]["receitas"] == 100.0
+    assert "built_at" in stored(db)[("meta", "")]
+
+
+def test_rebuild_corrects_drift_and_zeroes_removed_keys(db, monkeypatch):
+    async def seed():
+        await db.user_stats.insert_many([
+            {"user_id": USER, "scope": "meta", "key": "", "built_at": datetime(2024, 3, 1)},
+            {"user_id": USER, "scope": "cultura", "key": "Soja", "receitas": 90.0, "receitas_count": 2},
+            {"user_id": USER, "scope": "cultura", "key": "Milho", "receitas": 5.0, "receitas_count": 1},
+        ])
+
+    asyncio.run(seed())
+    monkeypatch.setattr(server, "compute_user_stats", lambda user_id: asyncio.sleep(0, expected(100.0, 2)))
+    asyncio.run(server.rebuild_user_stats(USER))
+
+    rollups = stored(db)
+    assert rollups[("cultura", "Soja")]["receitas"] == 100.0
+    assert (rollups[("cultura", "Milho")]["receitas"], rollups[("cultura", "Milho")]["receitas_count"]) == (0.0, 0)
+    assert asyncio.run(server.verify_user_stats(USER)) == []
@@ -0,0 +1,253 @@
+import asyncio
+import random
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from scheduler import Cron, FakeClock, Interval, MemoryLeaseStore, MongoLeaseStore, Scheduler
+
+START = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def make_scheduler(leases=None, clock=None, owner="a"):
+    return Scheduler(
+        leases or MemoryLeaseStore(),
+        owner=owner,
+        clock=clock or FakeClock(START),
+        poll_interval=1.0,
+        rng=random.Random(1),
+    )
+
+
+def test_interval_job_runs_on_schedule():
+    async def scenario():
+        clock = FakeClock(START)
+        scheduler = make_scheduler(clock=clock)
+        ran_at = []
+
+        async def job():
+            ran_at.append(clock.now())
+
+        scheduler.add_job("tick", job, Interval(10))
+        scheduler.start()
+        await clock.advance(35)
+        await scheduler.stop()
+        return ran_at, scheduler.stats()["tick"]
+
+    ran_at, stats = asyncio.run(scenario())
+    assert [(t - START).total_seconds() for t in ran_at] == [10, 20, 30]
+    assert stats["runs"] == 3
+    assert stats["failures"] == 0
+
+
+def test_run_at_start_and_jitter_bounds():
+    async def scenario():
+        clock = FakeClock(START)
+        scheduler = make_scheduler(clock=clock)
+        ran_at = []
+
+        async def job():
+            ran_at.append((clock.now() - START).total_seconds())
+
+        scheduler.add_job("tick", job, Interval(60, jitter=5), run_at_start=True)
+        scheduler.start()
+        await clock.advance(200)
+        await scheduler.stop()
+        return ran_at
+
+    ran_at = asyncio.run(scenario())
+    assert ran_at[0] == 0
+    gaps = [b - a for a, b in zip(ran_at, ran_at[1:])]
+    assert len(gaps) >= 2
+    assert all(60 <= gap <= 65 for gap in gaps)
+
+
+def test_lease_runs_exclusive_job_once_across_workers():
+    async def scenario():
+        clock = FakeClock(START)
+        leases = MemoryLeaseStore()
+        workers = [make_scheduler(leases, clock, owner=f"w{i}") for i in range(3)]
+        runs = []
+
+        for worker in workers:
+            async def job(owner=worker.owner):
+                runs.append(owner)
+            worker.add_job("scan", job, Interval(30))
+            worker.start()
+
+        await clock.advance(95)
+        for worker in workers:
+            await worker.stop()
+        return runs, [w.stats()["scan"] for w in workers]
+
+    runs, stats = asyncio.run(scenario())
+    assert len(runs) == 3
+    assert sum(s["runs"] for s in stats) == 3
+
+
+def test_local_jobs_run_in_every_worker():
+    async def scenario():
+        clock = FakeClock(START)
+        leases = MemoryLeaseStore()
+        workers = [make_scheduler(leases, clock, owner=f"w{i}") for i in range(2)]
+        runs = []
+
+        for worker in workers:
+            async def job(owner=worker.owner):
+                runs.append(owner)
+            worker.add_job("refresh", job, Interval(10), exclusive=False)
+            worker.start()
+
+        await clock.advance(25)
+        for worker in workers:
+            await worker.stop()
+        return runs
+
+    assert sorted(asyncio.run(scenario())) == ["w0", "w0", "w1", "w1"]
+
+
+def test_long_run_is_not_overlapped():
+    async def scenario():
+        clock = FakeClock(START)
+        leases = MemoryLeaseStore()
+        workers = [make_scheduler(leases, clock, owner=f"w{i}") for i in range(2)]
+        active, overlaps = [], []
+
+        for worker in workers:
+            async def job():
+                if active:
+                    overlaps.append(clock.now())
+                active.append(1)
+                await clock.sleep(25)
+                active.pop()
+            worker.add_job("slow", job, Interval(10), timeout=60)
+            worker.start()
+
+        await clock.advance(100)
+        for worker in workers:
+            await worker.stop()
+        return overlaps, [w.stats()["slow"] for w in workers]
+
+    overlaps, stats = asyncio.run(scenario())
+    assert overlaps == []
+    assert sum(s["runs"] for s in stats) >= 2
+    assert max(s["max_duration"] for s in stats) == 25
+
+
+def test_failures_and_timeouts_are_recorded():
+    async def scenario():
+        clock = FakeClock(START)
+        scheduler = make_scheduler(clock=clock)
+
+        async def broken():
+            raise RuntimeError("boom")
+
+        async def stuck():
+            await asyncio.Event().wait()
+
+        scheduler.add_job("broken", broken, Interval(10))
+        scheduler.add_job("stuck", stuck, Interval(10), timeout=0.01)
+        scheduler.start()
+        await clock.advance(10)
+        # wait_for times out on the real loop clock
+        await asyncio.sleep(0.05)
+        await clock.advance(0)
+        await scheduler.stop()
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["broken"]["runs"] == 1
+    assert stats["broken"]["failures"] == 1
+    assert "boom" in stats["broken"]["last_error"]
+    assert stats["stuck"]["timeouts"] == 1
+    assert stats["stuck"]["failures"] == 1
+
+
+def test_unreachable_lease_store_at_start_is_retried():
+    class FlakyStore(MemoryLeaseStore):
+        def __init__(self, failures):
+            super().__init__()
+            self.failures = failures
+
+        async def ensure(self, name, next_run_at):
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("lease store unreachable")
+            await super().ensure(name, next_run_at)
+
+    async def scenario():
+        clock = FakeClock(START)
+        scheduler = make_scheduler(leases=FlakyStore(failures=2), clock=clock)
+        ran_at = []
+
+        async def job():
+            ran_at.append((clock.now() - START).total_seconds())
+
+        scheduler.add_job("tick", job, Interval(10), run_at_start=True)
+        scheduler.start()
+        await clock.advance(15)
+        alive = not scheduler._tasks[0].done()
+        await scheduler.stop()
+        return ran_at, alive
+
+    ran_at, alive = asyncio.run(scenario())
+    assert alive
+    # Two failed attempts one poll interval apart, then the job starts
+    assert ran_at[0] == 2
+    assert len(ran_at) == 2
+
+
+def test_duplicate_job_names_are_rejected():
+    scheduler = make_scheduler()
+    scheduler.add_job("a", lambda: None, Interval(1))
+    with pytest.raises(ValueError):
+        scheduler.add_job("a", lambda: None, Interval(1))
+
+
+@pytest.mark.parametrize("expression, after, expected", [
+    ("*/15 * * * *", datetime(2024, 3, 1, 12, 7), datetime(2024, 3, 1, 12, 15)),
+    ("*/15 * * * *", datetime(2024, 3, 1, 12, 15), datetime(2024, 3, 1, 12, 30)),
+    ("30 6 * * *", datetime(2024, 3, 1, 7, 0), datetime(2024, 3, 2, 6, 30)),
+    ("0 9 * * 1-5", datetime(2024, 3, 1, 10, 0), datetime(2024, 3, 4, 9, 0)),  # Friday -> Monday
+    ("0 0 1 * *", datetime(2024, 12, 15, 0, 0), datetime(2025, 1, 1, 0, 0)),
+    ("0 0 29 2 *", datetime(2024, 3, 1, 0, 0), datetime(2028, 2, 29, 0, 0)),
+    ("0 12 13 * 5", datetime(2024, 3, 1, 13, 0), datetime(2024, 3, 8, 12, 0)),  # 13th or any Friday
+    ("0 0 * * 7", datetime(2024, 3, 1, 0, 0), datetime(2024, 3, 3, 0, 0)),  # 7 is Sunday
+])
+def test_cron_next_after(expression, after, expected):
+    cron = Cron(expression)
+    assert cron.next_after(after.replace(tzinfo=timezone.utc)) == expected.replace(tzinfo=timezone.utc)
+
+
+def test_cron_in_local_timezone():
+    cron = Cron("1 0 * * *", tz=ZoneInfo("America/Sao_Paulo"))
+    after = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+    assert cron.next_after(after) == datetime(2024, 3, 2, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* * 0 * *", "5-1 * * * *"])
+def test_cron_rejects_bad_expressions(expression):
+    with pytest.raises(ValueError):
+        Cron(expression)
+
+
+def test_mongo_lease_store(db):
+    async def scenario():
+        store = MongoLeaseStore(db.scheduler_leases)
+        await store.ensure("job", START)
+        await store.ensure("job", datetime(2030, 1, 1, tzinfo=timezone.utc))
+        assert await store.next_run_at("job") == START
+
+        later = datetime(2024, 3, 1, 12, 5, tzinfo=timezone.utc)
+        lease_end = datetime(2024, 3, 1, 12, 10, tzinfo=timezone.utc)
+        assert await store.claim("job", "a", START, later, lease_end)
+        assert not await store.claim("job", "b", START, later, lease_end)
+        # Due again, but "a" still holds the lease
+        assert not await store.claim("job", "b", later, later, lease_end)
+        await store.release("job", "b", later)
+        assert not await store.claim("job", "b", later, later, lease_end)
+        await store.release("job", "a", later)
+        assert await store.claim("job", "b", later, lease_end, lease_end)
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+import serialization
+
+ENCODERS = [serialization._dumps_stdlib]
+if serialization.orjson is not None:
+    ENCODERS.append(serialization._dumps_orjson)
+
+PAYLOAD = {
+    "id": ObjectId("65f1c0ffee0000000000abcd"),
+    "data": datetime(2024, 3, 1, 12, 30, 15, 250000),
+    "aware": datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc),
+    "dia": date(2024, 3, 1),
+    "valores": [1, 2.5, float("nan"), float("inf"), -float("inf"), None, True],
+    "par": (1, "dois"),
+    "texto": "Talhão \"1\"",
+    "aninhado": {"lista": [{"x": float("nan")}]},
+}
+
+EXPECTED = (
+    '{"id":"65f1c0ffee0000000000abcd","data":"2024-03-01T12:30:15.250000","aware":"2024-03-01T12:30:00+00:00",'
+    '"dia":"2024-03-01","valores":[1,2.5,null,null,null,null,true],"par":[1,"dois"],'
+    '"texto":"Talhão \\"1\\"","aninhado":{"lista":[{"x":null}]}}'
+).encode("utf-8")
+
+
+@pytest.mark.parametrize("dumps", ENCODERS, ids=lambda f: f.__name__)
+def test_encoders_agree(dumps):
+    assert dumps(PAYLOAD) == EXPECTED
+
+
+@pytest.mark.parametrize("dumps", ENCODERS, ids=lambda f: f.__name__)
+@pytest.mark.parametrize("key", [1, 1.5, None, True])
+def test_non_string_keys_are_rejected(dumps, key):
+    with pytest.raises(TypeError):
+        dumps({"ok": {key: 1}})
+
+
+@pytest.mark.parametrize("dumps", ENCODERS, ids=lambda f: f.__name__)
+def test_unknown_types_are_rejected(dumps):
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
@@ -0,0 +1,71 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import server
+
+USER = {"_id": ObjectId(), "name": "Sync", "plan": "trial"}
+USER_ID = str(USER["_id"])
+
+
+@pytest.fixture(autouse=True)
+def small_pages(monkeypatch):
+    monkeypatch.setattr(server, "SYNC_MAX_CHANGES", 2)
+
+
+def expense(n, updated_at=None):
+    doc = {"_id": ObjectId(), "user_id": USER_ID, "valor": float(n), "categoria": "Insumos", "cultura": "Soja",
+           "tipo": "variavel", "data": datetime(2024, 3, 1), "created_at": datetime(2024, 3, 1)}
+    if updated_at is not None:
+        doc["updated_at"] = updated_at
+    return doc
+
+
+def page(since=None):
+    response = asyncio.run(server.sync(since=since, current_user=USER))
+    return json.loads(response.body)
+
+
+def test_documents_without_updated_at_page_like_the_epoch(db):
+    # Written before delta sync existed: no stamp until `manage.py sync backfill`
+    legacy = [expense(i) for i in range(3)]
+    stamped = [expense(10 + i, datetime(2024, 3, 1) + timedelta(minutes=i)) for i in range(2)]
+
+    async def seed():
+        await db.expenses.insert_many(legacy + stamped)
+
+    asyncio.run(seed())
+
+    seen, since, pages = [], None, 0
+    while True:
+        body = page(since)
+        pages += 1
+        seen.extend(e["id"] for e in body["changes"]["expenses"])
+        since = body["token"]
+        if not body["has_more"]:
+            break
+
+    assert pages == 3
+    assert seen == [str(d["_id"]) for d in legacy + stamped]
+
+
+
+def test_setting_a_debt_to_its_current_status_writes_nothing(db):
+    stamp = datetime(2024, 3, 1)
+    debt_id = asyncio.run(db.debts.insert_one({
+        "user_id": USER_ID, "valor": 10.0, "credor": "Banco", "cultura": "Soja", "status": "pago",
+        "vencimento": stamp, "created_at": stamp, "updated_at": stamp,
+    })).inserted_id
+
+    with pytest.raises(server.HTTPException) as excinfo:
+        asyncio.run(server.update_debt_status(str(debt_id), "pago", current_user=USER))
+    assert excinfo.value.status_code == 404
+    assert asyncio.run(db.debts.find_one({"_id": debt_id}))["updated_at"] == stamp
+    assert asyncio.run(db.user_versions.find_one({"_id": USER_ID})) is None
+
+    asyncio.run(server.update_debt_status(str(debt_id), "pendente", current_user=USER))
+    debt = asyncio.run(db.debts.find_one({"_id": debt_id}))
+    assert (debt["status"], debt["updated_at"] > stamp) == ("pendente", True)
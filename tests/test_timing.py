@@ -0,0 +1,74 @@
+import asyncio
+import json
+import logging
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from serialization import FastJSONResponse
+from timing import TimingMiddleware, span
+
+
+async def fields(request):
+    with span("db"):
+        await asyncio.sleep(0.01)
+    # One lookup per field: the N+1 shape the spans are meant to expose
+    for _ in range(3):
+        with span("stats_db"):
+            await asyncio.sleep(0)
+    return FastJSONResponse([{"id": "1"}])
+
+
+async def plain(request):
+    return PlainTextResponse("ok")
+
+
+def make_client(**options):
+    app = Starlette(routes=[Route("/fields", fields), Route("/plain", plain)])
+    return TestClient(TimingMiddleware(app, **options))
+
+
+def parse_header(value):
+    entries = {}
+    for part in value.split(", "):
+        name, *params = part.split(";")
+        entries[name] = dict(p.split("=", 1) for p in params)
+    return entries
+
+
+def test_span_is_a_no_op_outside_requests():
+    with span("db") as a, span("other") as b:
+        pass
+    assert a is b
+
+
+def test_server_timing_header_aggregates_spans():
+    response = make_client().get("/fields")
+    entries = parse_header(response.headers["server-timing"])
+    assert list(entries) == ["db", "stats_db", "encode", "total"]
+    assert float(entries["db"]["dur"]) >= 10
+    assert entries["stats_db"]["desc"] == '"x3"'
+    assert "desc" not in entries["db"]
+    assert float(entries["total"]["dur"]) >= float(entries["db"]["dur"])
+
+
+def test_log_line_per_request(caplog):
+    client = make_client()
+    with caplog.at_level(logging.INFO, logger="timing"):
+        client.get("/fields")
+    [record] = caplog.records
+    line = json.loads(record.getMessage())
+    assert line["path"] == "/fields"
+    assert line["handler"] == "fields"
+    assert line["status"] == 200
+    assert line["spans"]["stats_db"]["count"] == 3
+
+
+def test_log_threshold_and_header_toggle(caplog):
+    client = make_client(header=False, log_min_ms=1000)
+    with caplog.at_level(logging.INFO, logger="timing"):
+        response = client.get("/plain")
+    assert "server-timing" not in response.headers
+    assert caplog.records == []
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from valuation import closes_frame, harvests_frame, value_harvests
+
+
+def harvest(field_id, cultura, sacas, day, area_ha=10.0):
+    return {
+        "field_id": field_id, "field_name": f"Talhão {field_id}", "area_ha": area_ha,
+        "cultura": cultura, "quantidade_sacas": sacas, "data_colheita": day,
+    }
+
+
+def close(produto, day, value):
+    return {"produto": produto, "bucket": day, "close": value}
+
+
+def value(harvests, prices, closes, receitas=None):
+    return value_harvests(harvests_frame(harvests), prices, closes_frame(closes), receitas or {})
+
+
+def by_cultura(result):
+    return {row["cultura"]: row for row in result["por_cultura"]}
+
+
+def test_harvests_take_the_last_close_on_or_before_their_day():
+    closes = [
+        close("Soja", datetime(2024, 3, 1), 120.0),
+        close("Soja", datetime(2024, 3, 4), 125.0),
+        close("Soja", datetime(2024, 3, 10), 200.0),
+        close("Milho", datetime(2024, 3, 5), 60.0),
+    ]
+    harvests = [
+        harvest("a", "Soja", 10, datetime(2024, 3, 4, 15)),  # same day
+        harvest("a", "Soja", 10, datetime(2024, 3, 8)),  # weekend gap: still the 4th
+        harvest("b", "Soja", 10, datetime(2024, 3, 2)),
+    ]
+    result = value(harvests, {"Soja": 130.0}, closes)
+
+    soja = by_cultura(result)["Soja"]
+    assert soja["valor_colheita"] == 10 * 125.0 + 10 * 125.0 + 10 * 120.0
+    assert soja["pnl"] == 30 * 130.0 - soja["valor_colheita"]
+    assert (soja["safras_sem_preco"], soja["safras_sem_historico"]) == (0, 0)
+
+
+def test_missing_current_quote_is_null_not_zero():
+    harvests = [harvest("a", "Soja", 10, datetime(2024, 3, 4)), harvest("b", "Sorgo", 5, datetime(2024, 3, 4))]
+    closes = [close("Soja", datetime(2024, 3, 1), 120.0), close("Sorgo", datetime(2024, 3, 1), 50.0)]
+    result = value(harvests, {"Soja": 130.0}, closes)
+
+    sorgo = by_cultura(result)["Sorgo"]
+    assert (sorgo["preco_atual"], sorgo["valor_atual"], sorgo["pnl"]) == (None, None, None)
+    assert (sorgo["valor_colheita"], sorgo["safras_sem_preco"]) == (250.0, 1)
+    # Left out of the totals, which still cover the soy
+    assert (result["valor_atual"], result["pnl"]) == (1300.0, 100.0)
+
+
+def test_harvest_before_price_history_is_null_not_zero():
+    harvests = [harvest("a", "Soja", 10, datetime(2024, 2, 1))]
+    result = value(harvests, {"Soja": 130.0}, [close("Soja", datetime(2024, 3, 1), 120.0)], {"Soja": 1000.0})
+
+    soja = by_cultura(result)["Soja"]
+    assert (soja["valor_colheita"], soja["pnl"], soja["receitas_vs_colheita"]) == (None, None, None)
+    assert (soja["valor_atual"], soja["safras_sem_historico"]) == (1300.0, 1)
+    assert (result["valor_colheita"], result["pnl"], result["valor_atual"]) == (None, None, 1300.0)
+
+
+def test_no_price_history_at_all():
+    result = value([harvest("a", "Soja", 10, datetime(2024, 3, 4))], {"Soja": 130.0}, [])
+    assert by_cultura(result)["Soja"]["valor_colheita"] is None
+    assert result["valor_colheita"] is None
+
+
+def test_value_per_hectare_skips_zero_area_fields():
+    harvests = [harvest("a", "Soja", 10, datetime(2024, 3, 4)), harvest("b", "Soja", 10, datetime(2024, 3, 4), area_ha=0.0)]
+    result = value(harvests, {"Soja": 130.0}, [])
+
+    talhoes = {row["field_id"]: row for row in result["por_talhao"]}
+    assert talhoes["a"]["valor_por_ha"] == 130.0
+    assert (talhoes["b"]["valor_atual"], talhoes["b"]["valor_por_ha"]) == (1300.0, None)
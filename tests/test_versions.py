@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import server
+
+USER = {"_id": ObjectId(), "name": "Versions", "plan": "trial"}
+USER_ID = str(USER["_id"])
+OTHER = {"_id": ObjectId(), "name": "Other", "plan": "trial"}
+
+
+@pytest.fixture
+def client(db):
+    server.app.dependency_overrides[server.get_current_user] = lambda: USER
+    yield TestClient(server.app)
+    server.app.dependency_overrides.clear()
+
+
+def expense():
+    return {"valor": 10.0, "categoria": "Insumos", "cultura": "Soja", "tipo": "variavel", "data": "2024-03-01T00:00:00"}
+
+
+def revenue():
+    return {"valor": 10.0, "cultura": "Soja", "tipo": "venda", "data": "2024-03-01T00:00:00"}
+
+
+def debt():
+    return {"valor": 10.0, "credor": "Banco", "vencimento": "2024-03-01T00:00:00", "cultura": "Soja"}
+
+
+def field():
+    return {"nome": "Talhão 1", "area_ha": 10.0, "cultura": "Soja"}
+
+
+def harvest(client):
+    field_id = client.post("/api/fields", json=field()).json()["id"]
+    return {"field_id": field_id, "cultura": "Soja", "quantidade_sacas": 100, "data_colheita": "2024-03-01T00:00:00"}
+
+
+def created(client, path, body):
+    return client.post(path, json=body).json()["id"]
+
+
+# The productivity stats behind a full /api/fields are rebuilt with $unionWith,
+# which mongomock lacks; a projection without them exercises the same ETag
+FIELDS = "/api/fields?fields=nome"
+
+# (collection, list endpoint, write) with every write path that must bump the version
+WRITES = [
+    ("expenses", "/api/expenses", lambda c: c.post("/api/expenses", json=expense())),
+    ("expenses", "/api/expenses", lambda c: c.delete(f"/api/expenses/{created(c, '/api/expenses', expense())}")),
+    ("expenses", "/api/expenses", lambda c: c.post("/api/import/expenses", json=[expense()])),
+    ("revenues", "/api/revenues", lambda c: c.post("/api/revenues", json=revenue())),
+    ("revenues", "/api/revenues", lambda c: c.delete(f"/api/revenues/{created(c, '/api/revenues', revenue())}")),
+    ("debts", "/api/debts", lambda c: c.post("/api/debts", json=debt())),
+    ("debts", "/api/debts", lambda c: c.delete(f"/api/debts/{created(c, '/api/debts', debt())}")),
+    ("debts", "/api/debts", lambda c: c.patch(f"/api/debts/{created(c, '/api/debts', debt())}/status", params={"status": "pago"})),
+    ("fields", FIELDS, lambda c: c.post("/api/fields", json=field())),
+    ("fields", FIELDS, lambda c: c.delete(f"/api/fields/{created(c, '/api/fields', field())}")),
+    ("harvests", "/api/harvests", lambda c: c.post("/api/harvests", json=harvest(c))),
+    ("harvests", "/api/harvests", lambda c: c.delete(f"/api/harvests/{created(c, '/api/harvests', harvest(c))}")),
+    # Field productivity comes from harvests
+    ("harvests", FIELDS, lambda c: c.post("/api/harvests", json=harvest(c))),
+]
+
+
+def versions(db):
+    return asyncio.run(db.user_versions.find_one({"_id": USER_ID})) or {}
+
+
+def test_etag_is_weak_and_depends_on_user_path_and_query(client):
+    response = client.get("/api/expenses")
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert client.get("/api/expenses").headers["etag"] == etag
+
+    assert client.get("/api/revenues").headers["etag"] != etag
+    assert client.get("/api/expenses", params={"limit": 10}).headers["etag"] != etag
+    server.app.dependency_overrides[server.get_current_user] = lambda: OTHER
+    assert client.get("/api/expenses").headers["etag"] != etag
+
+
+@pytest.mark.parametrize("collection, path, write", WRITES)
+def test_every_write_bumps_the_version(client, db, collection, path, write):
+    etag = client.get(path).headers["etag"]
+    before = versions(db).get(collection, 0)
+
+    assert write(client).status_code == 200
+    assert versions(db)[collection] > before
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_if_none_match(client):
+    etag = client.get("/api/debts").headers["etag"]
+    strong = etag.removeprefix("W/")
+    for header in (etag, strong, f'"other", {etag}', f'"other",{strong}', "*"):
+        response = client.get("/api/debts", headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+        assert response.content == b""
+        assert (response.headers["etag"], response.headers["cache-control"]) == (etag, "private, no-cache")
+    assert client.get("/api/debts", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert client.get("/api/debts", headers={"If-None-Match": 'W/"other"'}).status_code == 200
+
+
+def test_unchanged_refresh_does_not_read_the_collection(client, monkeypatch):
+    etag = client.get("/api/expenses").headers["etag"]
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("list_documents should not run for a 304")
+
+    monkeypatch.setattr(server, "list_documents", fail)
+    assert client.get("/api/expenses", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_failed_write_does_not_bump_the_version(client, db):
+    etag = client.get("/api/expenses").headers["etag"]
+    assert client.delete(f"/api/expenses/{ObjectId()}").status_code == 404
+    assert versions(db) == {}
+    assert client.get("/api/expenses", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+import pytest
+
+from weather import FixtureProvider, MockProvider, WeatherProvider, WeatherService, normalize_place, tile_center, tile_for
+
+
+class CountingProvider(WeatherProvider):
+    name = "counting"
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = []
+        self.fail = False
+
+    async def current(self, lat, lon):
+        self.calls.append(("current", lat, lon))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return {"temperatura": 25.0, "condicao": "sunny", "umidade": 60, "vento_kmh": 10.0, "n": len(self.calls)}
+
+    async def forecast(self, lat, lon, days):
+        self.calls.append(("forecast", lat, lon))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return [{"data": f"2024-03-0{i + 1}", "temp_max": 30, "temp_min": 20, "condicao": "rainy", "chuva_prob": 80} for i in range(days)]
+
+    async def geocode(self, query):
+        self.calls.append(("geocode", query))
+        return {"nome": query, "latitude": -23.55, "longitude": -46.63}
+
+
+class Timer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_tiles_snap_to_grid():
+    assert tile_for(-23.551, -46.633, 0.1) == tile_for(-23.509, -46.699, 0.1)
+    assert tile_for(-23.551, -46.633, 0.1) != tile_for(-23.449, -46.633, 0.1)
+    assert tile_center(tile_for(-23.551, -46.633, 0.1), 0.1) == (-23.55, -46.65)
+
+
+def test_neighbours_share_one_fetch():
+    async def scenario():
+        provider = CountingProvider()
+        service = WeatherService(provider, tile_degrees=0.1)
+        results = await asyncio.gather(*(
+            service.get(-23.51 - i * 0.008, -46.61 - i * 0.008) for i in range(10)
+        ))
+        return provider, service, results
+
+    provider, service, results = asyncio.run(scenario())
+    assert sorted(kind for kind, *_ in provider.calls) == ["current", "forecast"]
+    assert provider.calls[0][1:] == (-23.55, -46.65)
+    assert service.coalesced == 18
+    assert len({r["tile"] for r in results}) == 1
+
+
+def test_ttls_are_per_kind():
+    async def scenario():
+        timer = Timer()
+        provider = CountingProvider(delay=0)
+        service = WeatherService(provider, current_ttl=600, forecast_ttl=3600, timer=timer)
+        await service.get(-23.5, -46.6)
+        timer.now = 599
+        await service.get(-23.5, -46.6)
+        assert len(provider.calls) == 2
+        timer.now = 601
+        await service.get(-23.5, -46.6)
+        assert [c[0] for c in provider.calls[2:]] == ["current"]
+        timer.now = 3601
+        await service.get(-23.5, -46.6)
+        return provider
+
+    provider = asyncio.run(scenario())
+    assert [c[0] for c in provider.calls] == ["current", "forecast", "current", "current", "forecast"]
+
+
+def test_stale_data_served_when_provider_fails():
+    async def scenario():
+        timer = Timer()
+        provider = CountingProvider(delay=0)
+        service = WeatherService(provider, current_ttl=600, forecast_ttl=600, max_stale=3600, timer=timer)
+        first = await service.get(-23.5, -46.6)
+        provider.fail = True
+        timer.now = 700
+        stale = await service.get(-23.5, -46.6)
+        assert stale["atual"] == first["atual"]
+        assert service.stale_served == 2
+        timer.now = 4000
+        with pytest.raises(RuntimeError):
+            await service.get(-23.5, -46.6)
+
+    asyncio.run(scenario())
+
+
+def test_geocode_is_cached_by_normalized_name():
+    async def scenario():
+        provider = CountingProvider()
+        service = WeatherService(provider)
+        await service.geocode("São Paulo")
+        await service.geocode("  sao   PAULO ")
+        return provider
+
+    assert asyncio.run(scenario()).calls == [("geocode", "São Paulo")]
+    assert normalize_place(" Ribeirão  Preto") == "ribeirao preto"
+
+
+def test_fixture_provider(tmp_path):
+    fixture = tmp_path / "weather.json"
+    fixture.write_text(json.dumps({
+        "current": {"temperatura": 21.5, "condicao": "cloudy", "umidade": 70, "vento_kmh": 8},
+        "forecast": [{"data": "2024-03-01", "temp_max": 27, "temp_min": 18, "condicao": "rainy", "chuva_prob": 90}] * 7,
+        "places": {"Sorriso": {"nome": "Sorriso, MT", "latitude": -12.54, "longitude": -55.71}},
+    }), encoding="utf-8")
+
+    async def scenario():
+        service = WeatherService(FixtureProvider(fixture), forecast_days=5)
+        place = await service.geocode("sorriso")
+        data = await service.get(place["latitude"], place["longitude"])
+        return place, data, await service.geocode("Nowhere")
+
+    place, data, missing = asyncio.run(scenario())
+    assert place["nome"] == "Sorriso, MT"
+    assert data["atual"]["temperatura"] == 21.5
+    assert len(data["previsao"]) == 5
+    assert missing is None
+
+
+def test_mock_provider_is_stable_within_a_tile():
+    async def scenario():
+        service = WeatherService(MockProvider())
+        a = await MockProvider().forecast(-12.5, -55.7, 5)
+        b = await MockProvider().forecast(-12.5, -55.7, 5)
+        data = await service.get(-12.5, -55.7)
+        return a, b, data
+
+    a, b, data = asyncio.run(scenario())
+    assert a == b
+    assert len(data["previsao"]) == 5
+    assert data["atual"]["condicao"] in ("sunny", "partly-sunny", "cloudy", "rainy")